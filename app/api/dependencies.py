@@ -1,16 +1,21 @@
+import uuid
+
+import redis
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
+from app.core.redis_client import get_redis
 from app.core import security
 from app.models import models
 from app.schemas import schemas
+from app.services.principal_cache import Principal, principal_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token")
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+def get_current_user(db: Session = Depends(get_db), redis_client: redis.Redis = Depends(get_redis), token: str = Depends(oauth2_scheme)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -24,12 +29,26 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_
         token_data = schemas.TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.username == token_data.username).first()
+
+    # Tokens issued with TOKEN_PRINCIPAL_CLAIMS carry everything authorization needs
+    if "uid" in payload and "adm" in payload:
+        try:
+            principal = Principal(uuid.UUID(payload["uid"]), token_data.username, payload["adm"])
+        except (TypeError, ValueError):
+            raise credentials_exception
+        principal_cache.record_token_claims()
+        return principal
+
+    def load(username):
+        user = db.query(models.User).filter(models.User.username == username).first()
+        return Principal.from_user(user) if user is not None else None
+
+    user = principal_cache.get(redis_client, token_data.username, load)
     if user is None:
         raise credentials_exception
     return user
 
-def get_current_admin_user(current_user: models.User = Depends(get_current_user)):
+def get_current_admin_user(current_user: Principal = Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="The user doesn't have enough privileges")
     return current_user
@@ -1,114 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, UploadFile, File, Query, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.schemas import schemas
 from app.models import models
-from app.core.database import get_db
-from app.core.redis_client import get_redis
-from app.services import redis_service
+from app.core.database import get_db, engine, SessionLocal
+from app.core.async_database import async_engine
+from app.core import db_instrumentation
+from app.core.redis_client import get_redis, get_redis_pool_stats
+from app.core.async_redis_client import get_async_redis_pool_stats
+from app.core.redis_lock import get_lock_stats
+from app.core.password_hashing import password_hashing_pool
+from app.services import redis_service, seat_sync
+from app.services.bulk_upload import process_bulk_upload
+from app.services.pagination import keyset_page
+from app.services.path_engine import departure_date
+from typing import Optional
 from app.api.dependencies import get_current_admin_user
+from app.services.principal_cache import Principal, principal_cache
 from uuid import UUID, uuid4
 import redis
-import csv
-import io
 import json
+import shutil
+import tempfile
 from datetime import datetime
 
 router = APIRouter()
 
-def process_bulk_upload(file_contents: bytes, db: Session, redis_client: redis.Redis, job_id: str):
-    """
-    Background task to process the uploaded CSV file.
-    Performs an "upsert" logic for each row.
-    """
-    results = {
-        "status": "IN_PROGRESS",
-        "created": 0,
-        "updated": 0,
-        "failed": 0,
-        "errors": []
-    }
-    redis_client.set(f"bulk_job:{job_id}", json.dumps(results))
-
-    try:
-        # Use io.StringIO to treat the byte string as a file
-        csv_reader = csv.DictReader(io.StringIO(file_contents.decode('utf-8')))
-        
-        for row in csv_reader:
-            try:
-                flight_data = schemas.FlightCreate(**row)
-                
-                # Upsert logic: Check if flight exists
-                db_flight = db.query(models.Flight).filter(
-                    models.Flight.flight_number == flight_data.flight_number,
-                    models.Flight.departure_ts == flight_data.departure_ts
-                ).first()
-
-                if db_flight:
-                    # Update existing flight
-                    redis_service.delete_flight_from_redis(redis_client, db_flight)
-                    for var, value in vars(flight_data).items():
-                        setattr(db_flight, var, value) if value else None
-                    db_flight.available_seats = flight_data.total_seats
-                    results["updated"] += 1
-                else:
-                    # Create new flight
-                    db_flight = models.Flight(**flight_data.dict(), available_seats=flight_data.total_seats)
-                    db.add(db_flight)
-                    results["created"] += 1
-                
-                db.commit()
-                db.refresh(db_flight)
-                redis_service.update_flight_in_redis(redis_client, db_flight)
-
-                # Publish update to trigger precomputation
-                update_message = {
-                    "source": db_flight.source,
-                    "destination": db_flight.destination,
-                    "date": db_flight.departure_ts.strftime('%Y-%m-%d')
-                }
-                redis_client.publish("flight_updates", json.dumps(update_message))
-
-            except Exception as e:
-                db.rollback()
-                results["failed"] += 1
-                results["errors"].append(f"Row {csv_reader.line_num}: {str(e)}")
-
-        results["status"] = "COMPLETED"
-    except Exception as e:
-        results["status"] = "FAILED"
-        results["errors"].append(f"Critical error: {str(e)}")
-    
-    redis_client.set(f"bulk_job:{job_id}", json.dumps(results), ex=3600) # Keep result for 1 hour
-
-
 @router.post("/flights/bulk-upload")
 def bulk_upload_flights(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
     redis_client: redis.Redis = Depends(get_redis),
-    current_user: models.User = Depends(get_current_admin_user)
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     if file.content_type != 'text/csv':
         raise HTTPException(status_code=400, detail="Invalid file type. Please upload a CSV.")
     
     job_id = str(uuid4())
-    file_contents = file.file.read()
 
-    # Start the background task
-    background_tasks.add_task(process_bulk_upload, file_contents, db, redis_client, job_id)
+    # Spool the upload to disk so the background task can stream it in chunks
+    with tempfile.NamedTemporaryFile(prefix=f"bulk_{job_id}_", suffix=".csv", delete=False) as spooled:
+        shutil.copyfileobj(file.file, spooled, length=1024 * 1024)
+
+    # Start the background task with its own database session
+    background_tasks.add_task(process_bulk_upload, spooled.name, redis_client, job_id, SessionLocal)
     
     return {"job_id": job_id, "status": "PENDING", "message": "File upload successful. Processing in the background."}
 
 @router.get("/flights/bulk-upload/status/{job_id}")
-def get_bulk_upload_status(job_id: str, redis_client: redis.Redis = Depends(get_redis), current_user: models.User = Depends(get_current_admin_user)):
+def get_bulk_upload_status(job_id: str, redis_client: redis.Redis = Depends(get_redis), current_user: Principal = Depends(get_current_admin_user)):
     result = redis_client.get(f"bulk_job:{job_id}")
     if not result:
         raise HTTPException(status_code=404, detail="Job not found.")
     return json.loads(result)
 
 @router.post("/flights", response_model=schemas.Flight)
-def create_flight(flight: schemas.FlightCreate, db: Session = Depends(get_db), redis_client: redis.Redis = Depends(get_redis), current_user: models.User = Depends(get_current_admin_user)):
+def create_flight(flight: schemas.FlightCreate, db: Session = Depends(get_db), redis_client: redis.Redis = Depends(get_redis), current_user: Principal = Depends(get_current_admin_user)):
     db_flight = models.Flight(**flight.dict(), available_seats=flight.total_seats)
     db.add(db_flight)
     db.commit()
@@ -121,21 +68,58 @@ def create_flight(flight: schemas.FlightCreate, db: Session = Depends(get_db), r
     update_message = {
         "source": db_flight.source,
         "destination": db_flight.destination,
-        "date": db_flight.departure_ts.strftime('%Y-%m-%d')
+        "date": departure_date(db_flight.departure_ts).isoformat(),
+        "flight_id": str(db_flight.id)
     }
     redis_client.publish("flight_updates", json.dumps(update_message))
     
     return db_flight
 
+@router.get("/flights", response_model=list[schemas.Flight])
+def list_flights(
+    response: Response,
+    source: Optional[str] = None,
+    destination: Optional[str] = None,
+    departure_after: Optional[datetime] = None,
+    departure_before: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000, description="Page size; the next page's cursor is returned in X-Next-Cursor"),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_admin_user),
+):
+    """
+    Flights in departure order, optionally for one route and departure window.
+    Route queries use ix_flights_source_destination_departure_ts_id, the others
+    ix_flights_departure_ts_id.
+    """
+    query = select(models.Flight)
+    if source is not None:
+        query = query.where(models.Flight.source == source)
+    if destination is not None:
+        query = query.where(models.Flight.destination == destination)
+    if departure_after is not None:
+        query = query.where(models.Flight.departure_ts >= departure_after)
+    if departure_before is not None:
+        query = query.where(models.Flight.departure_ts < departure_before)
+    try:
+        flights, next_cursor = keyset_page(
+            db, query, models.Flight.departure_ts, models.Flight.id, cursor=cursor, limit=limit
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return flights
+
 @router.get("/flights/{flight_id}", response_model=schemas.Flight)
-def read_flight(flight_id: UUID, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_admin_user)):
+def read_flight(flight_id: UUID, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_admin_user)):
     db_flight = db.query(models.Flight).filter(models.Flight.id == flight_id).first()
     if db_flight is None:
         raise HTTPException(status_code=404, detail="Flight not found")
     return db_flight
 
 @router.put("/flights/{flight_id}", response_model=schemas.Flight)
-def update_flight(flight_id: UUID, flight: schemas.FlightCreate, db: Session = Depends(get_db), redis_client: redis.Redis = Depends(get_redis), current_user: models.User = Depends(get_current_admin_user)):
+def update_flight(flight_id: UUID, flight: schemas.FlightCreate, db: Session = Depends(get_db), redis_client: redis.Redis = Depends(get_redis), current_user: Principal = Depends(get_current_admin_user)):
     db_flight = db.query(models.Flight).filter(models.Flight.id == flight_id).first()
     if db_flight is None:
         raise HTTPException(status_code=404, detail="Flight not found")
@@ -148,6 +132,8 @@ def update_flight(flight_id: UUID, flight: schemas.FlightCreate, db: Session = D
         setattr(db_flight, var, value) if value else None
 
     db_flight.available_seats = flight.total_seats
+    # Makes an in-flight write-behind of the old seat count a no-op
+    db_flight.version = models.Flight.version + 1
     db.commit()
     db.refresh(db_flight)
 
@@ -158,14 +144,15 @@ def update_flight(flight_id: UUID, flight: schemas.FlightCreate, db: Session = D
     update_message = {
         "source": db_flight.source,
         "destination": db_flight.destination,
-        "date": db_flight.departure_ts.strftime('%Y-%m-%d')
+        "date": departure_date(db_flight.departure_ts).isoformat(),
+        "flight_id": str(db_flight.id)
     }
     redis_client.publish("flight_updates", json.dumps(update_message))
 
     return db_flight
 
 @router.delete("/flights/{flight_id}", response_model=schemas.Flight)
-def delete_flight(flight_id: UUID, db: Session = Depends(get_db), redis_client: redis.Redis = Depends(get_redis), current_user: models.User = Depends(get_current_admin_user)):
+def delete_flight(flight_id: UUID, db: Session = Depends(get_db), redis_client: redis.Redis = Depends(get_redis), current_user: Principal = Depends(get_current_admin_user)):
     db_flight = db.query(models.Flight).filter(models.Flight.id == flight_id).first()
     if db_flight is None:
         raise HTTPException(status_code=404, detail="Flight not found")
@@ -181,8 +168,49 @@ def delete_flight(flight_id: UUID, db: Session = Depends(get_db), redis_client:
     update_message = {
         "source": db_flight.source,
         "destination": db_flight.destination,
-        "date": db_flight.departure_ts.strftime('%Y-%m-%d')
+        "date": departure_date(db_flight.departure_ts).isoformat(),
+        "flight_id": str(db_flight.id)
     }
     redis_client.publish("flight_updates", json.dumps(update_message))
     
     return db_flight
+
+@router.get("/stats/redis-pool")
+def get_redis_pool_metrics(current_user: Principal = Depends(get_current_admin_user)):
+    """Connection pool usage for this API process, to help size REDIS_MAX_CONNECTIONS."""
+    return {
+        "sync": get_redis_pool_stats(),
+        "async": get_async_redis_pool_stats(),
+    }
+
+@router.get("/stats/locks")
+def get_lock_metrics(current_user: Principal = Depends(get_current_admin_user)):
+    """Acquisitions, contended acquisitions, timeouts and wait times of the Redis locks used by this process."""
+    return get_lock_stats()
+
+@router.get("/stats/write-behind")
+def get_write_behind_metrics(redis_client: redis.Redis = Depends(get_redis), current_user: Principal = Depends(get_current_admin_user)):
+    """How far the flights table's seat counts lag behind Redis."""
+    return seat_sync.lag_snapshot(redis_client)
+
+@router.get("/stats/principals")
+def get_principal_cache_metrics(current_user: Principal = Depends(get_current_admin_user)):
+    """Where this process resolved authenticated users from: local cache, Redis, database or token claims."""
+    return principal_cache.snapshot()
+
+@router.get("/stats/password-hashing")
+def get_password_hashing_metrics(current_user: Principal = Depends(get_current_admin_user)):
+    """Load on this process's password hashing pool: pending operations, rejections and hashing time."""
+    return password_hashing_pool.snapshot()
+
+@router.get("/stats/db")
+def get_db_metrics(current_user: Principal = Depends(get_current_admin_user)):
+    """
+    Engine pool status plus, when DB_INSTRUMENTATION is enabled, the slowest
+    statements and the number of queries issued per request for each route.
+    """
+    return {
+        "pool": {"sync": engine.pool.status(), "async": async_engine.pool.status()},
+        "statements": db_instrumentation.statement_stats.snapshot(),
+        "requests": db_instrumentation.request_query_stats.snapshot(),
+    }
@@ -1,29 +1,38 @@
-import pandas as pd
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+from app.core.async_database import get_async_db
+from app.core.async_redis_client import get_async_redis
+from app.services.airport_registry import registry
 
 router = APIRouter()
 
 @router.get("/airports", response_model=List[str])
-def get_airports():
+async def get_airports(
+    request: Request,
+    response: Response,
+    q: Optional[str] = Query(None, description="Return only airports starting with this prefix"),
+    limit: int = Query(10, ge=1, le=100, description="Maximum number of prefix matches"),
+    db: AsyncSession = Depends(get_async_db),
+    redis_client: aioredis.Redis = Depends(get_async_redis)
+):
     """
-    Returns a list of unique airport locations from the flights data.
+    Returns the sorted list of airports served by at least one flight,
+    or the airports matching a prefix for autocomplete.
     """
-    try:
-        # In a real application, this would be a more robust data source
-        df = pd.read_csv("flights.csv")
-        
-        # Get unique source and destination airports
-        source_airports = df["source"].unique()
-        destination_airports = df["destination"].unique()
-        
-        # Combine, sort, and unique the list
-        all_airports = sorted(list(set(source_airports) | set(destination_airports)))
-        
-        return all_airports
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="Airports data not found.")
-    except Exception as e:
-        # Log the error for debugging
-        print(f"Error reading or processing airports data: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error.")
+    await registry.ensure_fresh(db, redis_client)
+
+    headers = {
+        "ETag": registry.etag,
+        "Cache-Control": f"public, max-age={settings.AIRPORTS_CACHE_MAX_AGE}",
+    }
+    if request.headers.get("if-none-match") == registry.etag:
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    if q:
+        return registry.search(q, limit)
+    return registry.airports
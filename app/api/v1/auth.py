@@ -1,38 +1,71 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 
 from app.schemas import schemas
 from app.models import models
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.async_database import get_async_db
+from app.core.async_redis_client import get_async_redis
 from app.core import security
+from app.core.password_hashing import HashingPoolSaturated, password_hashing_pool
+from app.services.principal_cache import principal_cache
+import redis.asyncio as aioredis
 
 router = APIRouter()
 
+def hashing_unavailable():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many concurrent logins, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+# bcrypt runs on a dedicated process pool, so these handlers are async and
+# never hold one of the threads shared by the sync endpoints.
 @router.post("/token", response_model=schemas.Token)
-def login_for_access_token(db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()):
-    user = db.query(models.User).filter(models.User.username == form_data.username).first()
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(db: AsyncSession = Depends(get_async_db), form_data: OAuth2PasswordRequestForm = Depends()):
+    user = (await db.execute(select(models.User).where(models.User.username == form_data.username))).scalars().first()
+    valid, new_hash = False, None
+    if user:
+        try:
+            valid, new_hash = await password_hashing_pool.verify(form_data.password, user.hashed_password)
+        except HashingPoolSaturated:
+            raise hashing_unavailable()
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash is not None:
+        # Hashed at an older BCRYPT_ROUNDS; upgrade it now that the password is known
+        user.hashed_password = new_hash
+        await db.commit()
+
     access_token_expires = timedelta(minutes=security.ACCESS_TOKEN_EXPIRE_MINUTES)
+    claims = {"sub": user.username}
+    if settings.TOKEN_PRINCIPAL_CLAIMS:
+        claims.update(uid=str(user.id), adm=bool(user.is_admin))
     access_token = security.create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=claims, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/register", response_model=schemas.User)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db), redis_client: aioredis.Redis = Depends(get_async_redis)):
+    db_user = (await db.execute(select(models.User).where(models.User.username == user.username))).scalars().first()
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    hashed_password = security.get_password_hash(user.password)
+    try:
+        hashed_password = await password_hashing_pool.hash(user.password)
+    except HashingPoolSaturated:
+        raise hashing_unavailable()
     db_user = models.User(username=user.username, hashed_password=hashed_password)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    await principal_cache.invalidate_async(redis_client, db_user.username)
     return db_user
@@ -1,100 +1,132 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.schemas import schemas
 from app.models import models
 from app.core.database import get_db
 from app.core.redis_client import get_redis
-from app.core.redis_lock import RedisLock
+from app.core.async_database import get_async_db
+from app.core.async_redis_client import get_async_redis
+from app.core.config import settings
+from app.core import metrics
+from app.services import seat_reservations, payment_queue, seat_sync
+from app.services.pagination import keyset_page
+from typing import Optional
+from app.services.booking_events import notifier
 from app.api.dependencies import get_current_user
+from app.services.principal_cache import Principal
 from uuid import UUID
-import redis
-import random
+import asyncio
 import time
+import redis
+import redis.asyncio as aioredis
 import uuid
 
 router = APIRouter()
 
-def mock_payment_service(booking_id: UUID, force_failure: bool = False):
-    """
-    Simulates a call to a payment service.
-    - Introduces a random delay.
-    - Randomly succeeds or fails.
-    """
-    time.sleep(random.uniform(0.5, 3))  # Simulate network latency
-    if force_failure or random.random() < 0.2:  # 20% chance of failure
-        return {"status": "FAILED", "payment_ref": f"ref_{uuid.uuid4()}"}
-    return {"status": "SUCCESS", "payment_ref": f"ref_{uuid.uuid4()}"}
-
 @router.post("/booking", response_model=schemas.Booking)
-def create_booking(booking: schemas.BookingCreate, db: Session = Depends(get_db), redis_client: redis.Redis = Depends(get_redis), current_user: models.User = Depends(get_current_user), force_payment_failure: bool = False):
-    flight_key = f"flight:{booking.flight_id}"
-    seat_key = f"flight_seats:{booking.flight_id}"
-    lock_key = f"lock:flight:{booking.flight_id}"
-
-    with RedisLock(redis_client, lock_key):
-        # Use a Redis transaction to reserve the seats
-        with redis_client.pipeline() as pipe:
-            try:
-                pipe.watch(seat_key)
-                available_seats_str = pipe.get(seat_key)
-                if available_seats_str is None:
-                    raise HTTPException(status_code=404, detail="Flight data not found in cache.")
-                
-                available_seats = int(available_seats_str)
-                if available_seats < booking.seats:
-                    raise HTTPException(status_code=400, detail="Not enough seats available")
-
-                pipe.multi()
-                pipe.decrby(seat_key, booking.seats)
-                pipe.hincrby(flight_key, "available_seats", -booking.seats)
-                pipe.execute()
-            except redis.WatchError:
-                raise HTTPException(status_code=409, detail="Seat availability changed, please try again")
-
-        # Create the booking with PENDING status
-        db_booking = models.Booking(
-            user_id=current_user.id,
-            flight_id=booking.flight_id,
-            seats=booking.seats,
-            status="PENDING"
-        )
+def create_booking(booking: schemas.BookingCreate, db: Session = Depends(get_db), redis_client: redis.Redis = Depends(get_redis), current_user: Principal = Depends(get_current_user), force_payment_failure: bool = False):
+    # The booking ID doubles as the reservation ID, so the reservation sweeper can fail abandoned bookings
+    booking_id = uuid.uuid4()
+
+    # Atomically check and take the seats; no lock is held past this call
+    remaining = seat_reservations.reserve_seats(
+        redis_client, booking.flight_id, booking.seats, booking_id, settings.SEAT_RESERVATION_TTL_SECONDS
+    )
+    if remaining == seat_reservations.FLIGHT_NOT_CACHED:
+        metrics.booking_outcomes.labels("flight_not_cached").inc()
+        raise HTTPException(status_code=404, detail="Flight data not found in cache.")
+    if remaining == seat_reservations.NOT_ENOUGH_SEATS:
+        metrics.booking_outcomes.labels("not_enough_seats").inc()
+        raise HTTPException(status_code=400, detail="Not enough seats available")
+
+    # Create the booking with PENDING status
+    db_booking = models.Booking(
+        id=booking_id,
+        user_id=current_user.id,
+        flight_id=booking.flight_id,
+        seats=booking.seats,
+        status="PENDING"
+    )
+    try:
         db.add(db_booking)
         db.commit()
-        db.refresh(db_booking)
-
-        # Simulate payment
-        payment_result = mock_payment_service(db_booking.id, force_failure=force_payment_failure)
-
-        if payment_result["status"] == "SUCCESS":
-            db_booking.status = "CONFIRMED"
-            db_booking.payment_ref = payment_result["payment_ref"]
-            
-            # On success, publish the flight ID to the seat_updates channel
-            redis_client.publish("seat_updates", str(booking.flight_id))
-            
-        else:
-            # Payment failed, perform compensating action
-            db_booking.status = "FAILED"
-            
-            # Atomically return the reserved seats to Redis
-            with redis_client.pipeline() as pipe:
-                pipe.incrby(seat_key, booking.seats)
-                pipe.hincrby(flight_key, "available_seats", booking.seats)
-                pipe.execute()
-            
-            # NOTE: We do NOT update the master DB record here, because the seats were never taken from it.
+    except Exception:
+        db.rollback()
+        seat_reservations.release_reservation(redis_client, booking_id, booking.flight_id)
+        raise
+    db.refresh(db_booking)
 
+    # Payment runs on the worker; the client follows progress via /bookings/{id}/status
+    try:
+        payment_queue.enqueue_payment(redis_client, booking_id, force_failure=force_payment_failure)
+    except redis.RedisError:
+        db_booking.status = "FAILED"
         db.commit()
-        db.refresh(db_booking)
-        
+        seat_reservations.release_reservation(redis_client, booking_id, booking.flight_id)
+        metrics.booking_outcomes.labels("queue_unavailable").inc()
+        raise HTTPException(status_code=503, detail="Payment queue unavailable, please try again")
+
+    metrics.booking_outcomes.labels("pending").inc()
+    return db_booking
+
+@router.get("/bookings/{booking_id}/status", response_model=schemas.Booking)
+async def get_booking_status(
+    booking_id: UUID,
+    wait: int = Query(0, ge=0, le=30, description="Seconds to wait for a PENDING booking to be settled"),
+    db: AsyncSession = Depends(get_async_db),
+    redis_client: aioredis.Redis = Depends(get_async_redis),
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Returns the booking. With `wait`, a PENDING booking is held open
+    (long-poll) until the worker confirms or fails it, or until `wait` expires.
+    """
+    future = None
+    deadline = time.monotonic() + wait
+    # Without the notifier (Redis unreachable), fall back to a plain status read
+    if wait and await notifier.start(redis_client, timeout=wait):
+        # Subscribe before reading so a status change between the two is not missed
+        future = notifier.subscribe(booking_id)
+    try:
+        db_booking = await db.get(models.Booking, booking_id)
+        if not db_booking or db_booking.user_id != current_user.id:
+            raise HTTPException(status_code=404, detail="Booking not found")
+
+        if future is not None and db_booking.status == "PENDING":
+            try:
+                await asyncio.wait_for(future, timeout=max(0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                return db_booking
+            await db.refresh(db_booking)
         return db_booking
+    finally:
+        if future is not None:
+            notifier.unsubscribe(booking_id, future)
 
 @router.get("/bookings", response_model=list[schemas.Booking])
-def get_my_bookings(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    return db.query(models.Booking).filter(models.Booking.user_id == current_user.id).all()
+def get_my_bookings(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=100, description="Page size; the next page's cursor is returned in X-Next-Cursor"),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """The caller's bookings, newest first. Pages are read from ix_bookings_user_id_created_at_id."""
+    query = select(models.Booking).where(models.Booking.user_id == current_user.id)
+    try:
+        bookings, next_cursor = keyset_page(
+            db, query, models.Booking.created_at, models.Booking.id, cursor=cursor, limit=limit, descending=True
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return bookings
 
 @router.delete("/bookings/{booking_id}", response_model=schemas.Booking)
-def cancel_booking(booking_id: UUID, db: Session = Depends(get_db), redis_client: redis.Redis = Depends(get_redis), current_user: models.User = Depends(get_current_user)):
+def cancel_booking(booking_id: UUID, db: Session = Depends(get_db), redis_client: redis.Redis = Depends(get_redis), current_user: Principal = Depends(get_current_user)):
     db_booking = db.query(models.Booking).filter(models.Booking.id == booking_id).first()
 
     if not db_booking:
@@ -115,22 +147,20 @@ def cancel_booking(booking_id: UUID, db: Session = Depends(get_db), redis_client
     # Update booking status in DB
     db_booking.status = "CANCELLED"
     
-    # Atomically increment seat count in Redis
+    # Atomically increment seat count in Redis; the worker writes it back to the flights table
     flight_key = f"flight:{db_booking.flight_id}"
     seat_key = f"flight_seats:{db_booking.flight_id}"
     
     with redis_client.pipeline() as pipe:
         pipe.incrby(seat_key, db_booking.seats)
         pipe.hincrby(flight_key, "available_seats", db_booking.seats)
+        seat_sync.queue_seat_change(pipe, db_booking.flight_id)
         pipe.execute()
 
-    # Update available_seats in the master DB record
-    db.query(models.Flight).filter(models.Flight.id == db_booking.flight_id).update(
-        {"available_seats": models.Flight.available_seats + db_booking.seats},
-        synchronize_session=False
-    )
-    
     db.commit()
     db.refresh(db_booking)
+
+    # Let the worker know the flight's seat count changed
+    redis_client.publish("seat_updates", str(db_booking.flight_id))
     
     return db_booking
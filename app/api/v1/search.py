@@ -1,42 +1,206 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas import schemas
-from app.core.redis_client import get_redis
-from typing import List
-import redis
-from datetime import date, timedelta
-from app.api.dependencies import get_db
-from app.models import models
+from app.core.async_database import get_async_db
+from app.core.async_redis_client import get_async_redis
+from app.core.config import settings
+from app.core import metrics
+from app.services import search_service, response_cache, path_store, online_search
+from typing import List, Literal, Optional
+import redis.asyncio as aioredis
+import asyncio
+from datetime import date, datetime, timedelta
 import json
 
 router = APIRouter()
 
+flight_paths_adapter = TypeAdapter(List[schemas.FlightPath])
+
 @router.get("/search", response_model=List[schemas.FlightPath])
-def search_flights(
-    source: str, 
-    destination: str, 
-    date: date, 
-    db: Session = Depends(get_db),
-    redis_client: redis.Redis = Depends(get_redis)
+async def search_flights(
+    source: str,
+    destination: str,
+    date: date,
+    sort: Literal["price", "departure", "duration", "stops"] = "price",
+    max_stops: Optional[int] = Query(None, ge=0, description="0 returns every direct flight, not only the top paths"),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    departure_after: Optional[datetime] = None,
+    departure_before: Optional[datetime] = None,
+    passengers: int = Query(1, ge=1, le=9, description="Paths with a leg that has fewer seats left are left out"),
+    limit: Optional[int] = Query(None, ge=1, le=100, description="Page size; the next page's cursor is returned in X-Next-Cursor"),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    redis_client: aioredis.Redis = Depends(get_async_redis)
 ):
-    redis_key = f"{source}-{destination}-{date.strftime('%Y-%m-%d')}"
-    cached_paths = redis_client.get(redis_key)
-    
-    if not cached_paths:
+    try:
+        offset = search_service.decode_cursor(cursor) if cursor else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    filtered = any(value is not None for value in (max_stops, min_price, max_price, departure_after, departure_before))
+    default_query = sort == "price" and not filtered and limit is None and not cursor
+
+    if default_query:
+        # Serve popular routes straight from the pre-serialized response cache
+        cached_response = await response_cache.get_cached_response(redis_client, source, destination, date)
+        metrics.search_cache_lookups.labels("response", "miss" if cached_response is None else "hit").inc()
+        if cached_response is not None:
+            # The cached response is a snapshot; seat counts are overlaid live
+            flight_paths = json.loads(cached_response)
+            seats = await search_service.fetch_seat_counts(
+                db, redis_client, [flight["id"] for path in flight_paths for flight in path["flights"]]
+            )
+            flight_paths = search_service.overlay_live_seats_json(flight_paths, seats, passengers)
+            return Response(content=json.dumps(flight_paths), media_type="application/json")
+
+    if max_stops == 0:
+        results, next_offset = await search_service.search_direct_flights(
+            db, redis_client, source, destination, date,
+            sort=sort, min_price=min_price, max_price=max_price,
+            departure_after=departure_after, departure_before=departure_before,
+            passengers=passengers, offset=offset, limit=limit,
+        )
+        return paged_response(flight_paths_adapter.dump_json(results), next_offset)
+
+    cached_paths, summary = await path_store.get_paths_with_summary(redis_client, source, destination, date)
+    metrics.search_cache_lookups.labels("paths", "miss" if cached_paths is None else "hit").inc()
+
+    complete = True
+    if cached_paths is not None:
+        flight_paths_ids = json.loads(cached_paths)
+        summary = json.loads(summary) if summary else None
+    elif settings.ONLINE_SEARCH_ENABLED:
+        # Not precomputed (new route or date, or Redis was flushed); search now within the latency budget
+        flight_paths_ids, summary, complete = await online_search.find_paths(redis_client, source, destination, date)
+    else:
         return []
 
-    flight_paths_ids = json.loads(cached_paths)
-    
-    results = []
-    for path_ids in flight_paths_ids:
-        flights_in_path = db.query(models.Flight).filter(models.Flight.id.in_(path_ids)).all()
-        
-        # Ensure the order is the same as in the path_ids and all flights were found
-        if len(flights_in_path) == len(path_ids):
-            sorted_flights = sorted(flights_in_path, key=lambda f: path_ids.index(str(f.id)))
-            total_price = sum(f.price for f in sorted_flights)
-            results.append(schemas.FlightPath(flights=sorted_flights, total_price=total_price))
+    if default_query:
+        # Hydrate every flight across all paths in one go instead of one query per path
+        all_flight_ids = [flight_id for path_ids in flight_paths_ids for flight_id in path_ids]
+        flights_by_id, seats = await asyncio.gather(
+            search_service.hydrate_flights(all_flight_ids, db, redis_client),
+            search_service.fetch_seat_counts(db, redis_client, all_flight_ids),
+        )
+
+        results = search_service.build_flight_paths(flight_paths_ids, flights_by_id)
+        if complete:
+            # Cache every path; availability is applied per request
+            payload = flight_paths_adapter.dump_json(results)
+            await response_cache.store_response(redis_client, source, destination, date, payload, all_flight_ids)
+
+        payload = flight_paths_adapter.dump_json(search_service.overlay_live_seats(results, seats, passengers))
+        if not complete:
+            # Cut short by the latency budget; the partial answer was not cached
+            return Response(content=payload, media_type="application/json", headers={"X-Search-Partial": "true"})
+        return Response(content=payload, media_type="application/json")
+
+    flights_by_id = {}
+    if summary is None:
+        # Stored before summaries existed; derive it from the flights themselves
+        flights_by_id = await search_service.hydrate_flights(
+            [flight_id for path_ids in flight_paths_ids for flight_id in path_ids], db, redis_client
+        )
+        flight_paths_ids, summary = search_service.summarize_hydrated_paths(flight_paths_ids, flights_by_id)
+
+    # Filter, sort and paginate on the summary and live seat counts, then load only the flights of the page
+    selected = search_service.select_paths(
+        summary, sort=sort, max_stops=max_stops, min_price=min_price, max_price=max_price,
+        departure_after=departure_after, departure_before=departure_before,
+    )
+    seats = await search_service.fetch_seat_counts(
+        db, redis_client, [flight_id for i in selected for flight_id in flight_paths_ids[i]]
+    )
+    selected = [i for i in selected if search_service.has_seats(flight_paths_ids[i], seats, passengers)]
+    end = offset + limit if limit is not None else len(selected)
+    page = [flight_paths_ids[i] for i in selected[offset:end]]
+    if not flights_by_id:
+        flights_by_id = await search_service.hydrate_flights(
+            [flight_id for path_ids in page for flight_id in path_ids], db, redis_client
+        )
+
+    results = search_service.overlay_live_seats(search_service.build_flight_paths(page, flights_by_id), seats, passengers)
+    response = paged_response(flight_paths_adapter.dump_json(results), end if end < len(selected) else None)
+    if not complete:
+        response.headers["X-Search-Partial"] = "true"
+    return response
+
+
+@router.get("/search/flex", response_model=schemas.FlexSearchResult)
+async def flex_search_flights(
+    source: str,
+    destination: str,
+    date: date,
+    days: int = Query(3, ge=0, le=7, description="Days before and after `date` to include in the fare calendar"),
+    passengers: int = Query(1, ge=1, le=9),
+    db: AsyncSession = Depends(get_async_db),
+    redis_client: aioredis.Redis = Depends(get_async_redis)
+):
+    """
+    Cheapest fare for every day within `days` of `date`, plus the full paths
+    for `date` itself. All days are read in one round trip and every flight
+    needed is hydrated in one batch.
+    """
+    dates = [date + timedelta(days=offset) for offset in range(-days, days + 1)]
+    stored = await path_store.get_paths_for_dates(redis_client, source, destination, dates)
+
+    paths_by_date = {}
+    summaries = {}
+    for day, (cached_paths, summary) in zip(dates, stored):
+        if cached_paths is not None:
+            paths_by_date[day] = json.loads(cached_paths)
+            summaries[day] = json.loads(summary) if summary else None
+    metrics.search_cache_lookups.labels("paths", "hit" if date in paths_by_date else "miss").inc()
+
+    complete = True
+    if date not in paths_by_date and settings.ONLINE_SEARCH_ENABLED:
+        paths_by_date[date], summaries[date], complete = await online_search.find_paths(
+            redis_client, source, destination, date
+        )
+
+    # The selected day needs every flight; other days only need theirs when no summary gives the price
+    needed_ids = [flight_id for path_ids in paths_by_date.get(date, []) for flight_id in path_ids]
+    for day, flight_paths_ids in paths_by_date.items():
+        if day != date and summaries[day] is None:
+            needed_ids.extend(flight_id for path_ids in flight_paths_ids for flight_id in path_ids)
+    # Every day's fares only count paths that can still seat the party
+    all_ids = [flight_id for flight_paths_ids in paths_by_date.values() for path_ids in flight_paths_ids for flight_id in path_ids]
+    flights_by_id, seats = await asyncio.gather(
+        search_service.hydrate_flights(needed_ids, db, redis_client),
+        search_service.fetch_seat_counts(db, redis_client, all_ids),
+    )
+
+    calendar = []
+    selected_paths = []
+    for day in dates:
+        flight_paths_ids = paths_by_date.get(day, [])
+        summary = summaries.get(day)
+        if summary is not None:
+            prices = [
+                price for price, path_ids in zip(summary["price"], flight_paths_ids)
+                if search_service.has_seats(path_ids, seats, passengers)
+            ]
+        else:
+            prices = [
+                path.total_price for path in search_service.build_flight_paths(flight_paths_ids, flights_by_id)
+                if search_service.has_seats([flight.id for flight in path.flights], seats, passengers)
+            ]
+        calendar.append(schemas.FareCalendarDay(
+            date=day, cheapest_price=min(prices) if prices else None, path_count=len(prices)
+        ))
+        if day == date:
+            selected_paths = search_service.overlay_live_seats(
+                search_service.build_flight_paths(flight_paths_ids, flights_by_id), seats, passengers
+            )
 
-    return results
+    payload = schemas.FlexSearchResult(calendar=calendar, date=date, paths=selected_paths).model_dump_json()
+    headers = None if complete else {"X-Search-Partial": "true"}
+    return Response(content=payload, media_type="application/json", headers=headers)
 
 
+def paged_response(payload, next_offset):
+    """A JSON response carrying the next page's cursor, if there is one."""
+    headers = {"X-Next-Cursor": search_service.encode_cursor(next_offset)} if next_offset is not None else None
+    return Response(content=payload, media_type="application/json", headers=headers)
@@ -0,0 +1,28 @@
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.core import db_instrumentation
+from app.core.database import engine_options
+
+# Same database as app.core.database, reached through the asyncpg driver
+ASYNC_DATABASE_URL = make_url(settings.DATABASE_URL).set(drivername="postgresql+asyncpg")
+
+def create_async_db_engine(**overrides):
+    """Creates an asyncpg engine with the same pool settings as create_db_engine."""
+    options = engine_options()
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}}
+    options.update(overrides)
+
+    db_engine = create_async_engine(ASYNC_DATABASE_URL, **options)
+    if settings.DB_INSTRUMENTATION:
+        db_instrumentation.instrument_engine(db_engine.sync_engine)
+    return db_engine
+
+async_engine = create_async_db_engine()
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
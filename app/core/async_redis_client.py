@@ -0,0 +1,108 @@
+import time
+
+import redis
+import redis.asyncio as aioredis
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.redis_client import PoolWaitStats, pool_options
+
+
+class InstrumentedAsyncConnectionPool(aioredis.BlockingConnectionPool):
+    """The asyncio counterpart of redis_client.InstrumentedConnectionPool."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    async def get_connection(self, *args, **kwargs):
+        if self.can_get_connection():
+            return await super().get_connection(*args, **kwargs)
+
+        started = time.perf_counter()
+        try:
+            connection = await super().get_connection(*args, **kwargs)
+        except redis.ConnectionError:
+            self.wait_stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - started)
+        return connection
+
+    def stats(self):
+        return {
+            "max_connections": self.max_connections,
+            "in_use": len(self._in_use_connections),
+            "idle": len(self._available_connections),
+            **self.wait_stats.snapshot(),
+        }
+
+
+class InstrumentedAsyncPipeline(aioredis.client.Pipeline):
+    """The asyncio counterpart of redis_client.InstrumentedPipeline."""
+
+    async def execute(self, raise_on_error=True):
+        size = len(self.command_stack)
+        started = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            metrics.observe_redis_pipeline(size, started)
+
+
+class InstrumentedAsyncRedis(aioredis.Redis):
+    """The asyncio counterpart of redis_client.InstrumentedRedis."""
+
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            metrics.observe_redis_command(args[0], started)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedAsyncPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+# One registered AsyncScript per Lua source, shared by every client
+_scripts = {}
+
+
+async def run_async_script(redis_client, source, keys, args):
+    """The asyncio counterpart of redis_client.run_script."""
+    script = _scripts.get(source)
+    if script is None:
+        script = _scripts[source] = redis_client.register_script(source)
+    return await script(keys=keys, args=args, client=redis_client)
+
+
+_pool = None
+_redis_client = None
+
+
+def init_async_redis_pool():
+    """Creates the process-wide asyncio connection pool and client (idempotent)."""
+    global _pool, _redis_client
+    if _redis_client is None:
+        _pool = InstrumentedAsyncConnectionPool.from_url(settings.REDIS_URL, **pool_options())
+        client_class = InstrumentedAsyncRedis if settings.METRICS_ENABLED else aioredis.Redis
+        _redis_client = client_class(connection_pool=_pool)
+    return _redis_client
+
+
+async def close_async_redis_pool():
+    """Disconnects every pooled asyncio connection."""
+    global _pool, _redis_client
+    if _pool is not None:
+        await _pool.disconnect()
+    _pool = None
+    _redis_client = None
+
+
+def get_async_redis():
+    """Returns the shared, pooled asyncio Redis client for this process."""
+    return _redis_client or init_async_redis_pool()
+
+
+def get_async_redis_pool_stats():
+    """In-use, idle and wait counters for the asyncio pool, or None if it was never created."""
+    return _pool.stats() if _pool is not None else None
@@ -1,9 +1,96 @@
+import socket
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str
     REDIS_URL: str
 
+    # SQLAlchemy engine pool
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    # Records per-statement latency and per-request query counts
+    DB_INSTRUMENTATION: bool = False
+
+    # Shared Redis connection pool
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 5.0
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+    REDIS_SOCKET_TIMEOUT: float = 5.0
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 2.0
+
+    # Path precomputation
+    PRECOMPUTE_TOP_K: int = 20
+    PRECOMPUTE_MAX_LEGS: int = 5
+    PRECOMPUTE_MIN_CONNECTION_MINUTES: int = 0
+    PRECOMPUTE_SOURCES_PER_TASK: int = 16
+    PRECOMPUTE_WRITE_BATCH_SIZE: int = 1000
+    # Expiry of stored paths in seconds; 0 keeps them until the next full run replaces them
+    PRECOMPUTE_RESULT_TTL: int = 0
+    # Incremental precomputation in the worker
+    PRECOMPUTE_DEBOUNCE_SECONDS: float = 1.0
+    PRECOMPUTE_MAX_DELAY_SECONDS: float = 10.0
+    PRECOMPUTE_WORKERS: int = 2
+
+    # Airport registry
+    AIRPORTS_REFRESH_INTERVAL: float = 5.0
+    AIRPORTS_CACHE_MAX_AGE: int = 60
+
+    # Bulk flight upload
+    BULK_UPLOAD_CHUNK_SIZE: int = 1000
+
+    # Seat reservations held while a booking's payment is in flight
+    # Covers the wait in the payment queue as well as the payment itself
+    SEAT_RESERVATION_TTL_SECONDS: int = 300
+    RESERVATION_SWEEP_INTERVAL: float = 5.0
+
+    # Payment job queue consumed by the worker
+    PAYMENT_WORKER_CONCURRENCY: int = 16
+    PAYMENT_CONSUMER_NAME: str = socket.gethostname()
+    PAYMENT_JOB_CLAIM_IDLE_MS: int = 60000
+
+    # Write-behind of Redis seat counters to the flights table
+    SEAT_FLUSH_INTERVAL: float = 2.0
+    SEAT_FLUSH_BATCH_SIZE: int = 500
+    SEAT_FLUSH_CONSUMER_NAME: str = socket.gethostname()
+    SEAT_FLUSH_CLAIM_IDLE_MS: int = 60000
+
+    # On-demand path search when a route is missing from the precomputed paths
+    ONLINE_SEARCH_ENABLED: bool = True
+    ONLINE_SEARCH_BUDGET_MS: int = 500
+    # Lease of the cross-process search lock beyond the budget, covering the graph build and the store
+    ONLINE_SEARCH_LOCK_MARGIN_MS: int = 2000
+    ONLINE_SEARCH_RESULT_TTL: int = 300
+    ONLINE_SEARCH_MAX_GRAPHS: int = 8
+    ONLINE_SEARCH_GRAPH_MAX_AGE: float = 60.0
+
+    # Search response cache
+    SEARCH_RESPONSE_CACHE_TTL: int = 300
+
+    # Token subject -> user lookups for authenticated requests
+    PRINCIPAL_CACHE_LOCAL_TTL: float = 5.0
+    PRINCIPAL_CACHE_TTL: int = 300
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    # Put user ID and admin flag in issued tokens so requests skip the lookup;
+    # an admin change then only takes effect once older tokens expire
+    TOKEN_PRINCIPAL_CLAIMS: bool = False
+
+    # Password hashing process pool for the auth endpoints
+    # 0 uses one worker per CPU core
+    PASSWORD_HASH_WORKERS: int = 0
+    # Logins and registrations beyond this many in flight get a 503
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    # Stored hashes with a different cost are rehashed on the next login
+    BCRYPT_ROUNDS: int = 12
+
+    # Prometheus metrics: /metrics on the API, a separate port on the worker
+    METRICS_ENABLED: bool = True
+    WORKER_METRICS_PORT: int = 9100
+
     class Config:
         env_file = ".env"
 
@@ -1,11 +1,36 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import os
 
-DATABASE_URL = os.environ.get("DATABASE_URL")
+from app.core.config import settings
+from app.core import db_instrumentation
 
-engine = create_engine(DATABASE_URL)
+def engine_options():
+    """Pool settings shared by the sync and async engines."""
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
+def create_db_engine(**overrides):
+    """
+    Creates a psycopg2 engine configured from Settings.
+    Every process (API, worker, scripts) should build its engine here.
+    """
+    options = engine_options()
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        options["connect_args"] = {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+    options.update(overrides)
+
+    db_engine = create_engine(settings.DATABASE_URL, **options)
+    if settings.DB_INSTRUMENTATION:
+        db_instrumentation.instrument_engine(db_engine)
+    return db_engine
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
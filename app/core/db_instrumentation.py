@@ -0,0 +1,107 @@
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+# Holds a one-element list with the number of statements run by the current request
+_request_query_count: ContextVar = ContextVar("request_query_count", default=None)
+
+_IN_LIST = re.compile(r"\((?:\s*(?:%\(\w+\)s|\$\d+|\?)\s*,?)+\)")
+_WHITESPACE = re.compile(r"\s+")
+MAX_TRACKED_STATEMENTS = 500
+
+
+def normalize_statement(statement):
+    """Collapses whitespace and expanded IN lists so equivalent statements share one entry."""
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    return _IN_LIST.sub("(?)", statement)
+
+
+class StatementStats:
+    """Latency per normalized SQL statement."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._statements = {}
+
+    def record(self, statement, seconds):
+        key = normalize_statement(statement)
+        with self._lock:
+            entry = self._statements.get(key)
+            if entry is None:
+                if len(self._statements) >= MAX_TRACKED_STATEMENTS:
+                    return
+                entry = self._statements[key] = {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    def snapshot(self, limit=50):
+        with self._lock:
+            items = [(statement, dict(entry)) for statement, entry in self._statements.items()]
+        items.sort(key=lambda item: item[1]["total_seconds"], reverse=True)
+        return [
+            {
+                "statement": statement,
+                "count": entry["count"],
+                "total_ms": round(entry["total_seconds"] * 1000, 3),
+                "mean_ms": round(entry["total_seconds"] * 1000 / entry["count"], 3),
+                "max_ms": round(entry["max_seconds"] * 1000, 3),
+            }
+            for statement, entry in items[:limit]
+        ]
+
+
+class RequestQueryStats:
+    """Number of statements issued per request, grouped by route."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route, query_count):
+        with self._lock:
+            entry = self._routes.setdefault(route, {"requests": 0, "queries": 0, "max_queries": 0})
+            entry["requests"] += 1
+            entry["queries"] += query_count
+            entry["max_queries"] = max(entry["max_queries"], query_count)
+
+    def snapshot(self):
+        with self._lock:
+            routes = {route: dict(entry) for route, entry in self._routes.items()}
+        for entry in routes.values():
+            entry["mean_queries"] = round(entry["queries"] / entry["requests"], 2)
+        return routes
+
+
+statement_stats = StatementStats()
+request_query_stats = RequestQueryStats()
+
+
+def instrument_engine(engine):
+    """Attaches cursor-level listeners that time every statement and count it against the current request."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        statement_stats.record(statement, elapsed)
+        counter = _request_query_count.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+def start_request():
+    """Begins counting statements for the current request; returns the counter."""
+    counter = [0]
+    _request_query_count.set(counter)
+    return counter
+
+
+def finish_request(route, counter):
+    request_query_stats.record(route, counter[0])
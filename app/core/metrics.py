@@ -0,0 +1,62 @@
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+# Prometheus metrics observed directly by the code paths they describe.
+# Each observation is a lock-protected increment, a few microseconds at
+# most. Counters that already exist as per-process stats snapshots are
+# exported by app/services/metrics_collectors instead.
+
+# Shared by the HTTP and Redis latency histograms; Redis commands mostly
+# fall in the sub-millisecond buckets, requests in the upper ones.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+db_queries_per_request = Histogram(
+    "db_queries_per_request", "SQL statements issued per HTTP request (with DB_INSTRUMENTATION).",
+    ["route"], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+redis_command_duration = Histogram(
+    "redis_command_duration_seconds", "Latency of single Redis commands, blocking reads included.",
+    ["command"], buckets=LATENCY_BUCKETS,
+)
+redis_pipeline_duration = Histogram(
+    "redis_pipeline_duration_seconds", "Latency of Redis pipeline executions.", buckets=LATENCY_BUCKETS,
+)
+redis_pipeline_commands = Histogram(
+    "redis_pipeline_commands", "Commands per Redis pipeline execution.",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000),
+)
+lock_wait = Histogram(
+    "redis_lock_wait_seconds", "Time spent waiting for a RedisLock.",
+    ["lock", "outcome"], buckets=LATENCY_BUCKETS,
+)
+booking_outcomes = Counter(
+    "booking_outcomes", "Booking attempts by outcome.", ["outcome"],
+)
+search_cache_lookups = Counter(
+    "search_cache_lookups", "Search cache lookups by cache and result.", ["cache", "result"],
+)
+precompute_duration = Histogram(
+    "precompute_duration_seconds", "Duration of a precomputation unit: a whole run or one date.",
+    ["mode", "unit"], buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+
+
+def observe_redis_command(command, started):
+    if isinstance(command, bytes):
+        command = command.decode("utf-8", "replace")
+    redis_command_duration.labels(str(command).upper()).observe(time.perf_counter() - started)
+
+
+def observe_redis_pipeline(size, started):
+    redis_pipeline_duration.observe(time.perf_counter() - started)
+    redis_pipeline_commands.observe(size)
+
+
+def latest():
+    """The default registry in the Prometheus text format, with its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,96 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.core import security
+from app.core.config import settings
+
+
+class HashingPoolSaturated(Exception):
+    """Raised instead of queueing when `max_pending` hash operations are already waiting or running."""
+
+
+class PasswordHashingPool:
+    """
+    Runs bcrypt on a dedicated pool of `workers` processes, so a burst of
+    logins neither holds the API's request threads nor competes for its GIL.
+
+    At most `max_pending` operations may be queued or running at once; any
+    more fail immediately with HashingPoolSaturated rather than waiting
+    behind work that would outlast the client's patience anyway. Passwords
+    are hashed with a cost of `rounds`, and hashes with another cost are
+    replaced when their owner next logs in.
+    """
+
+    def __init__(self, workers, max_pending, rounds):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._pending = 0
+        self._stats = {"completed": 0, "rejected": 0, "rehashed": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                # Spawned rather than forked: the API process runs threads holding locks
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    async def _run(self, func, *args):
+        # Only touched from the event loop, so the counter needs no lock
+        if self._pending >= self.max_pending:
+            self._stats["rejected"] += 1
+            raise HashingPoolSaturated(f"{self._pending} password hash operations already pending")
+
+        self._pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._pending -= 1
+            elapsed = time.perf_counter() - started
+            self._stats["completed"] += 1
+            self._stats["total_seconds"] += elapsed
+            self._stats["max_seconds"] = max(self._stats["max_seconds"], elapsed)
+
+    async def hash(self, password):
+        """Hashes a new password at the configured cost."""
+        return await self._run(security.get_password_hash, password, self.rounds)
+
+    async def verify(self, password, hashed_password):
+        """Returns (valid, new_hash), where new_hash is set when the stored hash should be replaced."""
+        valid, new_hash = await self._run(security.verify_and_rehash, password, hashed_password, self.rounds)
+        if new_hash is not None:
+            self._stats["rehashed"] += 1
+        return valid, new_hash
+
+    def snapshot(self):
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "rounds": self.rounds,
+            "pending": self._pending,
+            **self._stats,
+            "total_seconds": round(self._stats["total_seconds"], 6),
+            "max_seconds": round(self._stats["max_seconds"], 6),
+        }
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+
+password_hashing_pool = PasswordHashingPool(
+    settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1,
+    settings.PASSWORD_HASH_MAX_PENDING,
+    settings.BCRYPT_ROUNDS,
+)
@@ -1,6 +1,151 @@
+import threading
+import time
+
 import redis
-import os
+
+from app.core import metrics
+from app.core.config import settings
+
+
+class PoolWaitStats:
+    """Counts how often, and for how long, callers waited for a free pooled connection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.wait_timeouts = 0
+        self.total_wait_seconds = 0.0
+
+    def record(self, waited_seconds, timed_out=False):
+        with self._lock:
+            self.waits += 1
+            self.total_wait_seconds += waited_seconds
+            if timed_out:
+                self.wait_timeouts += 1
+
+    def snapshot(self):
+        return {
+            "waits": self.waits,
+            "wait_timeouts": self.wait_timeouts,
+            "total_wait_seconds": round(self.total_wait_seconds, 6),
+        }
+
+
+class InstrumentedConnectionPool(redis.BlockingConnectionPool):
+    """
+    A BlockingConnectionPool that records how long callers wait when every
+    connection is checked out.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def get_connection(self, *args, **kwargs):
+        if not self.pool.empty():
+            return super().get_connection(*args, **kwargs)
+
+        started = time.perf_counter()
+        try:
+            connection = super().get_connection(*args, **kwargs)
+        except redis.ConnectionError:
+            self.wait_stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - started)
+        return connection
+
+    def stats(self):
+        return {
+            "max_connections": self.max_connections,
+            "in_use": len(self._get_in_use_connections()),
+            "idle": len(self._get_free_connections()),
+            **self.wait_stats.snapshot(),
+        }
+
+
+class InstrumentedPipeline(redis.client.Pipeline):
+    """A Pipeline that records each execution's latency and number of commands."""
+
+    def execute(self, raise_on_error=True):
+        size = len(self.command_stack)
+        started = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            metrics.observe_redis_pipeline(size, started)
+
+
+class InstrumentedRedis(redis.Redis):
+    """A Redis client that records the latency of every command, by command name."""
+
+    def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            metrics.observe_redis_command(args[0], started)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+# One registered Script per Lua source, shared by every client and pipeline
+_scripts = {}
+
+
+def run_script(redis_client, source, keys, args):
+    """
+    Runs a Lua script with EVALSHA on a client or a pipeline, so only its
+    SHA is sent. A server that does not know the script yet loads it once.
+    """
+    script = _scripts.get(source)
+    if script is None:
+        script = _scripts[source] = redis_client.register_script(source)
+    return script(keys=keys, args=args, client=redis_client)
+
+
+def pool_options():
+    """Connection pool settings shared by the blocking and asyncio clients."""
+    return {
+        "max_connections": settings.REDIS_MAX_CONNECTIONS,
+        "timeout": settings.REDIS_POOL_TIMEOUT,
+        "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL,
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+    }
+
+
+_pool = None
+_redis_client = None
+_init_lock = threading.Lock()
+
+
+def init_redis_pool():
+    """Creates the process-wide connection pool and client (idempotent)."""
+    global _pool, _redis_client
+    with _init_lock:
+        if _redis_client is None:
+            _pool = InstrumentedConnectionPool.from_url(settings.REDIS_URL, **pool_options())
+            client_class = InstrumentedRedis if settings.METRICS_ENABLED else redis.Redis
+            _redis_client = client_class(connection_pool=_pool)
+    return _redis_client
+
+
+def close_redis_pool():
+    """Disconnects every pooled connection; the next get_redis() call starts a new pool."""
+    global _pool, _redis_client
+    with _init_lock:
+        if _pool is not None:
+            _pool.disconnect()
+        _pool = None
+        _redis_client = None
+
 
 def get_redis():
-    redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-    return redis.from_url(redis_url)
+    """Returns the shared, pooled Redis client for this process."""
+    return _redis_client or init_redis_pool()
+
+
+def get_redis_pool_stats():
+    """In-use, idle and wait counters for the blocking pool, or None if it was never created."""
+    return _pool.stats() if _pool is not None else None
@@ -1,20 +1,229 @@
+import threading
 import time
+import uuid
+
 import redis
 
+from app.core import metrics
+from app.core.redis_client import run_script
+
+# A waiter that has not retried within this long is assumed gone and
+# loses its place in the queue.
+WAITER_HEARTBEAT_MS = 3000
+
+# Upper bound on a single BLPOP, kept below REDIS_SOCKET_TIMEOUT. Waiters
+# also retry after this long, which covers holders whose lease expired
+# without a release.
+WAKE_POLL_SECONDS = 1.0
+
+# Takes the lock when it is free and the caller is first in line (or nobody
+# is waiting); otherwise queues the caller by ticket and returns 0.
+ACQUIRE_SCRIPT = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local stale = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now_ms)
+if #stale > 0 then
+    redis.call('ZREM', KEYS[2], unpack(stale))
+    redis.call('ZREM', KEYS[3], unpack(stale))
+end
+local head = redis.call('ZRANGE', KEYS[2], 0, 0)[1]
+if (not head or head == ARGV[1]) and redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    redis.call('ZREM', KEYS[3], ARGV[1])
+    return 1
+end
+if not redis.call('ZSCORE', KEYS[2], ARGV[1]) then
+    redis.call('ZADD', KEYS[2], redis.call('INCR', KEYS[4]), ARGV[1])
+end
+redis.call('ZADD', KEYS[3], now_ms + tonumber(ARGV[3]), ARGV[1])
+for i = 2, 4 do
+    redis.call('PEXPIRE', KEYS[i], ARGV[3] * 2)
+end
+return 0
+"""
+
+# Deletes the lock only if the caller still owns it. Returns {0} for a
+# non-owner, otherwise {1} plus the token of the first waiter, whose wake
+# list the caller then pushes to (its name is not known before the script).
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return {0}
+end
+redis.call('DEL', KEYS[1])
+return {1, redis.call('ZRANGE', KEYS[2], 0, 0)[1]}
+"""
+
+EXTEND_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+"""
+
+LEAVE_QUEUE_SCRIPT = """
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('DEL', KEYS[3])
+return 1
+"""
+
+
+class LockStats:
+    """Per-lock-name contention counters for this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _entry(self, name):
+        entry = self._stats.get(name)
+        if entry is None:
+            entry = self._stats[name] = {
+                "acquisitions": 0,
+                "contended": 0,
+                "timeouts": 0,
+                "lost": 0,
+                "total_wait_seconds": 0.0,
+                "max_wait_seconds": 0.0,
+            }
+        return entry
+
+    def record_wait(self, name, waited_seconds, acquired, contended):
+        metrics.lock_wait.labels(name, "acquired" if acquired else "timeout").observe(waited_seconds)
+        with self._lock:
+            entry = self._entry(name)
+            if acquired:
+                entry["acquisitions"] += 1
+            else:
+                entry["timeouts"] += 1
+            if contended:
+                entry["contended"] += 1
+            entry["total_wait_seconds"] += waited_seconds
+            entry["max_wait_seconds"] = max(entry["max_wait_seconds"], waited_seconds)
+
+    def record_lost(self, name):
+        """Counts releases or extensions attempted after the lease had already expired."""
+        with self._lock:
+            self._entry(name)["lost"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {
+                    **entry,
+                    "total_wait_seconds": round(entry["total_wait_seconds"], 6),
+                    "max_wait_seconds": round(entry["max_wait_seconds"], 6),
+                }
+                for name, entry in self._stats.items()
+            }
+
+
+lock_stats = LockStats()
+
+
 class RedisLock:
-    def __init__(self, redis_client: redis.Redis, lock_key: str, timeout: int = 10):
+    """
+    A distributed lock owned by a random token.
+
+    Acquisition is a single atomic `SET NX PX`, so a crashed holder can never
+    leave the lock without an expiry, and release or extension only succeed
+    for the current owner. Waiters queue in arrival order and block on their
+    own wake list instead of polling; the releasing owner wakes the first one.
+
+    `timeout` bounds how long to wait for the lock, `lease_ms` how long it is
+    held before expiring (defaults to `timeout`). Metrics are grouped by
+    `name`, which defaults to the lock key; pass a shared name for per-entity
+    keys such as `lock:flight:{id}`.
+    """
+
+    def __init__(self, redis_client: redis.Redis, lock_key: str, timeout: float = 10, lease_ms: int = None, name: str = None):
         self.redis_client = redis_client
         self.lock_key = lock_key
         self.timeout = timeout
+        self.lease_ms = lease_ms or int(timeout * 1000)
+        self.name = name or lock_key
+        self.token = None
+        self._queue_key = f"{lock_key}:queue"
+        self._heartbeat_key = f"{lock_key}:heartbeat"
+        self._ticket_key = f"{lock_key}:tickets"
+
+    def _wake_key(self, token):
+        return f"{self.lock_key}:wake:{token}"
+
+    def _try_acquire(self, token):
+        return run_script(
+            self.redis_client, ACQUIRE_SCRIPT,
+            keys=[self.lock_key, self._queue_key, self._heartbeat_key, self._ticket_key],
+            args=[token, self.lease_ms, WAITER_HEARTBEAT_MS],
+        ) == 1
+
+    def acquire(self, blocking: bool = True):
+        """Returns True once the lock is held, or False if `timeout` (or a non-blocking attempt) ran out."""
+        token = uuid.uuid4().hex
+        wake_key = self._wake_key(token)
+        started = time.monotonic()
+        deadline = started + self.timeout
+        contended = False
+
+        while True:
+            if self._try_acquire(token):
+                self.token = token
+                lock_stats.record_wait(self.name, time.monotonic() - started, acquired=True, contended=contended)
+                return True
+
+            contended = True
+            remaining = deadline - time.monotonic()
+            if not blocking or remaining <= 0:
+                run_script(
+                    self.redis_client, LEAVE_QUEUE_SCRIPT,
+                    keys=[self._queue_key, self._heartbeat_key, wake_key], args=[token],
+                )
+                lock_stats.record_wait(self.name, time.monotonic() - started, acquired=False, contended=contended)
+                return False
+
+            self.redis_client.blpop([wake_key], timeout=min(remaining, WAKE_POLL_SECONDS))
+
+    def release(self):
+        """Releases the lock if this instance still owns it. Returns False if the lease had expired."""
+        if self.token is None:
+            return False
+        released, *head = run_script(
+            self.redis_client, RELEASE_SCRIPT, keys=[self.lock_key, self._queue_key], args=[self.token]
+        )
+        self.token = None
+        if head:
+            # Wake the first waiter; one that misses it retries within WAKE_POLL_SECONDS
+            wake_key = self._wake_key(head[0].decode("utf-8"))
+            with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.lpush(wake_key, 1)
+                pipe.pexpire(wake_key, WAITER_HEARTBEAT_MS)
+                pipe.execute()
+        released = released == 1
+        if not released:
+            lock_stats.record_lost(self.name)
+            print(f"Lock {self.lock_key} expired before it was released")
+        return released
+
+    def extend(self, lease_ms: int = None):
+        """Resets the lease to `lease_ms` (default: the original lease). Returns False if the lock was lost."""
+        if self.token is None:
+            return False
+        extended = run_script(
+            self.redis_client, EXTEND_SCRIPT, keys=[self.lock_key], args=[self.token, lease_ms or self.lease_ms]
+        ) == 1
+        if not extended:
+            lock_stats.record_lost(self.name)
+        return extended
 
     def __enter__(self):
-        start_time = time.time()
-        while time.time() - start_time < self.timeout:
-            if self.redis_client.setnx(self.lock_key, "locked"):
-                self.redis_client.expire(self.lock_key, self.timeout)
-                return self
-            time.sleep(0.1)
-        raise TimeoutError("Could not acquire lock")
+        if not self.acquire():
+            raise TimeoutError("Could not acquire lock")
+        return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        self.redis_client.delete(self.lock_key)
+        self.release()
+
+
+def get_lock_stats():
+    """Contention metrics of every lock used by this process."""
+    return lock_stats.snapshot()
@@ -1,7 +1,7 @@
 from datetime import datetime, timedelta
 from typing import Optional
+import bcrypt
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pydantic import BaseModel
 
 # Configuration
@@ -9,16 +9,37 @@ SECRET_KEY = "your-secret-key"  # In production, use a strong, randomly generate
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt only uses the first 72 bytes of a password
+BCRYPT_MAX_PASSWORD_BYTES = 72
+DEFAULT_BCRYPT_ROUNDS = 12
 
 class TokenData(BaseModel):
     username: Optional[str] = None
 
+def _secret(password):
+    return password.encode("utf-8")[:BCRYPT_MAX_PASSWORD_BYTES]
+
+def hash_rounds(hashed_password):
+    """The cost factor a bcrypt hash was created with, e.g. 12 for `$2b$12$...`."""
+    return int(hashed_password.split("$")[2])
+
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return bcrypt.checkpw(_secret(plain_password), hashed_password.encode("utf-8"))
+
+def get_password_hash(password, rounds=DEFAULT_BCRYPT_ROUNDS):
+    return bcrypt.hashpw(_secret(password), bcrypt.gensalt(rounds)).decode("utf-8")
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def verify_and_rehash(plain_password, hashed_password, rounds=DEFAULT_BCRYPT_ROUNDS):
+    """
+    Checks a password and, if it is correct but was hashed with a different
+    cost than `rounds`, also returns a new hash at that cost.
+    Returns (valid, new_hash or None).
+    """
+    if not verify_password(plain_password, hashed_password):
+        return False, None
+    if hash_rounds(hashed_password) == rounds:
+        return True, None
+    return True, get_password_hash(plain_password, rounds)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
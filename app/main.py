@@ -1,12 +1,27 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1 import admin, search, booking, airports, auth
-from app.core.database import engine
-from app.models import models
+from app.core.config import settings
+from app.core import db_instrumentation, metrics
+from app.core.password_hashing import password_hashing_pool
+from app.core.redis_client import init_redis_pool, close_redis_pool
+from app.core.async_redis_client import init_async_redis_pool, close_async_redis_pool
+from app.services import booking_events, metrics_collectors, path_store
 
-models.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One Redis connection pool per process, shared by every request
+    path_store.require_single_instance(init_redis_pool())
+    init_async_redis_pool()
+    yield
+    await booking_events.notifier.stop()
+    password_hashing_pool.shutdown()
+    await close_async_redis_pool()
+    close_redis_pool()
 
-app = FastAPI(title="Flight Management System")
+app = FastAPI(title="Flight Management System", lifespan=lifespan)
 
 # Set up CORS
 app.add_middleware(
@@ -15,8 +30,45 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Next-Cursor", "X-Search-Partial"],
 )
 
+if settings.DB_INSTRUMENTATION:
+    @app.middleware("http")
+    async def count_db_queries(request: Request, call_next):
+        counter = db_instrumentation.start_request()
+        response = await call_next(request)
+        route = request.scope.get("route")
+        db_instrumentation.finish_request(route.path if route else request.url.path, counter)
+        if route:
+            metrics.db_queries_per_request.labels(route.path).observe(counter[0])
+        response.headers["X-DB-Query-Count"] = str(counter[0])
+        return response
+
+if settings.METRICS_ENABLED:
+    metrics_collectors.register_api_collectors()
+
+    @app.middleware("http")
+    async def time_requests(request: Request, call_next):
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # Labelled by route template so path parameters don't multiply
+            # the series; requests that matched no route share one label
+            route = request.scope.get("route")
+            metrics.http_request_duration.labels(
+                request.method, route.path if route else "unmatched", str(status)
+            ).observe(time.perf_counter() - started)
+
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        body, content_type = metrics.latest()
+        return Response(content=body, media_type=content_type)
+
 app.include_router(admin.router, prefix="/admin", tags=["admin"])
 app.include_router(search.router, prefix="/api/v1", tags=["search"])
 app.include_router(booking.router, prefix="/api/v1", tags=["booking"])
@@ -0,0 +1,30 @@
+from alembic import context
+
+from app.core.config import settings
+from app.core.database import create_db_engine
+from app.models import models
+
+target_metadata = models.Base.metadata
+
+
+def run_migrations_offline():
+    """Prints the SQL instead of running it (`alembic upgrade head --sql`)."""
+    context.configure(url=settings.DATABASE_URL, target_metadata=target_metadata, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    # No statement timeout: building an index on a large table can take a while
+    engine = create_db_engine(pool_size=1, max_overflow=0, connect_args={})
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+    engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
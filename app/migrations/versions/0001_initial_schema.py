@@ -0,0 +1,76 @@
+"""Initial schema: users, flights and bookings
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+
+Databases created by `Base.metadata.create_all` before migrations were
+introduced already have these tables; they are left as they are and only
+recorded as being at this revision.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_context().as_sql:
+        existing = set()
+    else:
+        existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", UUID(as_uuid=True), primary_key=True),
+            sa.Column("username", sa.String(), nullable=False),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("is_admin", sa.Boolean()),
+        )
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    if "flights" not in existing:
+        op.create_table(
+            "flights",
+            sa.Column("id", UUID(as_uuid=True), primary_key=True),
+            sa.Column("flight_number", sa.String()),
+            sa.Column("source", sa.String(), nullable=False),
+            sa.Column("destination", sa.String(), nullable=False),
+            sa.Column("departure_ts", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("arrival_ts", sa.DateTime(timezone=True)),
+            sa.Column("total_seats", sa.Integer(), nullable=False),
+            sa.Column("available_seats", sa.Integer(), nullable=False),
+            sa.Column("price", sa.Numeric(10, 2), nullable=False),
+            sa.Column("version", sa.BigInteger()),
+            sa.Column("created_at", sa.DateTime(timezone=True)),
+            sa.Column("updated_at", sa.DateTime(timezone=True)),
+        )
+        op.create_index("ix_flights_flight_number", "flights", ["flight_number"])
+        op.create_index(
+            "uq_flights_flight_number_departure_ts", "flights", ["flight_number", "departure_ts"], unique=True
+        )
+
+    if "bookings" not in existing:
+        op.create_table(
+            "bookings",
+            sa.Column("id", UUID(as_uuid=True), primary_key=True),
+            sa.Column("user_id", UUID(as_uuid=True), sa.ForeignKey("users.id")),
+            sa.Column("flight_id", UUID(as_uuid=True), sa.ForeignKey("flights.id")),
+            sa.Column("seats", sa.Integer(), nullable=False),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("payment_ref", sa.String()),
+            sa.Column("created_at", sa.DateTime(timezone=True)),
+            sa.Column("updated_at", sa.DateTime(timezone=True)),
+        )
+
+
+def downgrade():
+    op.drop_table("bookings")
+    op.drop_table("flights")
+    op.drop_table("users")
@@ -0,0 +1,41 @@
+"""Indexes for bookings by user, flights by route and date, and keyset pagination
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+Built with CREATE INDEX CONCURRENTLY so a live database keeps taking writes.
+The unique (flight_number, departure_ts) index is only created if missing,
+for databases that predate it; that step fails if duplicate flights exist,
+which must then be merged first.
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_bookings_user_id_created_at_id", "bookings", "user_id, created_at, id"),
+    ("ix_flights_source_destination_departure_ts_id", "flights", "source, destination, departure_ts, id"),
+    ("ix_flights_departure_ts_id", "flights", "departure_ts, id"),
+]
+
+
+def upgrade():
+    # CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_flights_flight_number_departure_ts "
+            "ON flights (flight_number, departure_ts)"
+        )
+        for name, table, columns in INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _, _ in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, Integer, String, DateTime, Numeric, BigInteger, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Numeric, BigInteger, ForeignKey, Boolean, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -23,6 +23,15 @@ class Flight(Base):
 
     bookings = relationship("Booking", back_populates="flight")
 
+    __table_args__ = (
+        # Natural key used by the bulk upload upsert (INSERT ... ON CONFLICT)
+        Index("uq_flights_flight_number_departure_ts", "flight_number", "departure_ts", unique=True),
+        # Route lookups within a departure window, paginated by (departure_ts, id)
+        Index("ix_flights_source_destination_departure_ts_id", "source", "destination", "departure_ts", "id"),
+        # Flights of a day (on-demand search) and the unfiltered admin listing
+        Index("ix_flights_departure_ts_id", "departure_ts", "id"),
+    )
+
 
 class Booking(Base):
     __tablename__ = "bookings"
@@ -39,6 +48,11 @@ class Booking(Base):
     flight = relationship("Flight", back_populates="bookings")
     user = relationship("User", back_populates="bookings")
 
+    __table_args__ = (
+        # A user's bookings, newest first, with keyset pagination
+        Index("ix_bookings_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+
 
 class User(Base):
     __tablename__ = "users"
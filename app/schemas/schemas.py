@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from uuid import UUID
-from datetime import datetime
+from datetime import date, datetime
 from typing import List
 
 class FlightBase(BaseModel):
@@ -26,6 +26,16 @@ class FlightPath(BaseModel):
     flights: List[Flight]
     total_price: float
 
+class FareCalendarDay(BaseModel):
+    date: date
+    cheapest_price: float | None = None
+    path_count: int
+
+class FlexSearchResult(BaseModel):
+    calendar: List[FareCalendarDay]
+    date: date
+    paths: List[FlightPath]
+
 class BookingBase(BaseModel):
     flight_id: UUID
     seats: int
@@ -0,0 +1,111 @@
+"""
+Checks that the hot lookups can be served by their indexes.
+
+Runs EXPLAIN on each query with sequential scans disabled, so that the
+check does not depend on how many rows the database holds (the planner
+rightly prefers a scan on a small table). A query whose plan still reads
+its table sequentially, or does not use the expected index, fails the
+check and the script exits with status 1.
+
+Usage:
+    PYTHONPATH=. python app/scripts/check_query_plans.py
+
+tests/test_query_plans.py runs the same checks under pytest.
+"""
+import json
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, text, tuple_
+
+from app.core.database import SessionLocal
+from app.models import models
+from app.services.pagination import encode_keyset_cursor, keyset_query
+
+
+def hot_queries():
+    """(name, statement, index the plan must use) for every lookup that should never scan its table."""
+    user_id = uuid.uuid4()
+    day = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    cursor = encode_keyset_cursor(day, uuid.uuid4())
+    user_bookings = select(models.Booking).where(models.Booking.user_id == user_id)
+    route = select(models.Flight).where(
+        models.Flight.source == "Delhi", models.Flight.destination == "Mumbai",
+        models.Flight.departure_ts >= day, models.Flight.departure_ts < day + timedelta(days=7),
+    )
+    window = select(models.Flight).where(models.Flight.departure_ts >= day)
+    booking_order = (models.Booking.created_at, models.Booking.id)
+    flight_order = (models.Flight.departure_ts, models.Flight.id)
+
+    return [
+        ("bookings: first page", keyset_query(user_bookings, *booking_order, limit=20, descending=True),
+         "ix_bookings_user_id_created_at_id"),
+        ("bookings: next page", keyset_query(user_bookings, *booking_order, cursor=cursor, limit=20, descending=True),
+         "ix_bookings_user_id_created_at_id"),
+        ("admin flights: route and window", keyset_query(route, *flight_order, limit=100),
+         "ix_flights_source_destination_departure_ts_id"),
+        ("admin flights: next page", keyset_query(window, *flight_order, cursor=cursor, limit=100),
+         "ix_flights_departure_ts_id"),
+        ("online search: flights of a day",
+         select(models.Flight).where(models.Flight.departure_ts >= day, models.Flight.departure_ts < day + timedelta(days=1)),
+         "ix_flights_departure_ts_id"),
+        ("bulk upload: existing flights of a chunk",
+         select(models.Flight).where(
+             tuple_(models.Flight.flight_number, models.Flight.departure_ts).in_([("AI-202", day), ("AI-203", day)])
+         ),
+         "uq_flights_flight_number_departure_ts"),
+        ("login: user by name", select(models.User).where(models.User.username == "adminuser"),
+         "ix_users_username"),
+    ]
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def check_plan(db, statement, index_name):
+    """Returns a list of problems with the statement's plan (empty if it uses `index_name`)."""
+    sql = str(statement.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True}))
+    plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = list(plan_nodes(plan[0]["Plan"]))
+
+    problems = [
+        f"sequential scan on {node['Relation Name']}"
+        for node in nodes if node["Node Type"] == "Seq Scan"
+    ]
+    if not any(node.get("Index Name") == index_name for node in nodes):
+        used = sorted({node["Index Name"] for node in nodes if "Index Name" in node})
+        problems.append(f"{index_name} not used (indexes used: {', '.join(used) or 'none'})")
+    return problems
+
+
+def disable_seqscan(db):
+    """Makes the planner avoid sequential scans for the rest of the transaction."""
+    db.execute(text("SET LOCAL enable_seqscan = off"))
+
+
+def check_query_plans():
+    db = SessionLocal()
+    failures = 0
+    try:
+        disable_seqscan(db)
+        for name, statement, index_name in hot_queries():
+            problems = check_plan(db, statement, index_name)
+            if problems:
+                failures += 1
+                print(f"FAIL {name}: {'; '.join(problems)}")
+            else:
+                print(f"ok   {name}: {index_name}")
+    finally:
+        db.rollback()
+        db.close()
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if check_query_plans() else 0)
@@ -1,36 +1,196 @@
+import argparse
 import csv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.models.models import Flight
-from app.core.config import settings
-from datetime import datetime
-
-def load_flights():
-    engine = create_engine(settings.DATABASE_URL)
-    Session = sessionmaker(bind=engine)
-    db = Session()
-
-    db.query(Flight).delete()
-    db.commit()
-
-    with open('flights.csv', 'r') as f:
-        reader = csv.DictReader(f)
-        for i, row in enumerate(reader):
-            if i >= 500:
-                break
-            flight = Flight(
-                flight_number=row['flight_number'],
-                source=row['source'],
-                destination=row['destination'],
-                departure_ts=datetime.fromisoformat(row['departure_ts'].replace('Z', '+00:00')),
-                arrival_ts=datetime.fromisoformat(row['arrival_ts'].replace('Z', '+00:00')),
-                total_seats=int(row['total_seats']),
-                available_seats=int(row['total_seats']),
-                price=float(row['price'])
-            )
-            db.add(flight)
-        db.commit()
+import time
+
+from sqlalchemy import text
+
+from app.core.database import SessionLocal, engine
+from app.core.redis_client import get_redis
+from app.services import redis_service, response_cache, seat_reservations
+from app.services.airport_registry import rebuild_airport_index
+
+CSV_COLUMNS = ("flight_number", "source", "destination", "departure_ts", "arrival_ts", "total_seats", "price")
+
+# Redis entries owned by individual flights, cleared before a replace load
+FLIGHT_KEY_PATTERNS = ("flight:*", "flight_seats:*", "search:*:price", "search:*:fastest")
+
+CREATE_STAGING_TABLE = """
+CREATE TEMP TABLE flights_staging (
+    flight_number VARCHAR,
+    source VARCHAR,
+    destination VARCHAR,
+    departure_ts TIMESTAMPTZ,
+    arrival_ts TIMESTAMPTZ,
+    total_seats INTEGER,
+    price NUMERIC(10, 2)
+)
+"""
+
+# Rows whose route changes in a merge; their old sorted set entries must go
+SELECT_MOVED_FLIGHTS = """
+SELECT f.id, f.source, f.destination, f.departure_ts
+FROM flights f
+JOIN flights_staging s USING (flight_number, departure_ts)
+WHERE (f.source, f.destination) IS DISTINCT FROM (s.source, s.destination)
+"""
+
+# Existing rows whose total seats change in a merge; seats already sold are kept
+SELECT_CAPACITY_CHANGES = """
+SELECT f.id, s.total_seats - f.total_seats
+FROM flights f
+JOIN (SELECT DISTINCT ON (flight_number, departure_ts) flight_number, departure_ts, total_seats
+      FROM flights_staging ORDER BY flight_number, departure_ts) s
+  USING (flight_number, departure_ts)
+WHERE s.total_seats <> f.total_seats
+"""
+
+UPSERT_FROM_STAGING = """
+INSERT INTO flights (id, flight_number, source, destination, departure_ts, arrival_ts,
+                     total_seats, available_seats, price, version, created_at, updated_at)
+SELECT DISTINCT ON (flight_number, departure_ts)
+       gen_random_uuid(), flight_number, source, destination, departure_ts, arrival_ts,
+       total_seats, total_seats, price, 1, now(), now()
+FROM flights_staging
+ORDER BY flight_number, departure_ts
+ON CONFLICT (flight_number, departure_ts) DO UPDATE SET
+    source = excluded.source,
+    destination = excluded.destination,
+    arrival_ts = excluded.arrival_ts,
+    total_seats = excluded.total_seats,
+    available_seats = GREATEST(0, flights.available_seats + excluded.total_seats - flights.total_seats),
+    price = excluded.price,
+    version = flights.version + 1,
+    updated_at = now()
+"""
+
+SELECT_LOADED_FLIGHTS = """
+SELECT f.id, f.flight_number, f.source, f.destination, f.departure_ts, f.arrival_ts,
+       f.total_seats, f.available_seats, f.price
+FROM flights f
+JOIN (SELECT DISTINCT flight_number, departure_ts FROM flights_staging) s
+  USING (flight_number, departure_ts)
+"""
+
+def copy_csv_to_staging(conn, file_path):
+    """Streams the CSV into the staging table with COPY; memory use is independent of file size."""
+    with open(file_path, newline='', encoding='utf-8') as f:
+        header = next(csv.reader(f))
+        unknown = set(header) - set(CSV_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unexpected CSV columns: {sorted(unknown)}")
+        f.seek(0)
+
+        cursor = conn.connection.driver_connection.cursor()
+        cursor.copy_expert(
+            f"COPY flights_staging ({', '.join(header)}) FROM STDIN WITH (FORMAT csv, HEADER true)",
+            f,
+            size=1024 * 1024,
+        )
+        return cursor.rowcount
+
+def clear_flight_keys(redis_client, batch_size):
+    """Removes every per-flight Redis entry, in batches of UNLINKs."""
+    for pattern in FLIGHT_KEY_PATTERNS:
+        batch = []
+        for key in redis_client.scan_iter(match=pattern, count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                redis_client.unlink(*batch)
+                batch = []
+        if batch:
+            redis_client.unlink(*batch)
+
+def warm_redis(conn, redis_client, batch_size):
+    """
+    Writes the flight hashes, seat counters and search sorted sets of every
+    loaded row, reading them through a server-side cursor and flushing one
+    pipeline per batch.
+    """
+    rows = conn.execution_options(stream_results=True, yield_per=batch_size).execute(text(SELECT_LOADED_FLIGHTS))
+    warmed = 0
+    for batch in rows.partitions():
+        with redis_client.pipeline(transaction=False) as pipe:
+            for flight in batch:
+                redis_service.queue_flight_update(pipe, flight, track_airports_index=False)
+            pipe.execute()
+        warmed += len(batch)
+    return warmed
+
+def apply_merge_to_redis(redis_client, capacity_changes, moved, batch_size, warm=True):
+    """
+    Brings the live entries of flights changed by a merge in line with their
+    rows before warming. The live counters move with their capacity, like the
+    rows did, and moved flights lose their old sorted set entries. Their
+    counters are kept: the row's available_seats lags them by up to one
+    write-behind flush, and warming only sets counters that do not exist.
+    """
+    for start in range(0, len(capacity_changes), batch_size):
+        with redis_client.pipeline(transaction=False) as pipe:
+            for flight_id, delta in capacity_changes[start:start + batch_size]:
+                seat_reservations.queue_capacity_change(pipe, flight_id, delta)
+            pipe.execute()
+
+    if not warm:
+        return
+    for start in range(0, len(moved), batch_size):
+        with redis_client.pipeline(transaction=False) as pipe:
+            for flight in moved[start:start + batch_size]:
+                redis_service.queue_flight_removal(pipe, flight, track_airports_index=False, keep_seats=True)
+            pipe.execute()
+
+def load_flights(file_path="flights.csv", mode="replace", batch_size=5000, warm=True):
+    """
+    Loads a flights CSV of any size.
+    - replace: removes every existing flight first (as the original loader did).
+    - merge: upserts on (flight_number, departure_ts), keeping other flights.
+      Existing flights keep the seats already sold; a change of total seats
+      moves the stored and the live count by the same amount.
+    """
+    started = time.perf_counter()
+    redis_client = get_redis()
+
+    with engine.connect() as conn:
+        # Large loads must not be cut short by the API's statement timeout
+        conn.execute(text("SET statement_timeout = 0"))
+        conn.execute(text(CREATE_STAGING_TABLE))
+        staged = copy_csv_to_staging(conn, file_path)
+        print(f"Copied {staged} rows into staging in {time.perf_counter() - started:.1f}s")
+
+        moved = []
+        capacity_changes = []
+        if mode == "replace":
+            conn.execute(text("DELETE FROM flights"))
+        else:
+            moved = conn.execute(text(SELECT_MOVED_FLIGHTS)).all()
+            capacity_changes = conn.execute(text(SELECT_CAPACITY_CHANGES)).all()
+
+        loaded = conn.execute(text(UPSERT_FROM_STAGING)).rowcount
+        conn.commit()
+        print(f"Upserted {loaded} flights ({mode}) in {time.perf_counter() - started:.1f}s")
+
+        apply_merge_to_redis(redis_client, capacity_changes, moved, batch_size, warm=warm)
+        if warm:
+            if mode == "replace":
+                clear_flight_keys(redis_client, batch_size)
+            warmed = warm_redis(conn, redis_client, batch_size)
+            print(f"Warmed Redis for {warmed} flights in {time.perf_counter() - started:.1f}s")
+
+        conn.execute(text("DROP TABLE flights_staging"))
+        conn.commit()
+
+    db = SessionLocal()
+    rebuild_airport_index(db, redis_client)
     db.close()
+    response_cache.invalidate_all(redis_client)
+    print("Done. Run app/scripts/precompute_flights.py to rebuild the search paths.")
 
 if __name__ == "__main__":
-    load_flights()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Load flights from a CSV file with COPY.")
+    parser.add_argument("--file", default="flights.csv", help="Path to the flights CSV")
+    parser.add_argument("--mode", choices=["replace", "merge"], default="replace",
+                        help="replace deletes existing flights first; merge upserts on (flight_number, departure_ts)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per Redis pipeline when warming")
+    parser.add_argument("--no-warm", action="store_true", help="Skip warming the Redis flight entries")
+    args = parser.parse_args()
+
+    load_flights(args.file, args.mode, args.batch_size, warm=not args.no_warm)
@@ -1,17 +1,17 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 from app.models.models import User
-from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.redis_client import get_redis
+from app.services.principal_cache import principal_cache
 
 def make_admin():
-    engine = create_engine(settings.DATABASE_URL)
-    Session = sessionmaker(bind=engine)
-    db = Session()
+    db = SessionLocal()
 
     user = db.query(User).filter(User.username == "adminuser").first()
     if user:
         user.is_admin = True
         db.commit()
+        # Otherwise the old role is served from the cache until it expires
+        principal_cache.invalidate(get_redis(), user.username)
         print(f"User 'adminuser' is now an admin.")
     else:
         print(f"User 'adminuser' not found.")
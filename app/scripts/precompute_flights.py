@@ -1,134 +1,154 @@
+import argparse
 import json
+import multiprocessing
 import os
+import time
 from collections import defaultdict
 from datetime import datetime
 from functools import partial
-from concurrent.futures import ProcessPoolExecutor
 
-import redis
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 from tqdm import tqdm
 
 from app.core.config import settings
-from app.models.models import Flight
+from app.core.database import SessionLocal
+from app.core.redis_client import get_redis
+from app.services import flight_store, path_store, response_cache
+from app.services.path_engine import path_cache_key, path_summary_key
 
 def get_db_session():
-    """Creates a new database session."""
-    engine = create_engine(settings.DATABASE_URL)
-    Session = sessionmaker(bind=engine)
-    return Session()
+    """Creates a new database session on the shared engine."""
+    return SessionLocal()
 
 def get_redis_client():
-    """Creates a new Redis client."""
-    return redis.from_url(settings.REDIS_URL)
-
-def find_paths(flights_by_date, src, dst, date):
-    """Finds all possible flight paths for a given source, destination, and date."""
-    graph = defaultdict(list)
-    for flight in flights_by_date.get(date, []):
-        graph[flight.source].append(flight)
-
-    all_paths = []
-    stack = [(src, [])]
-
-    while stack:
-        current_airport, path = stack.pop()
-
-        if current_airport == dst:
-            all_paths.append(path)
-            continue
-
-        if len(path) >= 5:
-            continue
+    """Returns the shared, pooled Redis client."""
+    return get_redis()
 
-        for flight in graph.get(current_airport, []):
-            if flight.id not in {f.id for f in path}:
-                new_path = path + [flight]
-                stack.append((flight.destination, new_path))
-    return all_paths
+def timed_task(task, **kwargs):
+    """Runs one task in a pool worker; returns its date and duration alongside the results."""
+    started = time.perf_counter()
+    results = flight_store.process_shared_date(task, **kwargs)
+    return task[0], time.perf_counter() - started, results
 
-def calculate_path_price(path):
-    """Calculates the total price of a flight path."""
-    return sum(flight.price for flight in path)
-
-def process_combination(combo, flights_by_date):
+def precompute_and_store_flights(specific_source=None, specific_destination=None, specific_date=None, top_k=None, max_legs=None):
     """
-    Worker function to find and sort paths for a single combination.
-    Returns a tuple of (redis_key, redis_value) or None.
+    Loads every flight into a compact FlightStore and uses a process pool to
+    precompute the cheapest flight paths for every date in parallel, then
+    stores them in Redis.
     """
-    date, src, dst = combo
-    paths = find_paths(flights_by_date, src, dst, date)
-
-    if not paths:
-        return None
-
-    paths.sort(key=calculate_path_price)
-    top_20_paths = paths[:20]
-
-    if top_20_paths:
-        redis_key = f"{src}-{dst}-{date.strftime('%Y-%m-%d')}"
-        redis_value = json.dumps([[str(flight.id) for flight in path] for path in top_20_paths])
-        return (redis_key, redis_value)
-    
-    return None
-    
-    return None
-
-import argparse
+    top_k = top_k or settings.PRECOMPUTE_TOP_K
+    max_legs = max_legs or settings.PRECOMPUTE_MAX_LEGS
+    min_connection = settings.PRECOMPUTE_MIN_CONNECTION_MINUTES * 60
 
-def precompute_and_store_flights(specific_source=None, specific_destination=None, specific_date=None):
-    """
-    Fetches flight data and uses a process pool to precompute
-    flight paths in parallel, then stores them in Redis.
-    """
+    started = time.perf_counter()
+    full_run = not (specific_source and specific_destination and specific_date)
+    redis_client = get_redis_client()
+    if full_run:
+        # Before loading, so every flight change made after the load is recorded
+        path_store.mark_build(redis_client)
     db = get_db_session()
-    all_flights = db.query(Flight).all()
+    store = flight_store.load_flight_store(db)
     db.close()
-
-    flights_by_date = defaultdict(list)
-    for flight in all_flights:
-        flights_by_date[flight.departure_ts.date()].append(flight)
-
-    if specific_source and specific_destination and specific_date:
-        combinations = [
-            (datetime.strptime(specific_date, '%Y-%m-%d').date(), specific_source, specific_destination)
-        ]
+    print(
+        f"Loaded {len(store)} flights on {len(store.dates)} date(s) "
+        f"({store.memory_bytes() / 1024 / 1024:.1f} MiB) in {time.perf_counter() - started:.1f}s"
+    )
+
+    if not full_run:
+        date = datetime.strptime(specific_date, '%Y-%m-%d').date()
+        tasks = [(date, [specific_source])] if specific_source in store.airport_index else []
+        destination = specific_destination
+        # A single route is updated in place, in whichever version readers currently use
+        version = path_store.active_version(redis_client)
     else:
-        unique_airports = {f.source for f in all_flights} | {f.destination for f in all_flights}
-        unique_dates = flights_by_date.keys()
-
-        combinations = [
-            (date, src, dst)
-            for date in unique_dates
-            for src in unique_airports
-            for dst in unique_airports
-            if src != dst
+        sources_per_task = settings.PRECOMPUTE_SOURCES_PER_TASK
+        tasks = [
+            (date, sources[i:i + sources_per_task])
+            for date in store.dates
+            for sources in [store.sources_on(date)]
+            for i in range(0, len(sources), sources_per_task)
         ]
+        destination = None
+        # A full run is written to a fresh namespace that readers only see once it is complete
+        version = path_store.new_version(redis_client)
 
     num_processes = os.cpu_count()
-    print(f"Starting path precomputation with {num_processes} processes for {len(combinations)} combinations...")
-
-    worker_func = partial(process_combination, flights_by_date=flights_by_date)
-
-    results = []
-    with ProcessPoolExecutor(max_workers=num_processes) as executor:
-        results = list(tqdm(executor.map(worker_func, combinations), total=len(combinations)))
-
-    print("Path precomputation finished. Storing results in Redis...")
-    redis_client = get_redis_client()
-    for result in tqdm(results):
-        if result:
-            redis_key, redis_value = result
-            redis_client.set(redis_key, redis_value)
-
-    print("All paths stored in Redis.")
+    print(f"Starting path precomputation with {num_processes} processes for {len(tasks)} task(s)...")
+
+    worker_func = partial(
+        timed_task,
+        top_k=top_k,
+        max_legs=max_legs,
+        min_connection=min_connection,
+        destination=destination,
+    )
+
+    # Workers are forked after this, so they inherit the store rather than receiving it per task
+    flight_store.share(store)
+    written = 0
+    # Worker seconds spent on each date, summed over its tasks
+    date_seconds = defaultdict(float)
+    try:
+        with multiprocessing.get_context("fork").Pool(num_processes) as pool:
+            # Results are written as they arrive, so at most a few tasks' worth is held in memory
+            for task_date, elapsed, task_results in tqdm(pool.imap_unordered(worker_func, tasks), total=len(tasks)):
+                date_seconds[task_date] += elapsed
+                if full_run:
+                    path_store.mark_build(redis_client)
+                written += path_store.store_paths(
+                    redis_client, task_results, version=version,
+                    ttl=settings.PRECOMPUTE_RESULT_TTL or None,
+                    batch_size=settings.PRECOMPUTE_WRITE_BATCH_SIZE,
+                )
+    except BaseException:
+        if full_run:
+            # The routes updated meanwhile were written to the version that stays active
+            path_store.finish_build(redis_client)
+            redis_client.delete(path_store.REBUILD_ROUTES_KEY)
+            path_store.drop_version(redis_client, version)
+        raise
+
+    if destination is not None:
+        if not written:
+            # The route no longer has any path; drop the stale entry.
+            redis_client.delete(
+                path_cache_key(specific_source, specific_destination, date, version),
+                path_summary_key(specific_source, specific_destination, date, version),
+            )
+        print(f"Stored {written} key(s).")
+        return
+
+    previous = path_store.activate_version(redis_client, version)
+    # Flight changes applied to the previous version during the run are recomputed into this one by the worker
+    path_store.finish_build(redis_client)
+    redis_client.publish("flight_updates", json.dumps({"type": "paths_activated", "version": version}))
+    duration = time.perf_counter() - started
+    print(f"Stored {written} keys in {duration:.1f}s; version {version} is now active.")
+    path_store.record_last_run(redis_client, {
+        "finished_at": time.time(),
+        "duration_seconds": round(duration, 3),
+        "tasks": len(tasks),
+        "dates": len(date_seconds),
+        "keys_written": written,
+        "date_seconds_max": round(max(date_seconds.values(), default=0), 3),
+        "date_seconds_mean": round(sum(date_seconds.values()) / len(date_seconds), 3) if date_seconds else 0,
+    })
+
+    # Every route may have changed; cached responses must be rebuilt from the new paths.
+    response_cache.invalidate_all(redis_client)
+
+    if previous is None:
+        path_store.drop_unversioned(redis_client)
+    else:
+        path_store.drop_version(redis_client, previous)
+    print("Previous paths removed.")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Precompute flight paths.")
     parser.add_argument("--source", help="Source airport")
     parser.add_argument("--destination", help="Destination airport")
     parser.add_argument("--date", help="Date in YYYY-MM-DD format")
+    parser.add_argument("--top-k", type=int, help="Number of cheapest paths to keep per route")
+    parser.add_argument("--max-legs", type=int, help="Maximum number of legs per path")
     args = parser.parse_args()
 
-    precompute_and_store_flights(args.source, args.destination, args.date)
\ No newline at end of file
+    precompute_and_store_flights(args.source, args.destination, args.date, args.top_k, args.max_legs)
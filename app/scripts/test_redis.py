@@ -1,11 +1,10 @@
 
-import redis
-from app.core.config import settings
+from app.core.redis_client import get_redis
 
 def test_redis_connection():
     """Tests the connection to Redis."""
     try:
-        redis_client = redis.from_url(settings.REDIS_URL)
+        redis_client = get_redis()
         redis_client.ping()
         print("Successfully connected to Redis!")
     except Exception as e:
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from bisect import bisect_left
+
+import redis
+import redis.asyncio as aioredis
+from sqlalchemy import func, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import models
+from app.services.redis_service import AIRPORTS_BUILT_KEY, AIRPORTS_KEY, AIRPORTS_VERSION_KEY
+
+
+def airport_counts_query():
+    """Number of flights touching each airport, as source or destination."""
+    endpoints = union_all(
+        select(models.Flight.source.label("airport")),
+        select(models.Flight.destination.label("airport")),
+    ).subquery()
+    return select(endpoints.c.airport, func.count()).group_by(endpoints.c.airport)
+
+
+def queue_airport_index(pipe, airport_counts):
+    """Queues a full replacement of the Redis airport index on a pipeline."""
+    pipe.delete(AIRPORTS_KEY)
+    if airport_counts:
+        pipe.hset(AIRPORTS_KEY, mapping=airport_counts)
+    pipe.incr(AIRPORTS_VERSION_KEY)
+    pipe.set(AIRPORTS_BUILT_KEY, 1)
+
+
+def rebuild_airport_index(db: Session, redis_client: redis.Redis):
+    """Rebuilds the Redis airport index from the flights table (used after bulk loads)."""
+    airport_counts = dict(db.execute(airport_counts_query()).all())
+    with redis_client.pipeline() as pipe:
+        queue_airport_index(pipe, airport_counts)
+        pipe.execute()
+    return sorted(airport_counts)
+
+
+class AirportRegistry:
+    """
+    In-memory, sorted list of airports for one API process.
+    The list is reloaded only when the Redis airport index version changes,
+    which `redis_service` bumps whenever an airport gains its first flight or
+    loses its last one. The version is checked at most once per
+    `refresh_interval` seconds.
+    """
+
+    def __init__(self, refresh_interval):
+        self.refresh_interval = refresh_interval
+        self.version = None
+        self.airports = []
+        self._folded = []
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def etag(self):
+        return f'W/"airports-{self.version}"'
+
+    def _is_fresh(self):
+        return self.version is not None and time.monotonic() - self._checked_at < self.refresh_interval
+
+    async def ensure_fresh(self, db: AsyncSession, redis_client: aioredis.Redis):
+        if self._is_fresh():
+            return
+        async with self._lock:
+            if self._is_fresh():
+                return
+            built, version = await redis_client.mget(AIRPORTS_BUILT_KEY, AIRPORTS_VERSION_KEY)
+            if built is None:
+                # Never rebuilt from the database. Admin creates may have bumped the version
+                # and added their own airports, but the index misses every other flight.
+                await self._rebuild(db, redis_client)
+                version = await redis_client.get(AIRPORTS_VERSION_KEY)
+            version = version.decode('utf-8')
+            if version != self.version:
+                airports = await redis_client.hkeys(AIRPORTS_KEY)
+                self._load([airport.decode('utf-8') for airport in airports], version)
+            self._checked_at = time.monotonic()
+
+    async def _rebuild(self, db: AsyncSession, redis_client: aioredis.Redis):
+        airport_counts = dict((await db.execute(airport_counts_query())).all())
+        async with redis_client.pipeline() as pipe:
+            queue_airport_index(pipe, airport_counts)
+            await pipe.execute()
+
+    def _load(self, airports, version):
+        self.airports = sorted(airports)
+        self._folded = sorted((airport.lower(), airport) for airport in airports)
+        self.version = version
+
+    def search(self, prefix, limit):
+        """Case-insensitive prefix match, in alphabetical order."""
+        prefix = prefix.lower()
+        matches = []
+        index = bisect_left(self._folded, (prefix,))
+        while index < len(self._folded) and len(matches) < limit:
+            folded, airport = self._folded[index]
+            if not folded.startswith(prefix):
+                break
+            matches.append(airport)
+            index += 1
+        return matches
+
+
+registry = AirportRegistry(refresh_interval=settings.AIRPORTS_REFRESH_INTERVAL)
@@ -0,0 +1,78 @@
+import asyncio
+from collections import defaultdict
+
+import redis.asyncio as aioredis
+
+from app.services.payment_queue import BOOKING_STATUS_CHANNEL_PREFIX
+
+
+class BookingStatusNotifier:
+    """
+    Lets long-poll requests wait for a booking to leave PENDING.
+    One pattern subscription per API process fans worker notifications out
+    to the waiting requests, so waiters don't each hold a Redis connection.
+    """
+
+    def __init__(self):
+        self._waiters = defaultdict(set)
+        self._listener = None
+        self._ready = asyncio.Event()
+
+    def subscribe(self, booking_id):
+        """Registers interest in a booking; await the returned future with `wait`."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[str(booking_id)].add(future)
+        return future
+
+    def unsubscribe(self, booking_id, future):
+        waiters = self._waiters.get(str(booking_id))
+        if waiters is not None:
+            waiters.discard(future)
+            if not waiters:
+                del self._waiters[str(booking_id)]
+
+    async def start(self, redis_client: aioredis.Redis, timeout=None):
+        """
+        Starts the listener if needed and waits up to `timeout` seconds for
+        its subscription. Returns False if it is not subscribed by then
+        (e.g. Redis is unreachable); the listener keeps retrying.
+        """
+        if self._listener is None or self._listener.done():
+            self._ready.clear()
+            self._listener = asyncio.create_task(self._listen(redis_client))
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    async def _listen(self, redis_client: aioredis.Redis):
+        while True:
+            pubsub = redis_client.pubsub()
+            try:
+                await pubsub.psubscribe(f"{BOOKING_STATUS_CHANNEL_PREFIX}*")
+                self._ready.set()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        continue
+                    booking_id = message["channel"].decode("utf-8")[len(BOOKING_STATUS_CHANNEL_PREFIX):]
+                    for future in self._waiters.pop(booking_id, ()):
+                        if not future.done():
+                            future.set_result(message["data"].decode("utf-8"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._ready.clear()
+                print(f"Booking status listener error, reconnecting: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+notifier = BookingStatusNotifier()
@@ -0,0 +1,169 @@
+import csv
+import json
+import os
+import uuid
+from datetime import datetime
+from itertools import islice
+
+import redis
+from pydantic import ValidationError
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import models
+from app.schemas import schemas
+from app.services import redis_service
+from app.services.path_engine import departure_date
+
+MAX_REPORTED_ERRORS = 100
+
+UPSERT_COLUMNS = ("source", "destination", "arrival_ts", "total_seats", "available_seats", "price")
+
+
+def read_chunks(csv_reader, chunk_size):
+    """Yields lists of (line_number, row) from a DictReader without loading the whole file."""
+    while True:
+        chunk = []
+        for row in islice(csv_reader, chunk_size):
+            chunk.append((csv_reader.line_num, row))
+        if not chunk:
+            return
+        yield chunk
+
+
+def validate_chunk(chunk, results):
+    """
+    Validates raw CSV rows into insert-ready dicts keyed by
+    (flight_number, departure_ts). A later row for the same key replaces an
+    earlier one, since a single upsert cannot touch a row twice.
+    """
+    rows = {}
+    for line_num, row in chunk:
+        try:
+            flight_data = schemas.FlightCreate(**row)
+        except ValidationError as e:
+            record_error(results, f"Row {line_num}: {e}")
+            continue
+        now = datetime.now()
+        rows[(flight_data.flight_number, flight_data.departure_ts)] = {
+            "id": uuid.uuid4(),
+            **flight_data.model_dump(),
+            "available_seats": flight_data.total_seats,
+            "version": 1,
+            "created_at": now,
+            "updated_at": now,
+        }
+    return rows
+
+
+def record_error(results, message, count=1):
+    results["failed"] += count
+    if len(results["errors"]) < MAX_REPORTED_ERRORS:
+        results["errors"].append(message)
+
+
+def upsert_chunk(db: Session, rows):
+    """
+    Writes a chunk with a single INSERT ... ON CONFLICT (flight_number, departure_ts).
+    Returns (previous versions of updated flights, flights as written).
+    """
+    existing = db.execute(
+        select(models.Flight).where(
+            tuple_(models.Flight.flight_number, models.Flight.departure_ts).in_(list(rows))
+        )
+    ).scalars().all()
+    # Snapshot the old state before the upsert refreshes these objects
+    previous = [schemas.Flight.model_validate(flight) for flight in existing]
+
+    stmt = insert(models.Flight).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.Flight.flight_number, models.Flight.departure_ts],
+        set_={
+            **{column: stmt.excluded[column] for column in UPSERT_COLUMNS},
+            "version": models.Flight.version + 1,
+            "updated_at": func.now(),
+        },
+    ).returning(models.Flight)
+    written = db.execute(stmt).scalars().all()
+    db.commit()
+    return previous, written
+
+
+def write_chunk_to_redis(redis_client: redis.Redis, previous, written):
+    """Replaces the Redis entries of every flight in the chunk with one pipeline."""
+    with redis_client.pipeline() as pipe:
+        for flight in previous:
+            redis_service.queue_flight_removal(pipe, flight)
+        for flight in written:
+            redis_service.queue_flight_update(pipe, flight)
+        pipe.execute()
+
+
+def publish_route_updates(redis_client: redis.Redis, affected_routes):
+    """Publishes one flight_updates event per affected (source, destination, date)."""
+    with redis_client.pipeline(transaction=False) as pipe:
+        for (source, destination, date), flight_ids in affected_routes.items():
+            update_message = {
+                "source": source,
+                "destination": destination,
+                "date": date,
+                "flight_ids": sorted(flight_ids)
+            }
+            pipe.publish("flight_updates", json.dumps(update_message))
+        pipe.execute()
+
+
+def process_bulk_upload(file_path: str, redis_client: redis.Redis, job_id: str, session_factory):
+    """
+    Background task that streams an uploaded CSV from disk and upserts it in
+    chunks of BULK_UPLOAD_CHUNK_SIZE rows. Each chunk costs one SELECT, one
+    upsert and one Redis pipeline; progress is written to bulk_job:{job_id}
+    after every chunk, and route update events are published once at the end.
+    """
+    results = {
+        "status": "IN_PROGRESS",
+        "processed": 0,
+        "created": 0,
+        "updated": 0,
+        "failed": 0,
+        "errors": []
+    }
+    job_key = f"bulk_job:{job_id}"
+    redis_client.set(job_key, json.dumps(results))
+
+    affected_routes = {}
+    db = session_factory()
+    try:
+        with open(file_path, newline='', encoding='utf-8') as f:
+            csv_reader = csv.DictReader(f)
+            for chunk in read_chunks(csv_reader, settings.BULK_UPLOAD_CHUNK_SIZE):
+                results["processed"] += len(chunk)
+                rows = validate_chunk(chunk, results)
+                if rows:
+                    try:
+                        previous, written = upsert_chunk(db, rows)
+                    except Exception as e:
+                        db.rollback()
+                        record_error(results, f"Rows {chunk[0][0]}-{chunk[-1][0]}: {e}", count=len(rows))
+                    else:
+                        write_chunk_to_redis(redis_client, previous, written)
+                        results["updated"] += len(previous)
+                        results["created"] += len(written) - len(previous)
+                        for flight in [*previous, *written]:
+                            route = (flight.source, flight.destination, departure_date(flight.departure_ts).isoformat())
+                            affected_routes.setdefault(route, set()).add(str(flight.id))
+
+                redis_client.set(job_key, json.dumps(results))
+
+        publish_route_updates(redis_client, affected_routes)
+        results["status"] = "COMPLETED"
+    except Exception as e:
+        results["status"] = "FAILED"
+        results["errors"].append(f"Critical error: {str(e)}")
+    finally:
+        db.close()
+        os.remove(file_path)
+
+    redis_client.set(job_key, json.dumps(results), ex=3600) # Keep result for 1 hour
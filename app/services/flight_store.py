@@ -0,0 +1,149 @@
+import uuid
+from array import array
+
+from sqlalchemy import Date, Float, cast, func, select
+
+from app.models.models import Flight
+from app.services.path_engine import (
+    DateGraph, path_cache_key, path_summary_key, search_from_source, serialize_paths, serialize_summary, summarize_paths,
+)
+
+# Set in the parent before the process pool forks, so workers inherit the
+# store instead of receiving it in every task.
+_shared_store = None
+
+
+class FlightStore:
+    """
+    Every flight's search-relevant fields in flat typed arrays, ordered by
+    departure date: about 50 bytes per flight, against well over a kilobyte
+    for an ORM object.
+
+    Airports are interned to small integers and flight IDs kept as 16 raw
+    bytes; both are only turned back into strings for the paths actually
+    stored.
+    """
+
+    __slots__ = ("airports", "airport_index", "ids", "sources", "destinations",
+                 "departures", "arrivals", "prices", "dates", "date_ranges")
+
+    def __init__(self):
+        self.airports = []
+        self.airport_index = {}
+        self.ids = bytearray()
+        self.sources = array("I")
+        self.destinations = array("I")
+        self.departures = array("q")
+        self.arrivals = array("q")
+        self.prices = array("d")
+        self.dates = []
+        self.date_ranges = {}
+
+    def __len__(self):
+        return len(self.prices)
+
+    def intern(self, airport):
+        index = self.airport_index.get(airport)
+        if index is None:
+            index = self.airport_index[airport] = len(self.airports)
+            self.airports.append(airport)
+        return index
+
+    def append(self, flight_id, source, destination, departure, arrival, price, date):
+        """Adds one flight. Flights must be appended in departure date order."""
+        if not self.dates or self.dates[-1] != date:
+            if self.dates:
+                previous = self.dates[-1]
+                self.date_ranges[previous] = (self.date_ranges[previous][0], len(self))
+            self.dates.append(date)
+            self.date_ranges[date] = (len(self), None)
+        self.ids += flight_id.bytes
+        self.sources.append(self.intern(source))
+        self.destinations.append(self.intern(destination))
+        self.departures.append(departure)
+        self.arrivals.append(arrival)
+        self.prices.append(price)
+
+    def seal(self):
+        """Closes the range of the last date once loading is done."""
+        if self.dates:
+            last = self.dates[-1]
+            self.date_ranges[last] = (self.date_ranges[last][0], len(self))
+        return self
+
+    def flight_id(self, index):
+        return str(uuid.UUID(bytes=bytes(self.ids[index * 16:index * 16 + 16])))
+
+    def legs(self, date):
+        """Engine legs of a date, with the flight's row index as its ID and interned airports."""
+        start, end = self.date_ranges.get(date, (0, 0))
+        return [
+            (i, self.sources[i], self.destinations[i], self.departures[i], self.arrivals[i], self.prices[i])
+            for i in range(start, end)
+        ]
+
+    def sources_on(self, date):
+        """Codes of the airports with a departure on `date`."""
+        start, end = self.date_ranges.get(date, (0, 0))
+        return sorted(self.airports[i] for i in set(self.sources[start:end]))
+
+    def memory_bytes(self):
+        arrays = (self.sources, self.destinations, self.departures, self.arrivals, self.prices)
+        return len(self.ids) + sum(a.itemsize * len(a) for a in arrays)
+
+
+def load_flight_store(db, batch_size=10000):
+    """
+    Reads every flight into a FlightStore through a server-side cursor,
+    converting timestamps and dates in SQL so no ORM objects or datetimes
+    are built.
+    """
+    query = select(
+        Flight.id,
+        Flight.source,
+        Flight.destination,
+        cast(func.extract("epoch", Flight.departure_ts), Float),
+        cast(func.extract("epoch", func.coalesce(Flight.arrival_ts, Flight.departure_ts)), Float),
+        cast(Flight.price, Float),
+        # The UTC date, as path_engine.departure_date, not the session time zone's
+        cast(func.timezone("UTC", Flight.departure_ts), Date).label("departure_date"),
+    ).order_by("departure_date")
+
+    store = FlightStore()
+    rows = db.execute(query.execution_options(stream_results=True, yield_per=batch_size))
+    for flight_id, source, destination, departure, arrival, price, date in rows:
+        store.append(flight_id, source, destination, int(departure), int(arrival), price, date)
+    return store.seal()
+
+
+def share(store):
+    """Makes `store` visible to process pool workers forked after this call."""
+    global _shared_store
+    _shared_store = store
+
+
+def process_shared_date(task, top_k, max_legs, min_connection, destination=None):
+    """
+    Worker function for a single date of the shared store.
+    Same output as path_engine.process_date; only the date and its sources
+    travel with the task.
+    """
+    store = _shared_store
+    date, sources = task
+    graph = DateGraph(store.legs(date))
+    leg_times = graph.leg_times()
+    destination_index = store.airport_index.get(destination) if destination is not None else None
+
+    results = []
+    for src in sources:
+        paths_by_destination = search_from_source(
+            graph, store.airport_index[src], top_k=top_k, max_legs=max_legs, min_connection=min_connection
+        )
+        for dst, paths in paths_by_destination.items():
+            if destination is not None and dst != destination_index:
+                continue
+            summary = serialize_summary(summarize_paths(paths, leg_times))
+            paths = [(price, [store.flight_id(i) for i in flight_indexes]) for price, flight_indexes in paths]
+            results.append((path_cache_key(src, store.airports[dst], date), serialize_paths(paths)))
+            results.append((path_summary_key(src, store.airports[dst], date), summary))
+    return results
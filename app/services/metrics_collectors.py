@@ -0,0 +1,121 @@
+from prometheus_client import REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from app.core.async_database import async_engine
+from app.core.async_redis_client import get_async_redis_pool_stats
+from app.core.database import engine
+from app.core.password_hashing import password_hashing_pool
+from app.core.redis_client import get_redis, get_redis_pool_stats
+from app.core.redis_lock import get_lock_stats
+from app.services import path_store, seat_sync
+from app.services.principal_cache import principal_cache
+
+# Custom collectors turn the per-process stats snapshots that already back
+# the /admin/stats endpoints into Prometheus series. They are read at scrape
+# time, so nothing extra runs on the request path.
+
+
+def _redis_pool_families(pools):
+    in_use = GaugeMetricFamily("redis_pool_connections_in_use", "Checked-out Redis connections.", labels=["pool"])
+    idle = GaugeMetricFamily("redis_pool_connections_idle", "Idle Redis connections.", labels=["pool"])
+    waits = CounterMetricFamily("redis_pool_waits", "Waits for a free Redis connection.", labels=["pool"])
+    timeouts = CounterMetricFamily("redis_pool_wait_timeouts", "Waits for a Redis connection that timed out.", labels=["pool"])
+    for name, stats in pools.items():
+        if stats is None:
+            continue
+        in_use.add_metric([name], stats["in_use"])
+        idle.add_metric([name], stats["idle"])
+        waits.add_metric([name], stats["waits"])
+        timeouts.add_metric([name], stats["wait_timeouts"])
+    return [in_use, idle, waits, timeouts]
+
+
+def _lock_families():
+    acquisitions = CounterMetricFamily("redis_lock_acquisitions", "RedisLock acquisitions.", labels=["lock"])
+    contended = CounterMetricFamily("redis_lock_contended", "RedisLock acquisitions that had to wait.", labels=["lock"])
+    lost = CounterMetricFamily("redis_lock_lost", "RedisLock releases or extensions after the lease expired.", labels=["lock"])
+    for name, stats in get_lock_stats().items():
+        acquisitions.add_metric([name], stats["acquisitions"])
+        contended.add_metric([name], stats["contended"])
+        lost.add_metric([name], stats["lost"])
+    return [acquisitions, contended, lost]
+
+
+def _engine_pool_families():
+    checked_out = GaugeMetricFamily("db_pool_connections_in_use", "Checked-out database connections.", labels=["engine"])
+    for name, pool in (("sync", engine.pool), ("async", async_engine.pool)):
+        # Pools without a fixed size (NullPool, StaticPool) have nothing to report
+        if hasattr(pool, "checkedout"):
+            checked_out.add_metric([name], pool.checkedout())
+    return [checked_out]
+
+
+class ApiCollector:
+    """Redis and database pools, locks, the principal cache and the password hashing pool of an API process."""
+
+    def collect(self):
+        yield from _redis_pool_families({"sync": get_redis_pool_stats(), "async": get_async_redis_pool_stats()})
+        yield from _lock_families()
+        yield from _engine_pool_families()
+
+        principals = CounterMetricFamily(
+            "principal_lookups", "Where authenticated users were resolved from.", labels=["source"]
+        )
+        for source, count in principal_cache.snapshot().items():
+            if source != "local_entries":
+                principals.add_metric([source], count)
+        yield principals
+
+        hashing = password_hashing_pool.snapshot()
+        yield GaugeMetricFamily("password_hashing_pending", "Password hashing operations queued or running.", value=hashing["pending"])
+        yield CounterMetricFamily("password_hashing_rejected", "Password hashing requests rejected as saturated.", value=hashing["rejected"])
+        yield CounterMetricFamily("password_hashing_seconds", "Time spent hashing and verifying passwords.", value=hashing["total_seconds"])
+
+
+class WorkerCollector:
+    """Write-behind lag and the last full precomputation, read from Redis at scrape time, plus the worker's own pool and locks."""
+
+    def collect(self):
+        redis_client = get_redis()
+        yield from _redis_pool_families({"sync": get_redis_pool_stats()})
+        yield from _lock_families()
+
+        lag = seat_sync.lag_snapshot(redis_client)
+        queue = GaugeMetricFamily("write_behind_entries", "Seat changes not yet flushed to the database.", labels=["state"])
+        queue.add_metric(["unread"], lag["unread"])
+        queue.add_metric(["pending"], lag["pending"])
+        yield queue
+        yield GaugeMetricFamily(
+            "write_behind_oldest_age_seconds", "Age of the oldest unflushed seat change.",
+            value=lag["oldest_unflushed_age_seconds"],
+        )
+
+        last_run = path_store.last_run(redis_client)
+        if last_run:
+            yield GaugeMetricFamily(
+                "precompute_last_run_timestamp_seconds", "When the last full precomputation finished.",
+                value=last_run["finished_at"],
+            )
+            yield GaugeMetricFamily(
+                "precompute_last_run_duration_seconds", "Wall time of the last full precomputation.",
+                value=last_run["duration_seconds"],
+            )
+            yield GaugeMetricFamily(
+                "precompute_last_run_keys", "Keys written by the last full precomputation.",
+                value=last_run["keys_written"],
+            )
+            per_date = GaugeMetricFamily(
+                "precompute_last_run_date_seconds", "Worker seconds per date in the last full precomputation.",
+                labels=["stat"],
+            )
+            per_date.add_metric(["max"], last_run["date_seconds_max"])
+            per_date.add_metric(["mean"], last_run["date_seconds_mean"])
+            yield per_date
+
+
+def register_api_collectors():
+    REGISTRY.register(ApiCollector())
+
+
+def register_worker_collectors():
+    REGISTRY.register(WorkerCollector())
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, time as dt_time, timedelta, timezone
+
+from sqlalchemy import select
+import redis.asyncio as aioredis
+
+from app.core.async_database import AsyncSessionLocal
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.core.redis_lock import RedisLock
+from app.models import models
+from app.services import path_store
+from app.services.path_engine import (
+    DateGraph, flight_to_leg, path_cache_key, search_from_source, serialize_paths, serialize_summary, summarize_paths,
+)
+
+
+class DateGraphCache:
+    """
+    Recently used per-date flight graphs, rebuilt from Postgres once older
+    than `max_age` seconds. Concurrent builds of the same date share one
+    query, made on a session of its own so it outlives any one request.
+    """
+
+    def __init__(self, max_graphs, max_age):
+        self.max_graphs = max_graphs
+        self.max_age = max_age
+        self._graphs = OrderedDict()  # date -> (built_at, graph)
+        self._builds = {}
+
+    async def get(self, date):
+        entry = self._graphs.get(date)
+        if entry is not None and time.monotonic() - entry[0] < self.max_age:
+            self._graphs.move_to_end(date)
+            return entry[1]
+
+        build = self._builds.get(date)
+        if build is None:
+            build = self._builds[date] = asyncio.ensure_future(self._build(date))
+            build.add_done_callback(lambda _: self._builds.pop(date, None))
+        return await asyncio.shield(build)
+
+    async def _build(self, date):
+        # The UTC day of path_engine.departure_date, as a range rather than a cast
+        # to date so the departure_ts index can be used
+        day_start = datetime.combine(date, dt_time.min, tzinfo=timezone.utc)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(models.Flight).where(
+                    models.Flight.departure_ts >= day_start, models.Flight.departure_ts < day_start + timedelta(days=1)
+                )
+            )
+            legs = [flight_to_leg(flight) for flight in result.scalars()]
+        graph = await asyncio.to_thread(DateGraph, legs)
+        self._graphs[date] = (time.monotonic(), graph)
+        self._graphs.move_to_end(date)
+        while len(self._graphs) > self.max_graphs:
+            self._graphs.popitem(last=False)
+        return graph
+
+
+graph_cache = DateGraphCache(settings.ONLINE_SEARCH_MAX_GRAPHS, settings.ONLINE_SEARCH_GRAPH_MAX_AGE)
+
+# Searches in progress in this process, so concurrent misses for a route share one
+_in_flight = {}
+
+
+async def find_paths(redis_client: aioredis.Redis, source, destination, date):
+    """
+    Computes the paths of a route missing from the precomputed cache.
+    Returns (list of flight ID lists, summary, complete). Complete results are stored
+    for ONLINE_SEARCH_RESULT_TTL seconds; results cut short by the latency
+    budget are returned but not stored.
+
+    The search is shared by every concurrent caller for the route, so it
+    reads the database through its own session rather than a caller's.
+    """
+    key = path_cache_key(source, destination, date)
+    search = _in_flight.get(key)
+    if search is None:
+        search = _in_flight[key] = asyncio.ensure_future(_find_paths(redis_client, source, destination, date))
+        search.add_done_callback(lambda _: _in_flight.pop(key, None))
+    return await asyncio.shield(search)
+
+
+async def _find_paths(redis_client, source, destination, date):
+    budget_ms = settings.ONLINE_SEARCH_BUDGET_MS
+
+    # Other API processes missing the same route wait for the first one instead of searching too
+    lock = RedisLock(
+        get_redis(), f"lock:online_search:{path_cache_key(source, destination, date)}",
+        timeout=budget_ms / 1000, lease_ms=budget_ms + settings.ONLINE_SEARCH_LOCK_MARGIN_MS, name="online_search",
+    )
+    locked = await asyncio.to_thread(lock.acquire)
+    try:
+        # The holder may have stored the route while we waited, whether or not the wait ran out
+        stored, summary = await path_store.get_paths_with_summary(redis_client, source, destination, date)
+        if stored is not None:
+            return json.loads(stored), json.loads(summary) if summary else None, True
+
+        graph = await graph_cache.get(date)
+        if locked:
+            # The graph build is not bounded by the budget; renew the lease for the search itself
+            await asyncio.to_thread(lock.extend)
+        top_k = settings.PRECOMPUTE_TOP_K
+        paths = await asyncio.to_thread(
+            search_from_source, graph, source,
+            top_k=top_k,
+            max_legs=settings.PRECOMPUTE_MAX_LEGS,
+            min_connection=settings.PRECOMPUTE_MIN_CONNECTION_MINUTES * 60,
+            target=destination,
+            deadline=time.monotonic() + budget_ms / 1000,
+        )
+        complete = not paths.timed_out
+        paths = paths.get(destination, [])
+        summary = summarize_paths(paths, graph.leg_times())
+
+        if complete:
+            await path_store.set_paths(
+                redis_client, source, destination, date,
+                serialize_paths(paths), serialize_summary(summary), settings.ONLINE_SEARCH_RESULT_TTL
+            )
+        return [flight_ids for _, flight_ids in paths], summary, complete
+    finally:
+        if locked:
+            await asyncio.to_thread(lock.release)
+
@@ -0,0 +1,54 @@
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+
+def encode_keyset_cursor(sort_value: datetime, row_id):
+    """Cursor pointing just past the row with this sort timestamp and ID."""
+    position = {"t": sort_value.isoformat(), "i": str(row_id)}
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+
+def decode_keyset_cursor(cursor):
+    """Returns the (timestamp, ID) position of a cursor. Raises ValueError for a malformed cursor."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(position["t"]), uuid.UUID(position["i"])
+    except (binascii.Error, UnicodeError, KeyError, TypeError, AttributeError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def keyset_query(query, sort_column, id_column, cursor=None, limit=None, descending=False):
+    """
+    Orders `query` by (`sort_column`, `id_column`) and starts it just past
+    `cursor`. Each page starts with a row comparison against the previous
+    page's last row instead of an OFFSET, so with an index ending in
+    (sort_column, id) every page costs the same no matter how deep it is.
+    One row more than `limit` is selected to tell whether a next page exists.
+    """
+    if cursor is not None:
+        position = tuple_(sort_column, id_column)
+        after = tuple_(*decode_keyset_cursor(cursor))
+        query = query.where(position < after if descending else position > after)
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column, id_column)
+    return query.limit(limit + 1) if limit is not None else query
+
+
+def keyset_page(db, query, sort_column, id_column, cursor=None, limit=None, descending=False):
+    """
+    Runs a keyset_query and returns one page of rows plus the cursor of the
+    next page (None on the last page). Without `limit`, every remaining row
+    is returned.
+    """
+    rows = db.execute(keyset_query(query, sort_column, id_column, cursor, limit, descending)).scalars().all()
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], encode_keyset_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
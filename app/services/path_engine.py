@@ -0,0 +1,307 @@
+import heapq
+import json
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import timezone
+
+DEFAULT_TOP_K = 20
+DEFAULT_MAX_LEGS = 5
+
+# Labels expanded between two checks of a search deadline
+DEADLINE_CHECK_INTERVAL = 256
+
+
+def path_cache_key(source, destination, date, version=None):
+    """
+    Builds the Redis key that holds the precomputed paths for a route and
+    date, inside the namespace of a precompute `version` when given.
+    """
+    key = f"{source}-{destination}-{date.strftime('%Y-%m-%d')}"
+    return key if version is None else versioned_path_key(key, version)
+
+
+def path_summary_key(source, destination, date, version=None):
+    """Builds the Redis key of the per-path summary stored next to a route's paths."""
+    key = f"summary:{source}-{destination}-{date.strftime('%Y-%m-%d')}"
+    return key if version is None else versioned_path_key(key, version)
+
+
+def versioned_path_key(key, version):
+    return f"paths:{version}:{key}"
+
+
+def departure_date(departure_ts):
+    """
+    The date a flight is filed under: the UTC date of its departure, whatever
+    the offset of the datetime or the database session's time zone. Naive
+    datetimes are taken as UTC. Path keys, the search sorted sets and the
+    per-date flight graphs all use this day boundary.
+    """
+    if departure_ts.tzinfo is not None:
+        departure_ts = departure_ts.astimezone(timezone.utc)
+    return departure_ts.date()
+
+
+def flight_to_leg(flight):
+    """
+    Converts a flight (ORM object or anything with the same attributes) into
+    the compact tuple used by the engine:
+    (flight_id, source, destination, departure_epoch, arrival_epoch, price).
+    """
+    departure = flight.departure_ts.timestamp()
+    arrival = flight.arrival_ts.timestamp() if flight.arrival_ts else departure
+    return (str(flight.id), flight.source, flight.destination, departure, arrival, float(flight.price))
+
+
+class DateGraph:
+    """
+    The flight network for a single day.
+    Outgoing legs of every airport are kept sorted by departure time so that
+    feasible connections can be found with a binary search; incoming legs
+    are kept sorted by arrival time for the reverse search.
+    """
+
+    def __init__(self, legs):
+        by_source = defaultdict(list)
+        by_destination = defaultdict(list)
+        airports = set()
+        for flight_id, source, destination, departure, arrival, price in legs:
+            by_source[source].append((departure, arrival, price, destination, flight_id))
+            by_destination[destination].append((arrival, departure, source))
+            airports.add(source)
+            airports.add(destination)
+
+        self.airports = airports
+        self.outgoing = {}
+        self.departures = {}
+        for source, source_legs in by_source.items():
+            source_legs.sort()
+            self.outgoing[source] = source_legs
+            self.departures[source] = [leg[0] for leg in source_legs]
+
+        self.incoming = {}
+        self.arrivals = {}
+        for destination, destination_legs in by_destination.items():
+            destination_legs.sort()
+            self.incoming[destination] = destination_legs
+            self.arrivals[destination] = [leg[0] for leg in destination_legs]
+
+        self._leg_times = None
+
+    def leg_times(self):
+        """Maps every flight ID to its (departure, arrival), built on first use."""
+        if self._leg_times is None:
+            self._leg_times = {
+                leg[4]: (leg[0], leg[1])
+                for source_legs in self.outgoing.values()
+                for leg in source_legs
+            }
+        return self._leg_times
+
+    def legs_before(self, airport, latest_arrival):
+        """Returns (arrival, departure, source) of the legs reaching `airport` no later than `latest_arrival`."""
+        destination_legs = self.incoming.get(airport)
+        if not destination_legs:
+            return ()
+        end = bisect_right(self.arrivals[airport], latest_arrival)
+        return destination_legs[:end]
+
+    def legs_after(self, airport, earliest_departure):
+        """Returns the legs leaving `airport` no earlier than `earliest_departure`."""
+        source_legs = self.outgoing.get(airport)
+        if not source_legs:
+            return ()
+        start = bisect_left(self.departures[airport], earliest_departure)
+        return source_legs[start:]
+
+
+class SearchResults(dict):
+    """Paths by destination, plus whether the search was cut short by its deadline."""
+
+    timed_out = False
+
+
+def search_from_source(graph, source, top_k=DEFAULT_TOP_K, max_legs=DEFAULT_MAX_LEGS, min_connection=0,
+                       target=None, deadline=None):
+    """
+    Finds the `top_k` cheapest time-respecting paths from `source` to every
+    reachable airport in a single best-first search.
+
+    A connection is feasible when the next leg departs at least
+    `min_connection` seconds after the previous leg arrives. Paths never
+    revisit an airport and have at most `max_legs` legs.
+
+    Labels are expanded in increasing price order. A label is pruned once
+    `top_k` cheaper labels have already reached the same airport no later
+    than it does, with no more legs and through no airport it has not
+    visited itself. Every continuation it could offer is then available to
+    each of them as well, within the leg limit and without a revisit.
+
+    With a `target`, the search stops as soon as `top_k` paths to it are
+    known. With a `deadline` (a `time.monotonic()` value), it stops once the
+    deadline passes and returns what it has found so far, with `timed_out`
+    set on the result.
+
+    Returns a SearchResults dict mapping destination -> list of
+    (total_price, [flight_id, ...]) ordered by price.
+    """
+    results = defaultdict(list)
+    timed_out = False
+    # (arrival, legs, visited airports) of the labels settled at each airport
+    settled_labels = defaultdict(list)
+
+    # A label is (airport, arrival, flight_id, parent_label, legs).
+    counter = 0
+    heap = [(0.0, counter, (source, float("-inf"), None, None, 0))]
+
+    expanded = 0
+    while heap:
+        if deadline is not None:
+            expanded += 1
+            if expanded % DEADLINE_CHECK_INTERVAL == 0 and time.monotonic() >= deadline:
+                timed_out = True
+                break
+
+        price, _, label = heapq.heappop(heap)
+        airport, arrival, _, _, legs = label
+
+        visited = _unwind_airports(label)
+        settled = settled_labels[airport]
+        dominating = sum(
+            1 for settled_arrival, settled_legs, settled_visited in settled
+            if settled_arrival <= arrival and settled_legs <= legs and settled_visited <= visited
+        )
+        if dominating >= top_k:
+            continue
+        settled.append((arrival, legs, visited))
+
+        if legs and len(results[airport]) < top_k:
+            results[airport].append((price, _unwind_flights(label)))
+            if airport == target and len(results[airport]) == top_k:
+                break
+
+        if legs >= max_legs:
+            continue
+
+        for departure, next_arrival, leg_price, destination, flight_id in graph.legs_after(airport, arrival + min_connection):
+            if destination in visited:
+                continue
+            counter += 1
+            heapq.heappush(
+                heap,
+                (price + leg_price, counter, (destination, next_arrival, flight_id, label, legs + 1))
+            )
+
+    found = SearchResults(results)
+    found.timed_out = timed_out
+    return found
+
+
+def _unwind_flights(label):
+    flight_ids = []
+    while label[2] is not None:
+        flight_ids.append(label[2])
+        label = label[3]
+    flight_ids.reverse()
+    return flight_ids
+
+
+def _unwind_airports(label):
+    airports = set()
+    while label is not None:
+        airports.add(label[0])
+        label = label[3]
+    return frozenset(airports)
+
+
+def affected_routes(graph, leg, max_legs=DEFAULT_MAX_LEGS, min_connection=0):
+    """
+    Returns (sources, destinations): every airport from which a path can
+    reach the leg in time to board it, and every airport a path can reach
+    after it, each within `max_legs` legs in total. Only routes between
+    these can have a path through the leg, so only they need recomputing
+    when it is added, changed or removed. The sets may be larger than
+    strictly necessary, never smaller.
+    """
+    _, source, destination, departure, arrival, _ = leg
+
+    # Latest time each airport can be left while still connecting to the leg
+    latest = {source: departure}
+    frontier = {source: departure}
+    for _ in range(max_legs - 1):
+        next_frontier = {}
+        for airport, leave_by in frontier.items():
+            for _, prev_departure, prev_source in graph.legs_before(airport, leave_by - min_connection):
+                if prev_departure > latest.get(prev_source, float("-inf")):
+                    latest[prev_source] = prev_departure
+                    next_frontier[prev_source] = prev_departure
+        frontier = next_frontier
+
+    # Earliest time each airport can be reached after taking the leg
+    earliest = {destination: arrival}
+    frontier = {destination: arrival}
+    for _ in range(max_legs - 1):
+        next_frontier = {}
+        for airport, arrive_at in frontier.items():
+            for _, next_arrival, _, next_destination, _ in graph.legs_after(airport, arrive_at + min_connection):
+                if next_arrival < earliest.get(next_destination, float("inf")):
+                    earliest[next_destination] = next_arrival
+                    next_frontier[next_destination] = next_arrival
+        frontier = next_frontier
+
+    return set(latest), set(earliest)
+
+
+def serialize_paths(paths):
+    """Serializes engine output into the JSON list of flight ID lists stored in Redis."""
+    return json.dumps([flight_ids for _, flight_ids in paths])
+
+
+def summarize_paths(paths, leg_times):
+    """
+    Describes each path of a route (price, first departure, total duration,
+    stops) and precomputes the path order for every sort besides price, so
+    results can be filtered, sorted and paginated without loading flights.
+    Ties keep price order.
+    """
+    summary = {"price": [], "departure": [], "duration": [], "stops": []}
+    for price, flight_ids in paths:
+        departure = leg_times[flight_ids[0]][0]
+        summary["price"].append(round(price, 2))
+        summary["departure"].append(departure)
+        summary["duration"].append(leg_times[flight_ids[-1]][1] - departure)
+        summary["stops"].append(len(flight_ids) - 1)
+    summary["order"] = {
+        sort: sorted(range(len(paths)), key=lambda i, values=summary[sort]: (values[i], i))
+        for sort in ("departure", "duration", "stops")
+    }
+    return summary
+
+
+def serialize_summary(summary):
+    return json.dumps(summary, separators=(",", ":"))
+
+
+def process_date(task, top_k, max_legs, min_connection, destination=None):
+    """
+    Worker function for a single date.
+    Builds the date's graph once and runs one search per source airport,
+    returning (redis_key, redis_value) pairs with the paths and the path
+    summary of every reachable destination (or only `destination`, when given).
+    """
+    date, legs, sources = task
+    graph = DateGraph(legs)
+    leg_times = graph.leg_times()
+
+    results = []
+    for src in sources:
+        paths_by_destination = search_from_source(
+            graph, src, top_k=top_k, max_legs=max_legs, min_connection=min_connection
+        )
+        for dst, paths in paths_by_destination.items():
+            if destination is not None and dst != destination:
+                continue
+            results.append((path_cache_key(src, dst, date), serialize_paths(paths)))
+            results.append((path_summary_key(src, dst, date), serialize_summary(summarize_paths(paths, leg_times))))
+    return results
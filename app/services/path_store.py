@@ -0,0 +1,244 @@
+import itertools
+from collections import defaultdict
+import datetime
+
+import redis
+import redis.asyncio as aioredis
+
+from app.core.async_redis_client import run_async_script
+from app.core.redis_client import run_script
+from app.services.path_engine import path_cache_key, path_summary_key, versioned_path_key
+
+# Version whose namespace (`paths:{version}:*`) readers use. Without it,
+# paths are read from the unversioned keys written before versioning.
+ACTIVE_VERSION_KEY = "paths:active_version"
+VERSION_COUNTER_KEY = "paths:next_version"
+
+# Set while a full precomputation builds a new version. Incremental updates
+# made meanwhile go to the old version, so their routes are recorded in
+# REBUILD_ROUTES_KEY and recomputed into the new one once it is active.
+BUILD_MARKER_KEY = "paths:building"
+REBUILD_ROUTES_KEY = "paths:rebuild_routes"
+# Refreshed as the run progresses, so a killed run stops the recording
+BUILD_MARKER_TTL = 3600
+
+# Timings of the last full precomputation, written by precompute_flights.py
+# and exported by the worker's metrics collector
+LAST_RUN_KEY = "precompute:last_run"
+
+# Resolves the active version and reads the keys in one atomic step, so a
+# reader never mixes two versions. The versioned keys are only known inside
+# the script, so they cannot be declared in KEYS: the path store needs a
+# single Redis instance (see require_single_instance), and a Redis user
+# restricted by ACL key patterns needs access to `paths:*`.
+READ_PATHS_SCRIPT = """
+local version = redis.call('GET', KEYS[1])
+local keys = {}
+for i, key in ipairs(ARGV) do
+    keys[i] = version and ('paths:' .. version .. ':' .. key) or key
+end
+return redis.call('MGET', unpack(keys))
+"""
+
+# Writes key/value pairs into the active version's namespace with an expiry
+WRITE_PATHS_SCRIPT = """
+local version = redis.call('GET', KEYS[1])
+for i = 2, #ARGV, 2 do
+    local key = version and ('paths:' .. version .. ':' .. ARGV[i]) or ARGV[i]
+    redis.call('SET', key, ARGV[i + 1], 'EX', ARGV[1])
+end
+return 1
+"""
+
+SWAP_VERSION_SCRIPT = """
+local previous = redis.call('GET', KEYS[1])
+redis.call('SET', KEYS[1], ARGV[1])
+return previous
+"""
+
+RECORD_ROUTES_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+return redis.call('SADD', KEYS[2], unpack(ARGV))
+"""
+
+
+async def get_paths(redis_client: aioredis.Redis, source, destination, date):
+    """Returns the JSON list of flight ID lists of the active version, or None."""
+    paths, = await run_async_script(
+        redis_client, READ_PATHS_SCRIPT, keys=[ACTIVE_VERSION_KEY], args=[path_cache_key(source, destination, date)]
+    )
+    return paths
+
+
+async def get_paths_with_summary(redis_client: aioredis.Redis, source, destination, date):
+    """Returns the paths and their summary (see path_engine.summarize_paths); either may be None."""
+    paths, summary = await run_async_script(
+        redis_client, READ_PATHS_SCRIPT, keys=[ACTIVE_VERSION_KEY],
+        args=[path_cache_key(source, destination, date), path_summary_key(source, destination, date)],
+    )
+    return paths, summary
+
+
+async def get_paths_for_dates(redis_client: aioredis.Redis, source, destination, dates):
+    """Returns [(paths, summary)] for each of `dates`, read in a single round trip."""
+    keys = []
+    for date in dates:
+        keys.append(path_cache_key(source, destination, date))
+        keys.append(path_summary_key(source, destination, date))
+    values = await run_async_script(redis_client, READ_PATHS_SCRIPT, keys=[ACTIVE_VERSION_KEY], args=keys)
+    return list(zip(values[::2], values[1::2]))
+
+
+async def set_paths(redis_client: aioredis.Redis, source, destination, date, paths, summary, ttl):
+    """Stores paths found outside precomputation in the active version, expiring after `ttl` seconds."""
+    await run_async_script(
+        redis_client, WRITE_PATHS_SCRIPT, keys=[ACTIVE_VERSION_KEY],
+        args=[
+            ttl,
+            path_cache_key(source, destination, date), paths,
+            path_summary_key(source, destination, date), summary,
+        ],
+    )
+
+
+def require_single_instance(redis_client: redis.Redis):
+    """
+    Refuses to run against Redis Cluster, where the versioned keys built by
+    READ_PATHS_SCRIPT and WRITE_PATHS_SCRIPT may live on another node.
+    An unreachable server is left to the callers that need it.
+    """
+    try:
+        cluster_enabled = redis_client.info("cluster").get("cluster_enabled")
+    except redis.RedisError:
+        return
+    if cluster_enabled:
+        raise RuntimeError("The path store needs a single Redis instance; Redis Cluster is not supported")
+
+
+def active_version(redis_client: redis.Redis):
+    """The version incremental updates must write to, or None for the unversioned keys."""
+    version = redis_client.get(ACTIVE_VERSION_KEY)
+    return version.decode("utf-8") if version is not None else None
+
+
+def new_version(redis_client: redis.Redis):
+    return str(redis_client.incr(VERSION_COUNTER_KEY))
+
+
+def store_paths(redis_client: redis.Redis, results, version=None, ttl=None, batch_size=1000):
+    """
+    Writes (key, value) pairs produced by the engine into `version`'s
+    namespace with one pipeline round trip per `batch_size` pairs.
+    Returns the number of keys written.
+    """
+    written = 0
+    batch = {}
+
+    def flush():
+        with redis_client.pipeline(transaction=False) as pipe:
+            if ttl:
+                for key, value in batch.items():
+                    pipe.set(key, value, ex=ttl)
+            else:
+                pipe.mset(batch)
+            pipe.execute()
+
+    for key, value in results:
+        batch[key if version is None else versioned_path_key(key, version)] = value
+        if len(batch) >= batch_size:
+            flush()
+            written += len(batch)
+            batch = {}
+    if batch:
+        flush()
+        written += len(batch)
+    return written
+
+
+def activate_version(redis_client: redis.Redis, version):
+    """Atomically points readers at `version`. Returns the previously active version, if any."""
+    previous = run_script(redis_client, SWAP_VERSION_SCRIPT, keys=[ACTIVE_VERSION_KEY], args=[version])
+    return previous.decode("utf-8") if previous is not None else None
+
+
+def drop_version(redis_client: redis.Redis, version, batch_size=1000):
+    """Unlinks every key of an inactive version's namespace."""
+    batch = []
+    for key in redis_client.scan_iter(match=versioned_path_key("*", version), count=batch_size):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            redis_client.unlink(*batch)
+            batch = []
+    if batch:
+        redis_client.unlink(*batch)
+
+
+def drop_unversioned(redis_client: redis.Redis, batch_size=1000):
+    """Unlinks the `{source}-{destination}-{date}` and `summary:*` keys written before versioning."""
+    batch = []
+    keys = itertools.chain(
+        (key for key in redis_client.scan_iter(match="*-*-[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]", count=batch_size)
+         if b":" not in key),
+        redis_client.scan_iter(match="summary:*", count=batch_size),
+    )
+    for key in keys:
+        batch.append(key)
+        if len(batch) >= batch_size:
+            redis_client.unlink(*batch)
+            batch = []
+    if batch:
+        redis_client.unlink(*batch)
+
+
+def mark_build(redis_client: redis.Redis):
+    """Starts, or keeps alive, the recording of routes updated during a full run."""
+    redis_client.set(BUILD_MARKER_KEY, 1, ex=BUILD_MARKER_TTL)
+
+
+def build_in_progress(redis_client: redis.Redis):
+    return bool(redis_client.exists(BUILD_MARKER_KEY))
+
+
+def finish_build(redis_client: redis.Redis):
+    """Stops the recording. The recorded routes stay until take_rebuild_routes."""
+    redis_client.delete(BUILD_MARKER_KEY)
+
+
+def record_rebuild_routes(redis_client: redis.Redis, date, routes):
+    """Records the {source: destinations} recomputed on `date`, if a full run is building."""
+    members = [
+        f"{date.isoformat()}|{source}|{destination}"
+        for source, destinations in routes.items()
+        for destination in destinations
+        if destination != source
+    ]
+    if members:
+        run_script(redis_client, RECORD_ROUTES_SCRIPT, keys=[BUILD_MARKER_KEY, REBUILD_ROUTES_KEY], args=members)
+
+
+def take_rebuild_routes(redis_client: redis.Redis):
+    """Removes and returns the recorded routes as {date: {source: {destinations}}}."""
+    with redis_client.pipeline() as pipe:
+        pipe.smembers(REBUILD_ROUTES_KEY)
+        pipe.delete(REBUILD_ROUTES_KEY)
+        members, _ = pipe.execute()
+    routes = defaultdict(lambda: defaultdict(set))
+    for member in members:
+        day, source, destination = member.decode("utf-8").split("|")
+        routes[datetime.date.fromisoformat(day)][source].add(destination)
+    return routes
+
+
+def record_last_run(redis_client: redis.Redis, summary):
+    """Replaces the last full run's summary, a flat dict of numbers."""
+    with redis_client.pipeline() as pipe:
+        pipe.delete(LAST_RUN_KEY)
+        pipe.hset(LAST_RUN_KEY, mapping=summary)
+        pipe.execute()
+
+
+def last_run(redis_client: redis.Redis):
+    """The last full run's summary as {field: float}, or {} if none was recorded."""
+    return {key.decode("utf-8"): float(value) for key, value in redis_client.hgetall(LAST_RUN_KEY).items()}
@@ -0,0 +1,225 @@
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import redis
+from sqlalchemy import select
+
+from app.core import metrics
+from app.models import models
+from app.services import path_store, response_cache
+from app.services.path_engine import (
+    DateGraph, affected_routes, departure_date, flight_to_leg, path_cache_key, path_summary_key, process_date,
+)
+
+# Sources per task sent to the process pool
+SOURCES_PER_TASK = 8
+
+
+class IncrementalPrecomputer:
+    """
+    Keeps the precomputed paths in Redis up to date from flight change events
+    without reloading the whole flights table.
+
+    The legs of every date are held in memory. Changed flight IDs are
+    collected per date, and a date is processed once no new change has
+    arrived for `debounce` seconds (or `max_delay` seconds after its first
+    change). Processing re-reads only the changed flights, applies them to
+    the date's legs and recomputes the routes that could have a path through
+    any old or new version of those flights. Searches run on a process pool
+    of `workers` processes. Entries expire after `result_ttl` seconds, like
+    those of a full run, or never when it is None.
+    """
+
+    def __init__(self, session_factory, redis_client: redis.Redis, top_k, max_legs, min_connection,
+                 debounce=1.0, max_delay=10.0, workers=2, result_ttl=None):
+        self.session_factory = session_factory
+        self.redis_client = redis_client
+        self.top_k = top_k
+        self.max_legs = max_legs
+        self.min_connection = min_connection
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.workers = workers
+        self.result_ttl = result_ttl
+
+        self.legs_by_date = defaultdict(dict)  # date -> {flight_id: leg}
+        self.flight_dates = {}  # flight_id -> date
+        self._pending = {}  # date -> [flight_ids, first_change, last_change]
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        # Routes recorded while the worker was down are recomputed on startup
+        self._build_activated = True
+
+    def load(self):
+        """Loads the legs of every flight. Changes notified meanwhile are applied afterwards."""
+        db = self.session_factory()
+        try:
+            rows = db.execute(select(models.Flight).execution_options(yield_per=5000)).scalars()
+            for flight in rows:
+                self._put(flight)
+        finally:
+            db.close()
+        print(f"Loaded {len(self.flight_dates)} flights into the incremental precomputer.")
+
+    def notify(self, date, flight_ids):
+        """Records that `flight_ids` departing on `date` were created, changed or deleted."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._pending.get(date)
+            if entry is None:
+                entry = self._pending[date] = [set(), now, now]
+            entry[0].update(flight_ids)
+            entry[2] = now
+        self._wakeup.set()
+
+    def notify_build_activated(self):
+        """Records that a full run has activated its version; see path_store.BUILD_MARKER_KEY."""
+        with self._lock:
+            self._build_activated = True
+        self._wakeup.set()
+
+    def run(self):
+        """Loads the legs, then processes debounced dates forever."""
+        self.load()
+        # Spawned rather than forked: this process runs other threads holding locks
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            while True:
+                self._wakeup.wait(timeout=self.debounce)
+                self._wakeup.clear()
+                with self._lock:
+                    build_activated, self._build_activated = self._build_activated, False
+                if build_activated:
+                    try:
+                        self._replay_build(pool)
+                    except Exception as e:
+                        print(f"Error while recomputing routes updated during the full precomputation: {e}")
+                for date, flight_ids in self._take_due():
+                    try:
+                        self._process(pool, date, flight_ids)
+                    except Exception as e:
+                        print(f"Error during incremental precomputation for {date}: {e}")
+
+    def _take_due(self):
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for date, (flight_ids, first_change, last_change) in list(self._pending.items()):
+                if now - last_change >= self.debounce or now - first_change >= self.max_delay:
+                    due.append((date, flight_ids))
+                    del self._pending[date]
+        return due
+
+    def _put(self, flight):
+        flight_id = str(flight.id)
+        date = departure_date(flight.departure_ts)
+        self.legs_by_date[date][flight_id] = flight_to_leg(flight)
+        self.flight_dates[flight_id] = date
+
+    def _remove(self, flight_id):
+        date = self.flight_dates.pop(flight_id, None)
+        if date is None:
+            return None
+        return date, self.legs_by_date[date].pop(flight_id)
+
+    def _refresh(self, flight_ids):
+        """
+        Re-reads the given flights and applies them to the in-memory legs.
+        Returns the legs touched on each date, old and new versions alike.
+        """
+        db = self.session_factory()
+        try:
+            flights = db.execute(
+                select(models.Flight).where(models.Flight.id.in_([uuid.UUID(str(flight_id)) for flight_id in flight_ids]))
+            ).scalars().all()
+        finally:
+            db.close()
+
+        touched = defaultdict(list)
+        for flight_id in flight_ids:
+            removed = self._remove(str(flight_id))
+            if removed is not None:
+                touched[removed[0]].append(removed[1])
+        for flight in flights:
+            self._put(flight)
+            touched[departure_date(flight.departure_ts)].append(flight_to_leg(flight))
+        return touched
+
+    def _affected(self, date, legs):
+        """Maps each source that needs recomputing to the destinations whose entries may change."""
+        # Old versions of the legs are included so paths through them are found and dropped
+        graph = DateGraph(list(self.legs_by_date[date].values()) + legs)
+        routes = defaultdict(set)
+        for leg in legs:
+            sources, destinations = affected_routes(graph, leg, self.max_legs, self.min_connection)
+            for source in sources:
+                routes[source].update(destinations)
+        return routes
+
+    def _process(self, pool, date, flight_ids):
+        started = time.perf_counter()
+        touched = self._refresh(flight_ids)
+        # A flight moved to another day changes both days
+        dates = {date, *touched}
+
+        for day in dates:
+            day_started = time.perf_counter()
+            routes = self._affected(day, touched.get(day, []))
+            if not routes:
+                continue
+            # A full run building a new version meanwhile must pick these routes up as well
+            path_store.record_rebuild_routes(self.redis_client, day, routes)
+            self._recompute(pool, day, routes)
+            metrics.precompute_duration.labels("incremental", "date").observe(time.perf_counter() - day_started)
+            print(
+                f"Recomputed {sum(len(d) for d in routes.values())} route(s) from {len(routes)} source(s) "
+                f"on {day} in {time.perf_counter() - started:.2f}s"
+            )
+        metrics.precompute_duration.labels("incremental", "run").observe(time.perf_counter() - started)
+
+    def _recompute(self, pool, date, routes):
+        """Recomputes and stores the {source: destinations} routes of `date` from the in-memory legs."""
+        legs = list(self.legs_by_date[date].values())
+        sources = sorted(routes)
+        tasks = [(date, legs, sources[i:i + SOURCES_PER_TASK]) for i in range(0, len(sources), SOURCES_PER_TASK)]
+        worker_func = partial(
+            process_date, top_k=self.top_k, max_legs=self.max_legs, min_connection=self.min_connection
+        )
+        stored = dict(kv for results in pool.map(worker_func, tasks) for kv in results)
+        self._store(date, routes, stored)
+
+    def _replay_build(self, pool):
+        """Recomputes the routes updated while a full run was building, now that its version is active."""
+        if path_store.build_in_progress(self.redis_client):
+            # A newer run has started; it reads the flights after these changes
+            return
+        started = time.perf_counter()
+        rebuild = path_store.take_rebuild_routes(self.redis_client)
+        for date, routes in rebuild.items():
+            self._recompute(pool, date, routes)
+        if rebuild:
+            print(
+                f"Recomputed {sum(len(d) for routes in rebuild.values() for d in routes.values())} route(s) "
+                f"updated during the full precomputation in {time.perf_counter() - started:.2f}s"
+            )
+
+    def _store(self, date, routes, stored):
+        """Writes the recomputed entries of the affected routes and drops those left without a path."""
+        version = path_store.active_version(self.redis_client)
+        with self.redis_client.pipeline(transaction=False) as pipe:
+            for source, destinations in routes.items():
+                for destination in destinations:
+                    if destination == source:
+                        continue
+                    for key_func in (path_cache_key, path_summary_key):
+                        key = key_func(source, destination, date)
+                        if key in stored:
+                            pipe.set(key_func(source, destination, date, version), stored[key], ex=self.result_ttl)
+                        else:
+                            pipe.delete(key_func(source, destination, date, version))
+                    pipe.delete(response_cache.response_cache_key(source, destination, date))
+            pipe.execute()
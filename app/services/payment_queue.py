@@ -0,0 +1,138 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import UUID
+
+import redis
+
+from app.core import metrics
+from app.models import models
+from app.services import redis_streams, seat_reservations
+from app.services.payment_service import mock_payment_service
+
+PAYMENT_STREAM = "payment_jobs"
+PAYMENT_GROUP = "payment_workers"
+BOOKING_STATUS_CHANNEL_PREFIX = "booking_status:"
+
+# Keep the stream bounded; acknowledged jobs are only useful for debugging
+STREAM_MAX_LENGTH = 100000
+
+
+def booking_status_channel(booking_id):
+    return f"{BOOKING_STATUS_CHANNEL_PREFIX}{booking_id}"
+
+
+def enqueue_payment(redis_client: redis.Redis, booking_id, force_failure: bool = False):
+    """Queues the payment of a PENDING booking for the worker."""
+    redis_client.xadd(
+        PAYMENT_STREAM,
+        {"booking_id": str(booking_id), "force_failure": "1" if force_failure else "0"},
+        maxlen=STREAM_MAX_LENGTH,
+        approximate=True,
+    )
+
+
+def process_payment_job(redis_client: redis.Redis, session_factory, booking_id: str, force_failure: bool):
+    """
+    Drives a booking from PENDING to CONFIRMED or FAILED.
+    Jobs for bookings that are no longer PENDING are ignored, and a booking
+    that was already charged is not charged again, so a job redelivered
+    after a worker crash is harmless.
+    """
+    db = session_factory()
+    try:
+        db_booking = db.get(models.Booking, UUID(booking_id))
+        if db_booking is None or db_booking.status != "PENDING":
+            return
+
+        paid = db_booking.payment_ref is not None
+        if not paid:
+            payment_result = mock_payment_service(db_booking.id, force_failure=force_failure)
+            if payment_result["status"] == "SUCCESS":
+                # Record the charge before confirming: a redelivered job finds it and skips the payment
+                db_booking.payment_ref = payment_result["payment_ref"]
+                db.commit()
+                paid = True
+
+        if paid and seat_reservations.confirm_reservation(redis_client, booking_id):
+            db_booking.status = "CONFIRMED"
+
+            # On success, publish the flight ID to the seat_updates channel
+            redis_client.publish("seat_updates", str(db_booking.flight_id))
+        else:
+            # Payment failed, or the reservation expired and its seats were already returned
+            db_booking.status = "FAILED"
+
+            # Compensating action: atomically return the reserved seats (a no-op if already released)
+            seat_reservations.release_reservation(redis_client, booking_id, db_booking.flight_id)
+
+        db.commit()
+        metrics.booking_outcomes.labels(db_booking.status.lower()).inc()
+        redis_client.publish(booking_status_channel(booking_id), db_booking.status)
+    finally:
+        db.close()
+
+
+def run_payment_consumer(redis_client: redis.Redis, session_factory, consumer_name: str, concurrency: int, claim_idle_ms: int):
+    """
+    Consumes the payment stream with up to `concurrency` payments in flight.
+    Jobs are acknowledged once processed; jobs left unacknowledged by a dead
+    consumer for `claim_idle_ms` are claimed and retried.
+    """
+    redis_streams.ensure_consumer_group(redis_client, PAYMENT_STREAM, PAYMENT_GROUP)
+    slots = threading.BoundedSemaphore(concurrency)
+
+    def handle(message_id, fields):
+        try:
+            if not fields:
+                # The entry was trimmed from the stream before it could be processed
+                redis_client.xack(PAYMENT_STREAM, PAYMENT_GROUP, message_id)
+                return
+            process_payment_job(
+                redis_client, session_factory,
+                fields[b"booking_id"].decode("utf-8"),
+                fields.get(b"force_failure") == b"1",
+            )
+            redis_client.xack(PAYMENT_STREAM, PAYMENT_GROUP, message_id)
+        except Exception as e:
+            print(f"Error processing payment job {message_id}: {e}")
+        finally:
+            slots.release()
+
+    def reserve_slots():
+        # Block for one free slot, then take whatever else is free right now
+        slots.acquire()
+        taken = 1
+        while taken < concurrency and slots.acquire(blocking=False):
+            taken += 1
+        return taken
+
+    # Start with our own jobs left unacknowledged by a previous run of this consumer
+    backlog = redis_streams.read_own_pending(redis_client, PAYMENT_STREAM, PAYMENT_GROUP, consumer_name, page_size=100)
+    last_claim = 0.0
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="payment") as executor:
+        while True:
+            taken = reserve_slots()
+            try:
+                messages = []
+                if backlog:
+                    messages, backlog = backlog[:taken], backlog[taken:]
+                elif time.monotonic() - last_claim > claim_idle_ms / 1000:
+                    last_claim = time.monotonic()
+                    messages = redis_streams.claim_stale(
+                        redis_client, PAYMENT_STREAM, PAYMENT_GROUP, consumer_name, claim_idle_ms, taken
+                    )
+                if not messages:
+                    response = redis_client.xreadgroup(
+                        PAYMENT_GROUP, consumer_name, {PAYMENT_STREAM: ">"}, count=taken, block=1000
+                    )
+                    messages = response[0][1] if response else []
+            except Exception as e:
+                print(f"Error reading payment jobs: {e}")
+                messages = []
+                time.sleep(1)
+
+            for message_id, fields in messages:
+                executor.submit(handle, message_id, fields)
+            for _ in range(taken - len(messages)):
+                slots.release()
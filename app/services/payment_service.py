@@ -0,0 +1,15 @@
+import random
+import time
+import uuid
+from uuid import UUID
+
+def mock_payment_service(booking_id: UUID, force_failure: bool = False):
+    """
+    Simulates a call to a payment service.
+    - Introduces a random delay.
+    - Randomly succeeds or fails.
+    """
+    time.sleep(random.uniform(0.5, 3))  # Simulate network latency
+    if force_failure or random.random() < 0.2:  # 20% chance of failure
+        return {"status": "FAILED", "payment_ref": f"ref_{uuid.uuid4()}"}
+    return {"status": "SUCCESS", "payment_ref": f"ref_{uuid.uuid4()}"}
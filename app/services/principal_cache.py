@@ -0,0 +1,135 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import redis
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+
+class Principal:
+    """The parts of a user that authorization needs, without an ORM session."""
+
+    __slots__ = ("id", "username", "is_admin")
+
+    def __init__(self, id, username, is_admin):
+        self.id = id
+        self.username = username
+        self.is_admin = bool(is_admin)
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.is_admin)
+
+    def to_mapping(self):
+        return {"id": str(self.id), "username": self.username, "is_admin": int(self.is_admin)}
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        return cls(uuid.UUID(mapping[b"id"].decode("utf-8")), mapping[b"username"].decode("utf-8"), int(mapping[b"is_admin"]))
+
+
+def principal_key(username):
+    return f"principal:{username}"
+
+
+class PrincipalCache:
+    """
+    Resolves a token subject to its Principal through two layers: a small
+    in-process LRU whose entries live `local_ttl` seconds, then a Redis hash
+    shared by all processes that lives `redis_ttl` seconds. Only a miss in
+    both reaches the `load` callable, normally a users table lookup.
+
+    `invalidate` clears this process's entry and the Redis one; other
+    processes keep theirs for at most `local_ttl` seconds.
+    """
+
+    def __init__(self, local_ttl=5.0, redis_ttl=300, max_entries=10000):
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # username -> (expires_at, principal)
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "token_claims": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _get_local(self, username):
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[username]
+                return None
+            self._entries.move_to_end(username)
+            self._stats["local_hits"] += 1
+            return entry[1]
+
+    def _put_local(self, principal):
+        with self._lock:
+            self._entries[principal.username] = (time.monotonic() + self.local_ttl, principal)
+            self._entries.move_to_end(principal.username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, redis_client: redis.Redis, username, load):
+        """Returns the Principal for `username`, or None if `load` finds no such user."""
+        principal = self._get_local(username)
+        if principal is not None:
+            return principal
+
+        key = principal_key(username)
+        try:
+            mapping = redis_client.hgetall(key)
+        except redis.RedisError as e:
+            print(f"Principal cache unavailable, reading user from the database: {e}")
+            mapping = None
+        if mapping:
+            principal = Principal.from_mapping(mapping)
+            self._count("redis_hits")
+        else:
+            self._count("misses")
+            principal = load(username)
+            if principal is None:
+                return None
+            if mapping is not None:
+                try:
+                    with redis_client.pipeline() as pipe:
+                        pipe.hset(key, mapping=principal.to_mapping())
+                        pipe.expire(key, self.redis_ttl)
+                        pipe.execute()
+                except redis.RedisError as e:
+                    print(f"Could not cache principal {username}: {e}")
+
+        self._put_local(principal)
+        return principal
+
+    def record_token_claims(self):
+        """Counts a principal taken straight from token claims, with no lookup at all."""
+        self._count("token_claims")
+
+    def invalidate(self, redis_client: redis.Redis, username):
+        """Drops `username` from this process and from Redis after its user row changed."""
+        with self._lock:
+            self._entries.pop(username, None)
+        redis_client.delete(principal_key(username))
+
+    async def invalidate_async(self, redis_client: aioredis.Redis, username):
+        """invalidate for async handlers."""
+        with self._lock:
+            self._entries.pop(username, None)
+        await redis_client.delete(principal_key(username))
+
+    def snapshot(self):
+        with self._lock:
+            return {**self._stats, "local_entries": len(self._entries)}
+
+
+principal_cache = PrincipalCache(
+    settings.PRINCIPAL_CACHE_LOCAL_TTL, settings.PRINCIPAL_CACHE_TTL, settings.PRINCIPAL_CACHE_MAX_ENTRIES
+)
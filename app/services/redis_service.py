@@ -1,39 +1,114 @@
 import redis
 from app.models.models import Flight
 from app.schemas import schemas
+from app.services.path_engine import departure_date
 import json
 
-def update_flight_in_redis(redis_client: redis.Redis, flight: Flight):
+AIRPORTS_KEY = "airports"
+AIRPORTS_VERSION_KEY = "airports:version"
+# Set by a full rebuild from the flights table; the index is only complete once it exists
+AIRPORTS_BUILT_KEY = "airports:built"
+
+# Keeps a per-airport count of the flights touching it. The flight hash is
+# used as a guard so that adding or removing the same flight twice does not
+# skew the counts. The version is bumped whenever an airport appears or
+# disappears, which tells API processes to reload their in-memory registry.
+TRACK_AIRPORTS_SCRIPT = """
+local registered = redis.call('HEXISTS', KEYS[3], 'source')
+local delta = tonumber(ARGV[1])
+if (delta > 0 and registered == 1) or (delta < 0 and registered == 0) then
+    return 0
+end
+local changed = 0
+for i = 2, #ARGV do
+    local count = redis.call('HINCRBY', KEYS[1], ARGV[i], delta)
+    if count <= 0 then
+        redis.call('HDEL', KEYS[1], ARGV[i])
+        changed = 1
+    elseif count == 1 and delta > 0 then
+        changed = 1
+    end
+end
+if changed == 1 then
+    redis.call('INCR', KEYS[2])
+end
+return changed
+"""
+
+def track_airports(pipe, flight: Flight, delta: int):
+    """Queues the airport count update for a flight being added (+1) or removed (-1)."""
+    pipe.eval(
+        TRACK_AIRPORTS_SCRIPT, 3,
+        AIRPORTS_KEY, AIRPORTS_VERSION_KEY, f"flight:{flight.id}",
+        delta, flight.source, flight.destination
+    )
+
+def queue_flight_update(pipe, flight: Flight, track_airports_index: bool = True):
     """
-    Creates or updates the necessary Redis entries for a given flight.
+    Queues the commands that create or update the Redis entries for a flight
+    on an existing pipeline, so callers can batch many flights per round trip.
     - A Hash for the flight object.
     - Entries in Sorted Sets for searching by price and departure time.
     - A counter for available seats.
+    - The flight's airports in the airport registry (bulk loaders skip this
+      and rebuild the index once at the end).
+    """
+    # 0. Count the airports before the hash exists, so re-adding is a no-op
+    if track_airports_index:
+        track_airports(pipe, flight, 1)
+
+    # 1. Store the main flight object as a Hash
+    flight_key = f"flight:{flight.id}"
+    flight_data = schemas.Flight.from_orm(flight).dict()
+    # Convert complex types to strings for the hash
+    for key, value in flight_data.items():
+        if not isinstance(value, (str, int, float, bool)):
+            flight_data[key] = str(value)
+
+    pipe.hset(flight_key, mapping=flight_data)
+
+    # 2. Add to Sorted Sets for searching
+    search_key_price = f"search:{flight.source}:{flight.destination}:{departure_date(flight.departure_ts)}:price"
+    search_key_fastest = f"search:{flight.source}:{flight.destination}:{departure_date(flight.departure_ts)}:fastest"
+
+    pipe.zadd(search_key_price, {str(flight.id): float(flight.price)})
+    pipe.zadd(search_key_fastest, {str(flight.id): flight.departure_ts.timestamp()})
+
+    # 3. Set the initial seat availability counter
+    seat_key = f"flight_seats:{flight.id}"
+    # Only set the seats if the key doesn't exist to avoid overwriting during an update
+    pipe.setnx(seat_key, flight.available_seats)
+
+def queue_flight_removal(pipe, flight: Flight, track_airports_index: bool = True, keep_seats: bool = False):
+    """
+    Queues the commands that delete every Redis entry of a flight on an
+    existing pipeline. With `keep_seats` the live seat counter survives, for
+    a flight that is about to be re-added under a new route.
+    """
+    # Release the flight's airports while its hash still exists
+    if track_airports_index:
+        track_airports(pipe, flight, -1)
+
+    # Delete the main hash
+    pipe.delete(f"flight:{flight.id}")
+
+    # Remove from sorted sets
+    search_key_price = f"search:{flight.source}:{flight.destination}:{departure_date(flight.departure_ts)}:price"
+    search_key_fastest = f"search:{flight.source}:{flight.destination}:{departure_date(flight.departure_ts)}:fastest"
+    pipe.zrem(search_key_price, str(flight.id))
+    pipe.zrem(search_key_fastest, str(flight.id))
+
+    # Delete the seat counter
+    if not keep_seats:
+        pipe.delete(f"flight_seats:{flight.id}")
+
+def update_flight_in_redis(redis_client: redis.Redis, flight: Flight):
+    """
+    Creates or updates the necessary Redis entries for a given flight.
     """
     # Use a pipeline for atomic execution
     with redis_client.pipeline() as pipe:
-        # 1. Store the main flight object as a Hash
-        flight_key = f"flight:{flight.id}"
-        flight_data = schemas.Flight.from_orm(flight).dict()
-        # Convert complex types to strings for the hash
-        for key, value in flight_data.items():
-            if not isinstance(value, (str, int, float, bool)):
-                flight_data[key] = str(value)
-        
-        pipe.hset(flight_key, mapping=flight_data)
-
-        # 2. Add to Sorted Sets for searching
-        search_key_price = f"search:{flight.source}:{flight.destination}:{flight.departure_ts.date()}:price"
-        search_key_fastest = f"search:{flight.source}:{flight.destination}:{flight.departure_ts.date()}:fastest"
-        
-        pipe.zadd(search_key_price, {str(flight.id): float(flight.price)})
-        pipe.zadd(search_key_fastest, {str(flight.id): flight.departure_ts.timestamp()})
-
-        # 3. Set the initial seat availability counter
-        seat_key = f"flight_seats:{flight.id}"
-        # Only set the seats if the key doesn't exist to avoid overwriting during an update
-        pipe.setnx(seat_key, flight.available_seats)
-        
+        queue_flight_update(pipe, flight)
         pipe.execute()
 
 def delete_flight_from_redis(redis_client: redis.Redis, flight: Flight):
@@ -41,16 +116,5 @@ def delete_flight_from_redis(redis_client: redis.Redis, flight: Flight):
     Deletes all Redis entries associated with a flight.
     """
     with redis_client.pipeline() as pipe:
-        # Delete the main hash
-        pipe.delete(f"flight:{flight.id}")
-
-        # Remove from sorted sets
-        search_key_price = f"search:{flight.source}:{flight.destination}:{flight.departure_ts.date()}:price"
-        search_key_fastest = f"search:{flight.source}:{flight.destination}:{flight.departure_ts.date()}:fastest"
-        pipe.zrem(search_key_price, str(flight.id))
-        pipe.zrem(search_key_fastest, str(flight.id))
-
-        # Delete the seat counter
-        pipe.delete(f"flight_seats:{flight.id}")
-
+        queue_flight_removal(pipe, flight)
         pipe.execute()
@@ -0,0 +1,79 @@
+import redis
+
+# Consumer group helpers shared by the payment queue and the seat write-behind.
+# Both must work on Redis 6.2 (the docker-compose image) as well as Redis 7.
+
+# Unread entries counted one page at a time where Redis does not report the lag
+UNREAD_PAGE_SIZE = 1000
+
+
+def ensure_consumer_group(redis_client: redis.Redis, stream, group):
+    try:
+        redis_client.xgroup_create(stream, group, id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def read_own_pending(redis_client: redis.Redis, stream, group, consumer_name, page_size=1000):
+    """Returns every entry delivered to this consumer but never acknowledged."""
+    pending = []
+    last_id = "0"
+    while True:
+        response = redis_client.xreadgroup(group, consumer_name, {stream: last_id}, count=page_size)
+        entries = response[0][1] if response else []
+        if not entries:
+            return pending
+        pending.extend(entries)
+        last_id = entries[-1][0]
+
+
+def claim_stale(redis_client: redis.Redis, stream, group, consumer_name, min_idle_ms, count):
+    """
+    Takes over up to `count` entries that any consumer, this one included,
+    read but left unacknowledged for `min_idle_ms`. Entries trimmed from the
+    stream meanwhile come back with empty fields.
+    """
+    # Redis 6.2 replies [next_id, entries]; Redis 7 adds the deleted IDs
+    response = redis_client.xautoclaim(stream, group, consumer_name, min_idle_ms, count=count)
+    return response[1]
+
+
+def group_info(redis_client: redis.Redis, stream, group):
+    """The XINFO GROUPS entry of `group`, or None if the stream or the group does not exist."""
+    if not redis_client.exists(stream):
+        return None
+    for info in redis_client.xinfo_groups(stream):
+        if info["name"] in (group, group.encode()):
+            return info
+    return None
+
+
+def _decode(message_id):
+    return message_id.decode("utf-8") if isinstance(message_id, bytes) else message_id
+
+
+def unread_count(redis_client: redis.Redis, stream, info):
+    """
+    Entries added after the group's last delivered one. Redis 7 reports this
+    as `lag`; on Redis 6.2, or when Redis 7 cannot tell after a trim, the
+    entries are counted.
+    """
+    if info.get("lag") is not None:
+        return info["lag"]
+    count = 0
+    last_id = _decode(info["last-delivered-id"])
+    while True:
+        entries = redis_client.xrange(stream, min=f"({last_id}", count=UNREAD_PAGE_SIZE)
+        count += len(entries)
+        if len(entries) < UNREAD_PAGE_SIZE:
+            return count
+        last_id = _decode(entries[-1][0])
+
+
+def oldest_unacknowledged_id(redis_client: redis.Redis, stream, group, info):
+    """ID of the oldest entry the group has not acknowledged, read or not, or None."""
+    if info["pending"]:
+        return redis_client.xpending(stream, group)["min"]
+    unread = redis_client.xrange(stream, min=f"({_decode(info['last-delivered-id'])}", count=1)
+    return unread[0][0] if unread else None
@@ -0,0 +1,66 @@
+import redis
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+RESPONSE_KEY_PREFIX = "search_response"
+FLIGHT_INDEX_KEY_PREFIX = "search_response_flights"
+
+
+def response_cache_key(source, destination, date):
+    """Key holding the serialized search response for a route and date."""
+    return f"{RESPONSE_KEY_PREFIX}:{source}-{destination}-{date.strftime('%Y-%m-%d')}"
+
+
+def flight_index_key(flight_id):
+    """Key of the set listing every cached response that contains a flight."""
+    return f"{FLIGHT_INDEX_KEY_PREFIX}:{flight_id}"
+
+
+async def get_cached_response(redis_client: aioredis.Redis, source, destination, date):
+    """Returns the cached JSON bytes of a search response, or None."""
+    return await redis_client.get(response_cache_key(source, destination, date))
+
+
+async def store_response(redis_client: aioredis.Redis, source, destination, date, payload: bytes, flight_ids):
+    """
+    Stores the serialized response and records, for every flight it contains,
+    that this response must be dropped when the flight changes.
+    """
+    cache_key = response_cache_key(source, destination, date)
+    ttl = settings.SEARCH_RESPONSE_CACHE_TTL
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.set(cache_key, payload, ex=ttl)
+        for flight_id in set(flight_ids):
+            index_key = flight_index_key(flight_id)
+            pipe.sadd(index_key, cache_key)
+            pipe.expire(index_key, ttl)
+        await pipe.execute()
+
+
+def invalidate_route(redis_client: redis.Redis, source, destination, date):
+    """Drops the cached response for a route and date."""
+    redis_client.delete(response_cache_key(source, destination, date))
+
+
+def invalidate_flight(redis_client: redis.Redis, flight_id):
+    """Drops every cached response that contains the given flight."""
+    index_key = flight_index_key(flight_id)
+    cache_keys = redis_client.smembers(index_key)
+    with redis_client.pipeline(transaction=False) as pipe:
+        if cache_keys:
+            pipe.delete(*cache_keys)
+        pipe.delete(index_key)
+        pipe.execute()
+
+
+def invalidate_all(redis_client: redis.Redis, batch_size=500):
+    """Drops every cached response, e.g. after a full precomputation run."""
+    batch = []
+    for key in redis_client.scan_iter(match=f"{RESPONSE_KEY_PREFIX}*", count=batch_size):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            redis_client.unlink(*batch)
+            batch = []
+    if batch:
+        redis_client.unlink(*batch)
@@ -0,0 +1,264 @@
+import asyncio
+import base64
+import binascii
+import json
+from datetime import timezone
+
+import redis.asyncio as aioredis
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import models
+from app.schemas import schemas
+from app.services.path_engine import summarize_paths
+
+
+async def fetch_flights_from_redis(redis_client: aioredis.Redis, flight_ids):
+    """
+    Reads the `flight:{id}` hashes written by `redis_service.update_flight_in_redis`
+    for all requested flights in a single pipeline.
+    Returns a dict of flight_id -> schemas.Flight for every complete hash found.
+    """
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for flight_id in flight_ids:
+            pipe.hgetall(f"flight:{flight_id}")
+        hashes = await pipe.execute()
+
+    flights = {}
+    for flight_id, flight_hash in zip(flight_ids, hashes):
+        if not flight_hash:
+            continue
+        flight_data = {key.decode('utf-8'): value.decode('utf-8') for key, value in flight_hash.items()}
+        try:
+            flights[flight_id] = schemas.Flight(**flight_data)
+        except ValidationError:
+            # Partial hash (e.g. only a seat counter was touched); fall back to the database.
+            continue
+    return flights
+
+
+async def fetch_flights_from_db(db: AsyncSession, flight_ids):
+    """Loads the requested flights with one bulk query."""
+    result = await db.execute(select(models.Flight).where(models.Flight.id.in_(flight_ids)))
+    return {str(flight.id): schemas.Flight.model_validate(flight) for flight in result.scalars()}
+
+
+async def hydrate_flights(flight_ids, db: AsyncSession, redis_client: aioredis.Redis):
+    """
+    Resolves a collection of flight IDs into schemas.Flight objects.
+    Redis is consulted first; anything it cannot serve is loaded from
+    Postgres in a single query.
+    """
+    flight_ids = list(dict.fromkeys(flight_ids))
+    if not flight_ids:
+        return {}
+
+    flights = await fetch_flights_from_redis(redis_client, flight_ids)
+    missing_ids = [flight_id for flight_id in flight_ids if flight_id not in flights]
+    if missing_ids:
+        flights.update(await fetch_flights_from_db(db, missing_ids))
+    return flights
+
+
+def build_flight_paths(flight_paths_ids, flights_by_id):
+    """
+    Assembles FlightPath responses from cached path IDs and hydrated flights,
+    preserving the cached path order. Paths referencing a flight that no
+    longer exists are skipped.
+    """
+    results = []
+    for path_ids in flight_paths_ids:
+        flights_in_path = [flights_by_id.get(flight_id) for flight_id in path_ids]
+        if any(flight is None for flight in flights_in_path):
+            continue
+        total_price = sum(flight.price for flight in flights_in_path)
+        results.append(schemas.FlightPath(flights=flights_in_path, total_price=total_price))
+    return results
+
+
+def to_epoch(moment):
+    """Seconds since the epoch of a datetime; naive datetimes are taken as UTC."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def encode_cursor(offset):
+    return base64.urlsafe_b64encode(json.dumps({"o": offset}).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Returns the offset encoded in a cursor. Raises ValueError for a malformed cursor."""
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))["o"]
+    except (binascii.Error, UnicodeError, KeyError, TypeError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError("Invalid cursor")
+    return offset
+
+
+def summarize_hydrated_paths(flight_paths_ids, flights_by_id):
+    """
+    Builds the path summary from hydrated flights, for paths stored without
+    one. Paths referencing a missing flight are dropped; returns the
+    remaining paths and their summary.
+    """
+    leg_times = {
+        flight_id: (flight.departure_ts.timestamp(), (flight.arrival_ts or flight.departure_ts).timestamp())
+        for flight_id, flight in flights_by_id.items()
+    }
+    paths = [
+        (sum(float(flights_by_id[flight_id].price) for flight_id in path_ids), path_ids)
+        for path_ids in flight_paths_ids
+        if all(flight_id in flights_by_id for flight_id in path_ids)
+    ]
+    return [path_ids for _, path_ids in paths], summarize_paths(paths, leg_times)
+
+
+def select_paths(summary, sort="price", max_stops=None, min_price=None, max_price=None,
+                 departure_after=None, departure_before=None):
+    """
+    Returns the indexes of the paths matching the filters, in `sort` order,
+    using only the path summary.
+    """
+    order = range(len(summary["price"])) if sort == "price" else summary["order"][sort]
+    departure_after = to_epoch(departure_after) if departure_after else None
+    departure_before = to_epoch(departure_before) if departure_before else None
+    return [
+        i for i in order
+        if (max_stops is None or summary["stops"][i] <= max_stops)
+        and (min_price is None or summary["price"][i] >= min_price)
+        and (max_price is None or summary["price"][i] <= max_price)
+        and (departure_after is None or summary["departure"][i] >= departure_after)
+        and (departure_before is None or summary["departure"][i] <= departure_before)
+    ]
+
+
+async def search_direct_flights(db: AsyncSession, redis_client: aioredis.Redis, source, destination, date,
+                                sort="price", min_price=None, max_price=None,
+                                departure_after=None, departure_before=None, passengers=1, offset=0, limit=None):
+    """
+    Serves non-stop flights from the `search:{src}:{dst}:{date}:price` and
+    `:fastest` (departure time) sorted sets maintained by redis_service,
+    so every direct flight is available, not only the precomputed top paths.
+    The set matching the sort order is read with ZRANGEBYSCORE over the
+    filter on its score. Flights that cannot seat `passengers` are dropped
+    before paginating. When no other filter applies, pagination is pushed
+    into Redis with LIMIT, and the offset is a position in the sorted set.
+    Returns (list of FlightPath with live seat counts, next offset or None).
+    """
+    by_departure = sort == "departure"
+    key = f"search:{source}:{destination}:{date}:{'fastest' if by_departure else 'price'}"
+    if by_departure:
+        low = to_epoch(departure_after) if departure_after else "-inf"
+        high = to_epoch(departure_before) if departure_before else "+inf"
+        post_filter = min_price is not None or max_price is not None
+    else:
+        low = min_price if min_price is not None else "-inf"
+        high = max_price if max_price is not None else "+inf"
+        post_filter = departure_after is not None or departure_before is not None
+    post_filter = post_filter or sort == "duration"
+
+    next_offset = None
+    if limit is not None and not post_filter:
+        # Read windows of the set until a full page (plus one, to know there is more) has seats
+        kept = []
+        position = offset
+        while len(kept) <= limit:
+            window = await redis_client.zrangebyscore(key, low, high, start=position, num=limit + 1)
+            window = [flight_id.decode("utf-8") for flight_id in window]
+            seats = await fetch_seat_counts(db, redis_client, window)
+            kept.extend(
+                (position + i, flight_id, seats) for i, flight_id in enumerate(window)
+                if has_seats([flight_id], seats, passengers)
+            )
+            position += len(window)
+            if len(window) <= limit:
+                break
+        if len(kept) > limit:
+            next_offset = kept[limit][0]
+            kept = kept[:limit]
+        seats = {flight_id: window_seats[flight_id] for _, flight_id, window_seats in kept}
+        flight_ids = [flight_id for _, flight_id, _ in kept]
+        flights_by_id = await hydrate_flights(flight_ids, db, redis_client)
+        flights = [flights_by_id[flight_id] for flight_id in flight_ids if flight_id in flights_by_id]
+    else:
+        flight_ids = [flight_id.decode("utf-8") for flight_id in await redis_client.zrangebyscore(key, low, high)]
+        flights_by_id, seats = await asyncio.gather(
+            hydrate_flights(flight_ids, db, redis_client),
+            fetch_seat_counts(db, redis_client, flight_ids),
+        )
+        after = to_epoch(departure_after) if departure_after else None
+        before = to_epoch(departure_before) if departure_before else None
+        flights = [
+            flights_by_id[flight_id] for flight_id in flight_ids
+            if flight_id in flights_by_id and has_seats([flight_id], seats, passengers)
+        ]
+        flights = [
+            flight for flight in flights
+            if (min_price is None or flight.price >= min_price)
+            and (max_price is None or flight.price <= max_price)
+            and (after is None or flight.departure_ts.timestamp() >= after)
+            and (before is None or flight.departure_ts.timestamp() <= before)
+        ]
+        if sort == "duration":
+            flights.sort(key=lambda flight: ((flight.arrival_ts or flight.departure_ts) - flight.departure_ts, flight.price))
+        if limit is not None:
+            if len(flights) > offset + limit:
+                next_offset = offset + limit
+            flights = flights[offset:offset + limit]
+
+    paths = [schemas.FlightPath(flights=[flight], total_price=flight.price) for flight in flights]
+    return overlay_live_seats(paths, seats, passengers), next_offset
+
+
+async def fetch_seat_counts(db: AsyncSession, redis_client: aioredis.Redis, flight_ids):
+    """
+    Seats left on each flight: the live `flight_seats:{id}` counters, read
+    with one MGET, and the stored count for flights without a counter, read
+    with one query. Flights that no longer exist are left out.
+    """
+    flight_ids = list(dict.fromkeys(str(flight_id) for flight_id in flight_ids))
+    if not flight_ids:
+        return {}
+    counts = await redis_client.mget([f"flight_seats:{flight_id}" for flight_id in flight_ids])
+    seats = {flight_id: int(count) for flight_id, count in zip(flight_ids, counts) if count is not None}
+    missing_ids = [flight_id for flight_id in flight_ids if flight_id not in seats]
+    if missing_ids:
+        result = await db.execute(
+            select(models.Flight.id, models.Flight.available_seats).where(models.Flight.id.in_(missing_ids))
+        )
+        seats.update((str(flight_id), available_seats) for flight_id, available_seats in result.all())
+    return seats
+
+
+def has_seats(flight_ids, seats, passengers):
+    """True if every flight has at least `passengers` seats left; unknown flights have none."""
+    return all(seats.get(str(flight_id), 0) >= passengers for flight_id in flight_ids)
+
+
+def overlay_live_seats(flight_paths, seats, passengers):
+    """
+    Sets each flight's available_seats from `seats` (see fetch_seat_counts)
+    and drops paths with a leg that cannot seat `passengers`.
+    """
+    results = []
+    for path in flight_paths:
+        for flight in path.flights:
+            flight.available_seats = seats.get(str(flight.id), 0)
+        if has_seats([flight.id for flight in path.flights], seats, passengers):
+            results.append(path)
+    return results
+
+
+def overlay_live_seats_json(flight_paths, seats, passengers):
+    """overlay_live_seats for paths decoded from a cached JSON response."""
+    results = []
+    for path in flight_paths:
+        for flight in path["flights"]:
+            flight["available_seats"] = seats.get(flight["id"], 0)
+        if has_seats([flight["id"] for flight in path["flights"]], seats, passengers):
+            results.append(path)
+    return results
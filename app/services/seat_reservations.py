@@ -0,0 +1,164 @@
+import time
+
+import redis
+
+from app.core.redis_client import run_script
+from app.services.seat_sync import SEAT_CHANGES_STREAM, STREAM_MAX_LENGTH
+
+EXPIRING_RESERVATIONS_KEY = "reservations:expiring"
+
+# How long a confirmation is remembered, so a payment job redelivered after a
+# crash between confirming and committing the booking still sees it succeed
+CONFIRMED_MARKER_TTL_SECONDS = 86400
+
+# Returns the seats left after reserving, -1 if the flight is not cached,
+# or -2 if there are not enough seats. The reservation is recorded in a hash
+# and in a sorted set scored by its expiry time, and the seat change is
+# appended to the write-behind stream.
+RESERVE_SCRIPT = """
+local available = redis.call('GET', KEYS[1])
+if not available then
+    return -1
+end
+local seats = tonumber(ARGV[1])
+if tonumber(available) < seats then
+    return -2
+end
+redis.call('DECRBY', KEYS[1], seats)
+if redis.call('HEXISTS', KEYS[2], 'available_seats') == 1 then
+    redis.call('HINCRBY', KEYS[2], 'available_seats', -seats)
+end
+redis.call('HSET', KEYS[3], 'flight_id', ARGV[3], 'seats', seats)
+redis.call('ZADD', KEYS[4], ARGV[2], ARGV[4])
+redis.call('XADD', KEYS[5], 'MAXLEN', '~', ARGV[5], '*', 'flight_id', ARGV[3])
+return tonumber(available) - seats
+"""
+
+# Membership in the expiring set is what owns the seats: whichever of
+# confirm/release removes the reservation from it first wins. A confirmation
+# leaves a marker behind so that confirming again reports success.
+CONFIRM_SCRIPT = """
+if redis.call('ZREM', KEYS[2], ARGV[1]) == 0 then
+    return redis.call('EXISTS', KEYS[3])
+end
+redis.call('DEL', KEYS[1])
+redis.call('SET', KEYS[3], 1, 'EX', ARGV[2])
+return 1
+"""
+
+# The caller names the reservation's flight, so every key the script
+# touches is passed in KEYS; a mismatch is refused before anything changes.
+RELEASE_SCRIPT = """
+local flight_id = redis.call('HGET', KEYS[1], 'flight_id')
+if flight_id and flight_id ~= ARGV[3] then
+    return redis.error_reply('reservation ' .. ARGV[1] .. ' belongs to flight ' .. flight_id)
+end
+if redis.call('ZREM', KEYS[2], ARGV[1]) == 0 then
+    return 0
+end
+local seats = tonumber(redis.call('HGET', KEYS[1], 'seats'))
+redis.call('DEL', KEYS[1])
+redis.call('INCRBY', KEYS[4], seats)
+if redis.call('HEXISTS', KEYS[5], 'available_seats') == 1 then
+    redis.call('HINCRBY', KEYS[5], 'available_seats', seats)
+end
+redis.call('XADD', KEYS[3], 'MAXLEN', '~', ARGV[2], '*', 'flight_id', ARGV[3])
+return 1
+"""
+
+# Applies a change of a flight's total seats to its live counter, keeping
+# the seats already sold: the counter moves by the same amount, never below
+# zero. Returns the new count, or -1 if the flight has no counter.
+ADJUST_CAPACITY_SCRIPT = """
+local available = redis.call('GET', KEYS[1])
+if not available then
+    return -1
+end
+local seats = math.max(0, tonumber(available) + tonumber(ARGV[1]))
+redis.call('SET', KEYS[1], seats)
+redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*', 'flight_id', ARGV[2])
+return seats
+"""
+
+FLIGHT_NOT_CACHED = -1
+NOT_ENOUGH_SEATS = -2
+
+
+def reservation_key(reservation_id):
+    return f"reservation:{reservation_id}"
+
+
+def confirmed_marker_key(reservation_id):
+    return f"reservation_confirmed:{reservation_id}"
+
+
+def reserve_seats(redis_client: redis.Redis, flight_id, seats: int, reservation_id, ttl_seconds: int):
+    """
+    Atomically checks and decrements `flight_seats:{flight_id}` and records a
+    reservation that is released automatically if it is neither confirmed
+    nor released within `ttl_seconds`.
+    Returns the remaining seats, FLIGHT_NOT_CACHED or NOT_ENOUGH_SEATS.
+    """
+    expires_at = time.time() + ttl_seconds
+    return run_script(
+        redis_client, RESERVE_SCRIPT,
+        keys=[
+            f"flight_seats:{flight_id}", f"flight:{flight_id}", reservation_key(reservation_id),
+            EXPIRING_RESERVATIONS_KEY, SEAT_CHANGES_STREAM,
+        ],
+        args=[seats, expires_at, str(flight_id), str(reservation_id), STREAM_MAX_LENGTH],
+    )
+
+
+def confirm_reservation(redis_client: redis.Redis, reservation_id):
+    """
+    Makes a reservation permanent. Returns False if it had already been
+    released; confirming an already confirmed reservation returns True.
+    """
+    return bool(run_script(
+        redis_client, CONFIRM_SCRIPT,
+        keys=[reservation_key(reservation_id), EXPIRING_RESERVATIONS_KEY, confirmed_marker_key(reservation_id)],
+        args=[str(reservation_id), CONFIRMED_MARKER_TTL_SECONDS],
+    ))
+
+
+def release_reservation(redis_client: redis.Redis, reservation_id, flight_id):
+    """Returns a reservation's seats to `flight_id`. Returns False if it was already confirmed or released."""
+    return bool(run_script(
+        redis_client, RELEASE_SCRIPT,
+        keys=[
+            reservation_key(reservation_id), EXPIRING_RESERVATIONS_KEY, SEAT_CHANGES_STREAM,
+            f"flight_seats:{flight_id}", f"flight:{flight_id}",
+        ],
+        args=[str(reservation_id), STREAM_MAX_LENGTH, str(flight_id)],
+    ))
+
+
+def release_expired_reservations(redis_client: redis.Redis, batch_size=100):
+    """Releases every reservation past its expiry. Returns the released reservation IDs."""
+    expired = redis_client.zrangebyscore(EXPIRING_RESERVATIONS_KEY, "-inf", time.time(), start=0, num=batch_size)
+    if not expired:
+        return []
+    with redis_client.pipeline(transaction=False) as pipe:
+        for reservation_id in expired:
+            pipe.hget(reservation_key(reservation_id.decode('utf-8')), "flight_id")
+        flight_ids = pipe.execute()
+
+    released = []
+    for reservation_id, flight_id in zip(expired, flight_ids):
+        reservation_id = reservation_id.decode('utf-8')
+        # Confirmed or released since it was listed
+        if flight_id is None:
+            continue
+        if release_reservation(redis_client, reservation_id, flight_id.decode('utf-8')):
+            released.append(reservation_id)
+    return released
+
+
+def queue_capacity_change(pipe, flight_id, delta: int):
+    """Queues ADJUST_CAPACITY_SCRIPT for a flight whose total seats changed by `delta`."""
+    run_script(
+        pipe, ADJUST_CAPACITY_SCRIPT,
+        keys=[f"flight_seats:{flight_id}", SEAT_CHANGES_STREAM],
+        args=[delta, str(flight_id), STREAM_MAX_LENGTH],
+    )
@@ -0,0 +1,190 @@
+import time
+import uuid
+
+import redis
+from sqlalchemy import BigInteger, Integer, column, select, update, values
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.models import models
+from app.services import redis_streams
+
+# Every change of a `flight_seats:{id}` counter appends the flight ID here,
+# in the same atomic step as the change itself.
+SEAT_CHANGES_STREAM = "seat_changes"
+SEAT_FLUSH_GROUP = "seat_flushers"
+SEAT_FLUSH_STATS_KEY = "seat_sync:stats"
+
+# Large enough to cover a long worker outage; a trimmed entry only costs
+# durability for that flight until its next seat change.
+STREAM_MAX_LENGTH = 1000000
+
+# Flights whose version moved between reading and writing are retried this often per batch
+MAX_CONFLICT_RETRIES = 3
+
+
+def queue_seat_change(pipe, flight_id):
+    """Queues the stream entry for a seat counter change on an existing pipeline."""
+    pipe.xadd(SEAT_CHANGES_STREAM, {"flight_id": str(flight_id)}, maxlen=STREAM_MAX_LENGTH, approximate=True)
+
+
+def entry_age_seconds(message_id):
+    """Seconds since a stream entry was added, from the millisecond timestamp in its ID."""
+    if isinstance(message_id, bytes):
+        message_id = message_id.decode("utf-8")
+    return max(0.0, time.time() - int(message_id.split("-")[0]) / 1000)
+
+
+def write_seat_counts(db, redis_client: redis.Redis, flight_ids):
+    """
+    Copies the Redis seat counters of `flight_ids` to Postgres with one bulk
+    UPDATE per attempt. Each row is only written if its `version` is still
+    the one read before the counters, so a concurrent change to the flight
+    (an admin edit or an upload) is never overwritten with a stale count;
+    such rows are re-read and retried.
+    Returns the number of flights written and the IDs still conflicting.
+    """
+    pending = list(flight_ids)
+    written = 0
+    for _ in range(MAX_CONFLICT_RETRIES):
+        if not pending:
+            break
+        versions = dict(db.execute(
+            select(models.Flight.id, models.Flight.version).where(models.Flight.id.in_(pending))
+        ).all())
+        # Flights deleted from the database have nothing to flush
+        pending = [flight_id for flight_id in pending if flight_id in versions]
+        if not pending:
+            break
+
+        counts = redis_client.mget([f"flight_seats:{flight_id}" for flight_id in pending])
+        rows = [
+            (flight_id, int(count), versions[flight_id])
+            for flight_id, count in zip(pending, counts)
+            if count is not None
+        ]
+        if not rows:
+            break
+
+        batch = values(
+            column("id", UUID(as_uuid=True)), column("seats", Integer), column("version", BigInteger),
+            name="seat_counts",
+        ).data(rows)
+        updated = db.execute(
+            update(models.Flight)
+            .where(models.Flight.id == batch.c.id, models.Flight.version == batch.c.version)
+            .values(available_seats=batch.c.seats, version=models.Flight.version + 1)
+            .returning(models.Flight.id)
+        ).scalars().all()
+        db.commit()
+
+        written += len(updated)
+        updated = set(updated)
+        pending = [flight_id for flight_id, _, _ in rows if flight_id not in updated]
+    return written, pending
+
+
+def flush_batch(redis_client: redis.Redis, session_factory, messages):
+    """Writes the flights named by a batch of stream entries, then acknowledges the entries."""
+    flight_ids = {
+        uuid.UUID(fields[b"flight_id"].decode("utf-8"))
+        for _, fields in messages
+        if fields
+    }
+    db = session_factory()
+    try:
+        written, conflicting = write_seat_counts(db, redis_client, flight_ids)
+    finally:
+        db.close()
+
+    message_ids = [message_id for message_id, _ in messages]
+    lag = entry_age_seconds(message_ids[0])
+    with redis_client.pipeline(transaction=False) as pipe:
+        for flight_id in conflicting:
+            # Still being changed by someone else; try again in a later batch
+            queue_seat_change(pipe, flight_id)
+        pipe.xack(SEAT_CHANGES_STREAM, SEAT_FLUSH_GROUP, *message_ids)
+        pipe.hincrby(SEAT_FLUSH_STATS_KEY, "batches", 1)
+        pipe.hincrby(SEAT_FLUSH_STATS_KEY, "events", len(messages))
+        pipe.hincrby(SEAT_FLUSH_STATS_KEY, "flights_written", written)
+        pipe.hincrby(SEAT_FLUSH_STATS_KEY, "version_conflicts", len(conflicting))
+        pipe.hset(SEAT_FLUSH_STATS_KEY, mapping={
+            "last_flush_at": time.time(),
+            "last_batch_lag_seconds": round(lag, 3),
+        })
+        pipe.execute()
+    return written, len(conflicting)
+
+
+def run_seat_flusher(redis_client: redis.Redis, session_factory, consumer_name: str,
+                     flush_interval: float, batch_size: int, claim_idle_ms: int):
+    """
+    Consumes the seat change stream, flushing whenever `batch_size` entries
+    have accumulated or the oldest one is `flush_interval` seconds old.
+    Entries are acknowledged only after their counts are committed, and
+    entries left unacknowledged by a dead consumer are claimed after
+    `claim_idle_ms`.
+    """
+    redis_streams.ensure_consumer_group(redis_client, SEAT_CHANGES_STREAM, SEAT_FLUSH_GROUP)
+
+    # Start with our own entries left unacknowledged by a previous run of this consumer
+    backlog = redis_streams.read_own_pending(redis_client, SEAT_CHANGES_STREAM, SEAT_FLUSH_GROUP, consumer_name)
+    last_claim = 0.0
+    batch = []
+    batch_started = None
+    while True:
+        try:
+            if backlog:
+                batch.extend(backlog)
+                backlog = []
+            elif len(batch) < batch_size and time.monotonic() - last_claim > claim_idle_ms / 1000:
+                last_claim = time.monotonic()
+                batch.extend(redis_streams.claim_stale(
+                    redis_client, SEAT_CHANGES_STREAM, SEAT_FLUSH_GROUP, consumer_name,
+                    claim_idle_ms, batch_size - len(batch),
+                ))
+
+            if batch and batch_started is None:
+                batch_started = time.monotonic()
+            remaining = flush_interval if batch_started is None else flush_interval - (time.monotonic() - batch_started)
+            if len(batch) < batch_size and remaining > 0:
+                # Blocking reads stay well below the socket timeout
+                response = redis_client.xreadgroup(
+                    SEAT_FLUSH_GROUP, consumer_name, {SEAT_CHANGES_STREAM: ">"},
+                    count=batch_size - len(batch), block=max(1, int(min(remaining, 1.0) * 1000)),
+                )
+                if response:
+                    batch.extend(response[0][1])
+                    if batch_started is None:
+                        batch_started = time.monotonic()
+                continue
+
+            if batch:
+                written, conflicts = flush_batch(redis_client, session_factory, batch)
+                print(f"Flushed seat counts of {written} flight(s) from {len(batch)} change(s); {conflicts} conflicting.")
+            batch = []
+            batch_started = None
+        except Exception as e:
+            # The batch is kept and flushed again; writing the current counters twice is harmless
+            print(f"Error during seat count flush: {e}")
+            time.sleep(1)
+
+
+def lag_snapshot(redis_client: redis.Redis):
+    """
+    Write-behind lag as seen from Redis: entries not yet read, entries read
+    but not yet committed, the age of the oldest of either, plus the
+    flusher's own counters.
+    """
+    group = redis_streams.group_info(redis_client, SEAT_CHANGES_STREAM, SEAT_FLUSH_GROUP)
+
+    snapshot = {"unread": 0, "pending": 0, "oldest_unflushed_age_seconds": 0.0}
+    if group is not None:
+        snapshot["pending"] = group["pending"]
+        snapshot["unread"] = redis_streams.unread_count(redis_client, SEAT_CHANGES_STREAM, group)
+        oldest = redis_streams.oldest_unacknowledged_id(redis_client, SEAT_CHANGES_STREAM, SEAT_FLUSH_GROUP, group)
+        if oldest is not None:
+            snapshot["oldest_unflushed_age_seconds"] = round(entry_age_seconds(oldest), 3)
+
+    stats = redis_client.hgetall(SEAT_FLUSH_STATS_KEY)
+    snapshot["flusher"] = {key.decode("utf-8"): float(value) for key, value in stats.items()}
+    return snapshot
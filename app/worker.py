@@ -1,110 +1,163 @@
 import time
 import redis
-from sqlalchemy.orm import sessionmaker
-from app.core.database import engine
+from app.core.config import settings
+from app.core import metrics
+from app.core.database import SessionLocal
 from app.models import models
 from app.core.redis_client import get_redis
+from app.services import response_cache, seat_reservations, payment_queue, seat_sync, metrics_collectors, path_store
+from app.services.path_updater import IncrementalPrecomputer
 import threading
-import subprocess
+from prometheus_client import start_http_server
 import json
+from datetime import datetime
 
-# Set up the database session
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# In-memory set to store flight IDs that need updating
-FLIGHTS_TO_UPDATE = set()
-FLUSH_INTERVAL = 43200  # 12 hours in seconds
-
-def run_precomputation(source, destination, date):
-    """Runs the precomputation script for a specific route and date."""
-    try:
-        command = [
-            "python3", "app/scripts/precompute_flights.py",
-            "--source", source,
-            "--destination", destination,
-            "--date", date
-        ]
-        subprocess.run(command, check=True)
-        print(f"Successfully precomputed flights for {source}-{destination} on {date}")
-    except subprocess.CalledProcessError as e:
-        print(f"Error during precomputation for {source}-{destination} on {date}: {e}")
+# Keeps the precomputed paths current as flights change
+precomputer = IncrementalPrecomputer(
+    SessionLocal,
+    get_redis(),
+    top_k=settings.PRECOMPUTE_TOP_K,
+    max_legs=settings.PRECOMPUTE_MAX_LEGS,
+    min_connection=settings.PRECOMPUTE_MIN_CONNECTION_MINUTES * 60,
+    debounce=settings.PRECOMPUTE_DEBOUNCE_SECONDS,
+    max_delay=settings.PRECOMPUTE_MAX_DELAY_SECONDS,
+    workers=settings.PRECOMPUTE_WORKERS,
+    result_ttl=settings.PRECOMPUTE_RESULT_TTL or None,
+)
+
+def listen(pubsub, poll_timeout=1.0):
+    """
+    Yields pub/sub messages. Polls with a short timeout instead of a blocking
+    read so idle subscriptions don't trip the pool's socket timeout.
+    """
+    while True:
+        message = pubsub.get_message(timeout=poll_timeout)
+        if message is not None:
+            yield message
 
 def flight_update_subscriber():
     """
-    Subscribes to the 'flight_updates' Redis channel and triggers
-    precomputation for affected flight paths.
+    Subscribes to the 'flight_updates' Redis channel and queues the changed
+    flights for incremental precomputation.
     """
     pubsub = get_redis().pubsub()
     pubsub.subscribe("flight_updates")
     
     print("Listening for flight updates...")
     
-    for message in pubsub.listen():
+    for message in listen(pubsub):
         if message['type'] == 'message':
             data = json.loads(message['data'])
+            if data.get('type') == 'paths_activated':
+                # A full precomputation finished; routes changed during it must be redone in its version
+                precomputer.notify_build_activated()
+                continue
             source = data['source']
             destination = data['destination']
-            date = data['date']
-            
-            print(f"Received flight update for {source}-{destination} on {date}. Triggering precomputation.")
-            # In a production system, you'd likely use a proper task queue like Celery
-            threading.Thread(target=run_precomputation, args=(source, destination, date)).start()
+            date = datetime.strptime(data['date'], '%Y-%m-%d').date()
+
+            # Cached search responses for the route, and any response containing the flight, are now stale
+            redis_client = get_redis()
+            response_cache.invalidate_route(redis_client, source, destination, date)
+            # Single-flight events carry flight_id; bulk uploads send one event per route with flight_ids
+            flight_ids = data.get('flight_ids') or ([data['flight_id']] if data.get('flight_id') else [])
+            for flight_id in flight_ids:
+                response_cache.invalidate_flight(redis_client, flight_id)
+
+            # Updates for the same date are coalesced and recomputed together
+            precomputer.notify(date, flight_ids)
 
 def flush_updates_to_db():
     """
-    This function runs in a separate thread and periodically flushes the
-    accumulated flight ID updates to the database.
+    Writes changed seat counters back to the flights table, driven by the
+    durable `seat_changes` stream.
     """
-    db = SessionLocal()
-    while True:
-        time.sleep(FLUSH_INTERVAL)
-        
-        if not FLIGHTS_TO_UPDATE:
-            continue
-
-        try:
-            # Create a copy of the set to avoid issues with concurrent modification
-            flight_ids_to_process = FLIGHTS_TO_UPDATE.copy()
-            FLIGHTS_TO_UPDATE.clear()
-
-            for flight_id in flight_ids_to_process:
-                seat_key = f"flight_seats:{flight_id}"
-                available_seats = get_redis().get(seat_key)
-                
-                if available_seats is not None:
-                    db.query(models.Flight).filter(models.Flight.id == flight_id).update(
-                        {"available_seats": int(available_seats)},
-                        synchronize_session=False
-                    )
-            
-            db.commit()
-            print(f"Successfully flushed {len(flight_ids_to_process)} flight(s) to the database.")
-
-        except Exception as e:
-            print(f"Error during database flush: {e}")
-            db.rollback()
+    seat_sync.run_seat_flusher(
+        get_redis(),
+        SessionLocal,
+        settings.SEAT_FLUSH_CONSUMER_NAME,
+        settings.SEAT_FLUSH_INTERVAL,
+        settings.SEAT_FLUSH_BATCH_SIZE,
+        settings.SEAT_FLUSH_CLAIM_IDLE_MS,
+    )
 
 def seat_update_subscriber():
     """
-    This function subscribes to the 'seat_updates' Redis channel and adds
-    flight IDs to the in-memory set.
+    Subscribes to the 'seat_updates' Redis channel and drops cached search
+    responses containing the booked flight.
     """
     pubsub = get_redis().pubsub()
     pubsub.subscribe("seat_updates")
     
     print("Listening for seat updates...")
     
-    for message in pubsub.listen():
+    for message in listen(pubsub):
         if message['type'] == 'message':
             flight_id = message['data'].decode('utf-8')
-            FLIGHTS_TO_UPDATE.add(flight_id)
-            print(f"Received update for flight: {flight_id}. Total pending updates: {len(FLIGHTS_TO_UPDATE)}")
+            response_cache.invalidate_flight(get_redis(), flight_id)
+
+def reservation_sweeper():
+    """
+    Periodically returns the seats of reservations that were neither
+    confirmed nor released in time (e.g. the API process died mid-payment)
+    and fails their bookings.
+    """
+    redis_client = get_redis()
+    while True:
+        time.sleep(settings.RESERVATION_SWEEP_INTERVAL)
+        try:
+            released = seat_reservations.release_expired_reservations(redis_client)
+            if not released:
+                continue
+
+            db = SessionLocal()
+            try:
+                db.query(models.Booking).filter(
+                    models.Booking.id.in_(released),
+                    models.Booking.status == "PENDING"
+                ).update({"status": "FAILED"}, synchronize_session=False)
+                db.commit()
+            finally:
+                db.close()
+            metrics.booking_outcomes.labels("expired").inc(len(released))
+            print(f"Released {len(released)} expired seat reservation(s).")
+        except Exception as e:
+            print(f"Error while releasing expired reservations: {e}")
+
+def payment_consumer():
+    """Processes queued booking payments."""
+    payment_queue.run_payment_consumer(
+        get_redis(),
+        SessionLocal,
+        settings.PAYMENT_CONSUMER_NAME,
+        settings.PAYMENT_WORKER_CONCURRENCY,
+        settings.PAYMENT_JOB_CLAIM_IDLE_MS,
+    )
 
 if __name__ == "__main__":
+    path_store.require_single_instance(get_redis())
+
+    # Serve this process's metrics for Prometheus to scrape
+    if settings.METRICS_ENABLED:
+        metrics_collectors.register_worker_collectors()
+        start_http_server(settings.WORKER_METRICS_PORT)
+
+    # Start the payment consumer
+    payment_thread = threading.Thread(target=payment_consumer, daemon=True)
+    payment_thread.start()
+
+    # Start the expired reservation sweeper
+    sweeper_thread = threading.Thread(target=reservation_sweeper, daemon=True)
+    sweeper_thread.start()
+
     # Start the database flush thread
     flush_thread = threading.Thread(target=flush_updates_to_db, daemon=True)
     flush_thread.start()
     
+    # Start the incremental precomputation thread
+    precompute_thread = threading.Thread(target=precomputer.run, daemon=True)
+    precompute_thread.start()
+
     # Start the flight update subscriber thread
     flight_update_thread = threading.Thread(target=flight_update_subscriber, daemon=True)
     flight_update_thread.start()
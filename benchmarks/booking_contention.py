@@ -0,0 +1,90 @@
+"""
+Load test for concurrent bookings on a single hot flight.
+
+For each client count, that many clients book one seat at a time, back to
+back, for a fixed duration. The script reports completed bookings/sec per
+level, so you can check that throughput grows with the number of clients
+instead of being serialized by a per-flight lock.
+
+Usage:
+    python -m benchmarks.booking_contention --base-url http://localhost:8000 \
+        --flight-id <uuid> --username loadtest --password secret \
+        --clients 1 2 4 8 16 32 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+
+import httpx
+
+
+async def get_token(client, username, password):
+    # Registration fails harmlessly if the user already exists
+    await client.post("/api/v1/auth/register", json={"username": username, "password": password})
+    response = await client.post("/api/v1/auth/token", data={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def book_until(client, headers, flight_id, deadline, outcomes, latencies):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.post("/api/v1/booking", json={"flight_id": flight_id, "seats": 1}, headers=headers)
+        except httpx.HTTPError:
+            outcomes["error"] += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+        if response.status_code == 200:
+            outcomes[response.json()["status"]] += 1
+        else:
+            outcomes[f"http_{response.status_code}"] += 1
+
+
+async def run_level(base_url, token, flight_id, clients, duration):
+    headers = {"Authorization": f"Bearer {token}"}
+    outcomes, latencies = Counter(), []
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(book_until(client, headers, flight_id, deadline, outcomes, latencies)
+                               for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    completed = outcomes["CONFIRMED"] + outcomes["FAILED"] + outcomes["PENDING"]
+    latencies.sort()
+    return {
+        "clients": clients,
+        "duration_s": round(elapsed, 3),
+        "bookings_per_s": round(completed / elapsed, 2),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+        "outcomes": dict(outcomes),
+    }
+
+
+async def main(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30) as client:
+        token = await get_token(client, args.username, args.password)
+
+    results = []
+    for clients in args.clients:
+        result = await run_level(args.base_url, token, args.flight_id, clients, args.duration)
+        print(json.dumps(result), flush=True)
+        results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent booking load test on one flight.")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--flight-id", required=True)
+    parser.add_argument("--username", default="loadtest")
+    parser.add_argument("--password", default="loadtest")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--duration", type=float, default=20)
+    args = parser.parse_args()
+
+    asyncio.run(main(args))
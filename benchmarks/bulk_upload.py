@@ -0,0 +1,71 @@
+"""
+Measures bulk-upload throughput: rows/sec from POST /admin/flights/bulk-upload
+until the background job reports COMPLETED.
+
+Needs an admin account (see app/scripts/make_admin.py).
+
+Usage:
+    python -m benchmarks.bulk_upload --base-url http://localhost:8000 \
+        --username adminuser --password secret --file /tmp/upload.csv
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+
+async def get_admin_token(client, username, password):
+    response = await client.post("/api/v1/auth/token", data={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run_upload(base_url, token, path, poll_interval=0.2, timeout=3600):
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=60) as client:
+        started = time.perf_counter()
+        with open(path, "rb") as f:
+            response = await client.post(
+                "/admin/flights/bulk-upload", files={"file": ("flights.csv", f, "text/csv")}
+            )
+        response.raise_for_status()
+        job_id = response.json()["job_id"]
+        accepted = time.perf_counter() - started
+
+        status = {}
+        while time.perf_counter() - started < timeout:
+            response = await client.get(f"/admin/flights/bulk-upload/status/{job_id}")
+            if response.status_code == 200:
+                status = response.json()
+                if status["status"] in ("COMPLETED", "FAILED"):
+                    break
+            await asyncio.sleep(poll_interval)
+        elapsed = time.perf_counter() - started
+
+    return {
+        "job_status": status.get("status"),
+        "rows": status.get("processed", 0),
+        "failed": status.get("failed", 0),
+        "accept_ms": round(accepted * 1000, 1),
+        "duration_s": round(elapsed, 3),
+        "rows_per_s": round(status.get("processed", 0) / elapsed, 1),
+    }
+
+
+async def main(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30) as client:
+        token = await get_admin_token(client, args.username, args.password)
+    return await run_upload(args.base_url, token, args.file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk flight upload throughput.")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--username", default="adminuser")
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--file", required=True, help="CSV in the shape of flights.csv")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(main(args)), indent=2))
@@ -0,0 +1,155 @@
+"""
+Compares the memory and load time of the precompute's flight data before and
+after the columnar FlightStore (app/services/flight_store.py).
+
+Both representations are built from the same synthetic network, loaded into
+an in-memory SQLite database so the ORM path pays for a real session and
+identity map:
+
+- `orm`: every flight as an ORM object plus the per-date leg tuples, as the
+  precompute held them before, and tasks carrying those legs.
+- `store`: the same rows appended to a FlightStore, and tasks carrying only
+  a date and its sources.
+
+Memory is what the Python heap retains once loading is done (tracemalloc),
+and `task_mb` is what the pool would pickle to send every task. Load time
+includes that pickling and comes from a separate, untraced run. No Postgres or
+Redis is needed; for the end-to-end run, use `benchmarks.precompute`.
+
+Usage:
+    PYTHONPATH=. python -m benchmarks.flight_store --airports 40 --days 7 --flights-per-day 2000
+"""
+import argparse
+import gc
+import json
+import pickle
+import random
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models.models import Flight
+from app.services.flight_store import FlightStore
+from app.services.path_engine import departure_date, flight_to_leg
+from benchmarks.synthetic import flight_rows
+
+
+def parse_timestamp(value):
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")
+
+
+def create_database(airports, days, flights_per_day, seed, batch_size=10000):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[Flight.__table__])
+    rng = random.Random(seed)
+    rows = [
+        {
+            **row,
+            "id": uuid.UUID(int=rng.getrandbits(128), version=4),
+            "departure_ts": parse_timestamp(row["departure_ts"]),
+            "arrival_ts": parse_timestamp(row["arrival_ts"]),
+            "available_seats": row["total_seats"],
+        }
+        for row in flight_rows(airports, days, flights_per_day, date(2030, 1, 1), seed)
+    ]
+    with engine.begin() as connection:
+        for i in range(0, len(rows), batch_size):
+            connection.execute(insert(Flight), rows[i:i + batch_size])
+    return sessionmaker(bind=engine), len(rows)
+
+
+def load_orm(db):
+    """The load before the FlightStore: ORM objects, leg tuples and tasks that carry the legs."""
+    all_flights = db.query(Flight).all()
+    legs_by_date = defaultdict(list)
+    for flight in all_flights:
+        legs_by_date[departure_date(flight.departure_ts)].append(flight_to_leg(flight))
+    tasks = [(day, legs, sorted({leg[1] for leg in legs})) for day, legs in legs_by_date.items()]
+    return all_flights, tasks
+
+
+def load_store(db, batch_size=10000):
+    """The FlightStore load, with the epoch and date conversion done in Python as SQLite has no timezone()."""
+    query = select(
+        Flight.id, Flight.source, Flight.destination, Flight.departure_ts, Flight.arrival_ts, Flight.price,
+    ).order_by(Flight.departure_ts)
+    store = FlightStore()
+    rows = db.execute(query.execution_options(yield_per=batch_size))
+    for flight_id, source, destination, departure, arrival, price in rows:
+        store.append(
+            flight_id, source, destination, int(departure.timestamp()), int(arrival.timestamp()), float(price),
+            departure_date(departure),
+        )
+    store.seal()
+    tasks = [(day, store.sources_on(day)) for day in store.dates]
+    return store, tasks
+
+
+def load(session_factory, loader):
+    db = session_factory()
+    try:
+        return loader(db)
+    finally:
+        db.close()
+
+
+def measure(session_factory, loader):
+    """
+    Load seconds (including pickling every task, as the pool did at startup),
+    then, in a second traced run, retained and peak heap bytes and task bytes.
+    """
+    gc.collect()
+    started = time.perf_counter()
+    data, tasks = load(session_factory, loader)
+    task_bytes = sum(len(pickle.dumps(task)) for task in tasks)
+    elapsed = time.perf_counter() - started
+    del data, tasks
+
+    gc.collect()
+    tracemalloc.start()
+    data, tasks = load(session_factory, loader)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data, tasks
+    return {"load_s": elapsed, "retained_bytes": retained, "peak_bytes": peak, "task_bytes": task_bytes}
+
+
+def report(result):
+    return {
+        "load_s": round(result["load_s"], 3),
+        **{
+            key.replace("_bytes", "_mb"): round(value / 1024 / 1024, 2)
+            for key, value in result.items() if key.endswith("_bytes")
+        },
+    }
+
+
+def run(airports, days, flights_per_day, seed):
+    session_factory, flights = create_database(airports, days, flights_per_day, seed)
+    orm = measure(session_factory, load_orm)
+    store = measure(session_factory, load_store)
+    return {
+        "flights": flights,
+        "orm": report(orm),
+        "store": report(store),
+        "retained_ratio": round(orm["retained_bytes"] / store["retained_bytes"], 1),
+        "load_ratio": round(orm["load_s"] / store["load_s"], 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory and load time of the precompute's flight data.")
+    parser.add_argument("--airports", type=int, default=40)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--flights-per-day", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.airports, args.days, args.flights_per_day, args.seed), indent=2))
@@ -0,0 +1,139 @@
+"""
+Login throughput against the number of password hashing workers.
+
+Two modes:
+
+- Pool mode (default) measures bcrypt verifications/sec of
+  `PasswordHashingPool` directly, for each worker count. No server is
+  needed, and throughput should grow about linearly up to the number of
+  cores.
+- HTTP mode (`--base-url`) drives `POST /api/v1/auth/token` at each
+  concurrency level and reports logins/sec, latency, and how many requests
+  were turned away with 503 because the pool's queue was full. Restart the
+  API with a different `PASSWORD_HASH_WORKERS` to compare worker counts.
+
+Usage:
+    python -m benchmarks.login_throughput --workers 1 2 4 8 --rounds 12 --duration 10
+    python -m benchmarks.login_throughput --base-url http://localhost:8000 \
+        --username loadtest --password secret --clients 1 4 16 64 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+
+
+async def verify_until(pool, password, hashed_password, deadline, outcomes):
+    from app.core.password_hashing import HashingPoolSaturated
+
+    while time.perf_counter() < deadline:
+        try:
+            valid, _ = await pool.verify(password, hashed_password)
+        except HashingPoolSaturated:
+            outcomes["rejected"] += 1
+            await asyncio.sleep(0.01)
+            continue
+        outcomes["ok" if valid else "invalid"] += 1
+
+
+async def run_pool_level(workers, rounds, duration):
+    from app.core import security
+    from app.core.password_hashing import PasswordHashingPool
+
+    hashed_password = security.get_password_hash("benchmark", rounds)
+    # Two operations per worker keeps every worker busy without piling up a queue
+    pool = PasswordHashingPool(workers, workers * 2, rounds)
+    try:
+        # Start the worker processes before timing
+        await asyncio.gather(*(pool.verify("benchmark", hashed_password) for _ in range(workers)))
+        outcomes = Counter()
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(verify_until(pool, "benchmark", hashed_password, deadline, outcomes)
+                               for _ in range(workers * 2)))
+        elapsed = time.perf_counter() - started
+    finally:
+        pool.shutdown()
+
+    return {
+        "workers": workers,
+        "cores": os.cpu_count(),
+        "rounds": rounds,
+        "duration_s": round(elapsed, 3),
+        "verifications_per_s": round(outcomes["ok"] / elapsed, 2),
+    }
+
+
+async def login_until(client, username, password, deadline, outcomes, latencies):
+    import httpx
+
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.post("/api/v1/auth/token", data={"username": username, "password": password})
+        except httpx.HTTPError:
+            outcomes["error"] += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+        outcomes[f"http_{response.status_code}"] += 1
+        if response.status_code == 503:
+            await asyncio.sleep(0.01)
+
+
+async def run_http_level(base_url, username, password, clients, duration):
+    import httpx
+
+    outcomes, latencies = Counter(), []
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(login_until(client, username, password, deadline, outcomes, latencies)
+                               for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "clients": clients,
+        "duration_s": round(elapsed, 3),
+        "logins_per_s": round(outcomes["http_200"] / elapsed, 2),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 1) if latencies else None,
+        "outcomes": dict(outcomes),
+    }
+
+
+async def main(args):
+    results = []
+    if args.base_url:
+        import httpx
+
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=30) as client:
+            # Registration fails harmlessly if the user already exists
+            await client.post("/api/v1/auth/register", json={"username": args.username, "password": args.password})
+        for clients in args.clients:
+            result = await run_http_level(args.base_url, args.username, args.password, clients, args.duration)
+            print(json.dumps(result), flush=True)
+            results.append(result)
+    else:
+        for workers in args.workers:
+            result = await run_pool_level(workers, args.rounds, args.duration)
+            print(json.dumps(result), flush=True)
+            results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Password hashing and login throughput.")
+    parser.add_argument("--base-url", help="Benchmark a running API instead of the hashing pool alone")
+    parser.add_argument("--username", default="loadtest")
+    parser.add_argument("--password", default="loadtest")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    asyncio.run(main(args))
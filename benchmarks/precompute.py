@@ -0,0 +1,61 @@
+"""
+Measures the wall time and peak memory of the full path precomputation
+(app/scripts/precompute_flights.py), or of any other script run the same way.
+
+The script runs as a child process against the database and Redis named by
+DATABASE_URL and REDIS_URL. Peak memory is the largest resident set of the
+script or any of its pool workers; it is not the sum across processes.
+
+Usage:
+    DATABASE_URL=... REDIS_URL=... python -m benchmarks.precompute
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+PRECOMPUTE_SCRIPT = "app/scripts/precompute_flights.py"
+LOAD_SCRIPT = "app/scripts/load_flights.py"
+
+
+def run_script(script, *args, env=None):
+    """Runs `script` to completion. Returns (wall seconds, peak RSS in MB); raises if it fails."""
+    env = {**os.environ, "PYTHONPATH": ".", **(env or {})}
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, script, *args], env=env)
+    # wait4 reports the child's own usage, which includes the workers it reaped
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise RuntimeError(f"{script} exited with status {process.returncode}")
+    # ru_maxrss is in kilobytes on Linux
+    return elapsed, usage.ru_maxrss / 1024
+
+
+def run_precompute(*args):
+    elapsed, peak_rss_mb = run_script(PRECOMPUTE_SCRIPT, *args)
+    return {"wall_s": round(elapsed, 3), "peak_rss_mb": round(peak_rss_mb, 1)}
+
+
+def run_load(path):
+    """Loads a flights CSV in replace mode, warming Redis, and reports rows/sec."""
+    with open(path) as f:
+        rows = sum(1 for _ in f) - 1
+    elapsed, peak_rss_mb = run_script(LOAD_SCRIPT, "--file", path, "--mode", "replace")
+    return {
+        "rows": rows,
+        "wall_s": round(elapsed, 3),
+        "rows_per_s": round(rows / elapsed, 1),
+        "peak_rss_mb": round(peak_rss_mb, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precomputation wall time and memory.")
+    parser.add_argument("args", nargs="*", help="Extra arguments for precompute_flights.py")
+    args = parser.parse_args()
+
+    print(json.dumps(run_precompute(*args), indent=2))
@@ -0,0 +1,83 @@
+"""
+Measures requests/sec and latency of GET /api/v1/search against a running API.
+
+Usage:
+    python -m benchmarks.search_rps --base-url http://localhost:8000 \
+        --route Delhi:Mumbai:2025-08-07 --concurrency 64 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+
+def percentile(samples, fraction):
+    """Returns the `fraction` percentile of an already sorted list."""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+    return samples[index]
+
+
+async def run_client(client, routes, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        source, destination, date = random.choice(routes)
+        started = time.perf_counter()
+        try:
+            response = await client.get(
+                "/api/v1/search",
+                params={"source": source, "destination": destination, "date": date},
+            )
+            response.raise_for_status()
+        except httpx.HTTPError:
+            errors.append(1)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def run_benchmark(base_url, routes, concurrency, duration, warmup):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        # Warm the caches so the measured window reflects steady-state traffic
+        await asyncio.gather(*(run_client(client, routes, time.perf_counter() + warmup, [], [])
+                               for _ in range(concurrency)))
+
+        latencies, errors = [], []
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(run_client(client, routes, deadline, latencies, errors)
+                               for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def parse_route(value):
+    source, destination, date = value.split(":")
+    return source, destination, date
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the flight search endpoint.")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--route", type=parse_route, action="append", required=True,
+                        help="SOURCE:DESTINATION:YYYY-MM-DD, may be repeated")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    args = parser.parse_args()
+
+    result = asyncio.run(run_benchmark(args.base_url, args.route, args.concurrency, args.duration, args.warmup))
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,104 @@
+"""
+Generates a synthetic flight network in the shape of `flights.csv`.
+
+A few airports act as hubs and get most of the traffic, so multi-leg paths
+exist the way they do in real schedules. The same arguments and seed always
+produce the same file, so a benchmark run can be repeated exactly.
+
+Usage:
+    python -m benchmarks.synthetic --output /tmp/flights.csv \
+        --airports 40 --days 7 --flights-per-day 2000 --seed 1
+"""
+import argparse
+import csv
+import random
+from datetime import date, datetime, time, timedelta, timezone
+
+CSV_COLUMNS = ("flight_number", "source", "destination", "departure_ts", "arrival_ts", "total_seats", "price")
+
+# A flight that every benchmark run can book against without selling out
+HOT_FLIGHT_NUMBER = "BM0000"
+HOT_FLIGHT_SEATS = 1000000
+
+
+def airport_names(count):
+    return [f"Airport{i:03d}" for i in range(count)]
+
+
+def flight_rows(airports, days, flights_per_day, start_date, seed, number_prefix="BM", hubs=None):
+    """
+    Yields CSV rows for `flights_per_day` flights on each of `days` days.
+    Roughly a third of the flights touch one of the hub airports.
+    """
+    rng = random.Random(seed)
+    names = airport_names(airports)
+    hubs = names[:hubs if hubs is not None else max(1, airports // 10)]
+    number = 1
+    for day in range(days):
+        midnight = datetime.combine(start_date + timedelta(days=day), time.min, tzinfo=timezone.utc)
+        for _ in range(flights_per_day):
+            if rng.random() < 0.35:
+                source, destination = rng.choice(hubs), rng.choice(names)
+                if rng.random() < 0.5:
+                    source, destination = destination, source
+            else:
+                source, destination = rng.sample(names, 2)
+            if source == destination:
+                destination = names[(names.index(source) + 1) % len(names)]
+
+            departure = midnight + timedelta(minutes=rng.randrange(0, 24 * 60, 5))
+            duration = timedelta(minutes=rng.randrange(45, 6 * 60, 5))
+            yield {
+                "flight_number": f"{number_prefix}{number:06d}",
+                "source": source,
+                "destination": destination,
+                "departure_ts": departure.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "arrival_ts": (departure + duration).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "total_seats": rng.choice((120, 150, 180, 220, 250)),
+                "price": round(1500 + duration.total_seconds() / 60 * rng.uniform(20, 45), 2),
+            }
+            number += 1
+
+
+def hot_flight_row(start_date, airports):
+    """The single high-capacity flight used by the booking contention benchmark."""
+    names = airport_names(airports)
+    departure = datetime.combine(start_date, time(12, 0), tzinfo=timezone.utc)
+    return {
+        "flight_number": HOT_FLIGHT_NUMBER,
+        "source": names[0],
+        "destination": names[1],
+        "departure_ts": departure.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "arrival_ts": (departure + timedelta(hours=2)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "total_seats": HOT_FLIGHT_SEATS,
+        "price": 5000.0,
+    }
+
+
+def write_flights(path, airports, days, flights_per_day, start_date, seed, number_prefix="BM", include_hot_flight=True):
+    """Writes the network to `path` and returns the number of rows."""
+    rows = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        if include_hot_flight:
+            writer.writerow(hot_flight_row(start_date, airports))
+            rows += 1
+        for row in flight_rows(airports, days, flights_per_day, start_date, seed, number_prefix):
+            writer.writerow(row)
+            rows += 1
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic flights CSV.")
+    parser.add_argument("--output", default="flights_synthetic.csv")
+    parser.add_argument("--airports", type=int, default=40)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--flights-per-day", type=int, default=2000)
+    parser.add_argument("--start-date", type=date.fromisoformat, default=date(2030, 1, 1))
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    count = write_flights(args.output, args.airports, args.days, args.flights_per_day, args.start_date, args.seed)
+    print(f"Wrote {count} flights to {args.output}")
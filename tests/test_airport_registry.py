@@ -0,0 +1,44 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import fakeredis
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.database import Base
+from app.models import models
+from app.services.airport_registry import AirportRegistry
+from app.services.redis_service import AIRPORTS_KEY, AIRPORTS_VERSION_KEY
+
+
+def flight(source, destination):
+    departure = datetime(2030, 1, 1, 8)
+    return models.Flight(
+        id=uuid.uuid4(), flight_number=f"{source}{destination}", source=source, destination=destination,
+        departure_ts=departure, arrival_ts=departure + timedelta(hours=1),
+        total_seats=100, available_seats=100, price=100.0,
+    )
+
+
+def test_seeds_from_database_even_after_an_admin_create_bumped_the_version():
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all, tables=[models.Flight.__table__])
+        sessions = async_sessionmaker(engine)
+        async with sessions() as db:
+            db.add_all([flight("A", "B"), flight("C", "D"), flight("X", "Y")])
+            await db.commit()
+
+        redis_client = fakeredis.FakeAsyncRedis()
+        # What TRACK_AIRPORTS_SCRIPT leaves behind for a single admin create on an un-seeded index
+        await redis_client.hset(AIRPORTS_KEY, mapping={"X": 1, "Y": 1})
+        await redis_client.incr(AIRPORTS_VERSION_KEY)
+
+        registry = AirportRegistry(refresh_interval=60)
+        async with sessions() as db:
+            await registry.ensure_fresh(db, redis_client)
+        await engine.dispose()
+        return registry.airports
+
+    assert asyncio.run(run()) == ["A", "B", "C", "D", "X", "Y"]
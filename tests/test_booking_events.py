@@ -0,0 +1,34 @@
+import asyncio
+
+import fakeredis
+import redis.asyncio as aioredis
+
+from app.services.booking_events import BookingStatusNotifier
+from app.services.payment_queue import booking_status_channel
+
+
+def test_start_gives_up_after_timeout_when_redis_is_unreachable():
+    async def run():
+        notifier = BookingStatusNotifier()
+        unreachable = aioredis.Redis(host="127.0.0.1", port=1, socket_connect_timeout=0.1)
+        try:
+            return await notifier.start(unreachable, timeout=0.3)
+        finally:
+            await notifier.stop()
+
+    assert asyncio.run(run()) is False
+
+
+def test_waiters_receive_published_status():
+    async def run():
+        notifier = BookingStatusNotifier()
+        redis_client = fakeredis.FakeAsyncRedis()
+        try:
+            assert await notifier.start(redis_client, timeout=1)
+            future = notifier.subscribe("booking-1")
+            await redis_client.publish(booking_status_channel("booking-1"), "CONFIRMED")
+            return await asyncio.wait_for(future, timeout=2)
+        finally:
+            await notifier.stop()
+
+    assert asyncio.run(run()) == "CONFIRMED"
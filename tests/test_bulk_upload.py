@@ -0,0 +1,147 @@
+import csv
+import io
+import json
+import uuid
+from datetime import datetime, timezone
+
+import fakeredis
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.database import Base
+from app.models import models
+from app.services import bulk_upload
+
+HEADER = "flight_number,source,destination,departure_ts,arrival_ts,total_seats,price"
+
+
+@pytest.fixture
+def sessions():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[models.Flight.__table__])
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def row(number, source, destination, day=1, hour=8, seats=100, price=5000):
+    return (
+        f"{number},{source},{destination},2030-01-{day:02d}T{hour:02d}:00:00Z,"
+        f"2030-01-{day:02d}T{hour + 2:02d}:00:00Z,{seats},{price}"
+    )
+
+
+def upload(tmp_path, redis_client, sessions, *rows):
+    path = tmp_path / f"{uuid.uuid4()}.csv"
+    path.write_text("\n".join([HEADER, *rows]) + "\n")
+    job_id = str(uuid.uuid4())
+    bulk_upload.process_bulk_upload(str(path), redis_client, job_id, sessions)
+    assert not path.exists()
+    return json.loads(redis_client.get(f"bulk_job:{job_id}"))
+
+
+def flights(sessions):
+    with sessions() as db:
+        return {flight.flight_number: flight for flight in db.query(models.Flight)}
+
+
+def route_events(pubsub):
+    events = []
+    while (message := pubsub.get_message(timeout=0.1)) is not None:
+        if message["type"] == "message":
+            events.append(json.loads(message["data"]))
+    return sorted(events, key=lambda event: (event["source"], event["destination"], event["date"]))
+
+
+def test_validate_chunk_reports_bad_rows_and_keeps_the_last_duplicate():
+    results = {"failed": 0, "errors": []}
+    reader = csv.DictReader(io.StringIO("\n".join([
+        HEADER,
+        row("AI1", "DEL", "BOM", price=4000),
+        row("AI2", "DEL", "BOM", seats="many"),
+        "AI3,DEL,BOM,tomorrow,2030-01-01T10:00:00Z,100,5000",
+        row("AI1", "DEL", "BOM", price=4500, seats=80),
+    ])))
+    chunk = next(bulk_upload.read_chunks(reader, 10))
+
+    rows = bulk_upload.validate_chunk(chunk, results)
+
+    assert results["failed"] == 2
+    assert [error.split(":")[0] for error in results["errors"]] == ["Row 3", "Row 4"]
+    departure = datetime(2030, 1, 1, 8, tzinfo=timezone.utc)
+    assert list(rows) == [("AI1", departure)]
+    assert rows[("AI1", departure)]["price"] == 4500
+    assert rows[("AI1", departure)]["available_seats"] == 80
+
+
+def test_reupload_updates_flights_in_place(tmp_path, sessions):
+    redis_client = fakeredis.FakeRedis()
+    first = upload(tmp_path, redis_client, sessions, row("AI1", "DEL", "BOM"), row("AI2", "DEL", "GOI"))
+    assert (first["status"], first["created"], first["updated"], first["failed"]) == ("COMPLETED", 2, 0, 0)
+    original = flights(sessions)
+
+    second = upload(
+        tmp_path, redis_client, sessions,
+        row("AI1", "DEL", "BOM", seats=150, price=6100), row("AI3", "BOM", "GOI"),
+    )
+
+    assert (second["status"], second["created"], second["updated"], second["failed"]) == ("COMPLETED", 1, 1, 0)
+    written = flights(sessions)
+    assert sorted(written) == ["AI1", "AI2", "AI3"]
+    updated = written["AI1"]
+    # The conflicting row keeps its ID and bumps its version
+    assert updated.id == original["AI1"].id
+    assert (updated.version, updated.total_seats, updated.available_seats, float(updated.price)) == (2, 150, 150, 6100)
+    assert redis_client.hget(f"flight:{updated.id}", "price") == b"6100.0"
+    assert written["AI2"].version == 1
+
+
+def test_route_events_carry_the_ids_of_every_changed_flight(tmp_path, sessions):
+    redis_client = fakeredis.FakeRedis()
+    upload(tmp_path, redis_client, sessions, row("AI1", "DEL", "BOM"), row("AI2", "DEL", "BOM", hour=12))
+    ids = {number: str(flight.id) for number, flight in flights(sessions).items()}
+    pubsub = redis_client.pubsub()
+    pubsub.subscribe("flight_updates")
+
+    # AI2 moves to another route; AI4 is new on a later date
+    upload(
+        tmp_path, redis_client, sessions,
+        row("AI1", "DEL", "BOM", price=5100), row("AI2", "DEL", "GOI", hour=12), row("AI4", "DEL", "BOM", day=2),
+    )
+    ids["AI4"] = str(flights(sessions)["AI4"].id)
+
+    assert route_events(pubsub) == [
+        {"source": "DEL", "destination": "BOM", "date": "2030-01-01", "flight_ids": sorted([ids["AI1"], ids["AI2"]])},
+        {"source": "DEL", "destination": "BOM", "date": "2030-01-02", "flight_ids": [ids["AI4"]]},
+        {"source": "DEL", "destination": "GOI", "date": "2030-01-01", "flight_ids": [ids["AI2"]]},
+    ]
+    # The moved flight is only searchable on its new route
+    assert redis_client.zrange("search:DEL:BOM:2030-01-01:price", 0, -1) == [ids["AI1"].encode()]
+    assert redis_client.zrange("search:DEL:GOI:2030-01-01:price", 0, -1) == [ids["AI2"].encode()]
+
+
+def test_a_failed_chunk_is_counted_and_the_other_chunks_are_written(tmp_path, sessions, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_UPLOAD_CHUNK_SIZE", 2)
+    upsert_chunk = bulk_upload.upsert_chunk
+
+    def failing_upsert(db, rows):
+        if any(number == "BAD" for number, _ in rows):
+            raise RuntimeError("connection lost")
+        return upsert_chunk(db, rows)
+
+    monkeypatch.setattr(bulk_upload, "upsert_chunk", failing_upsert)
+    redis_client = fakeredis.FakeRedis()
+
+    results = upload(
+        tmp_path, redis_client, sessions,
+        row("AI1", "DEL", "BOM"), row("AI2", "DEL", "BOM", seats="x"),
+        row("AI3", "DEL", "BOM"), row("BAD", "DEL", "BOM"),
+        row("AI5", "DEL", "BOM"),
+    )
+
+    assert (results["status"], results["processed"], results["created"], results["failed"]) == ("COMPLETED", 5, 2, 3)
+    assert results["errors"][0].startswith("Row 3:")
+    assert results["errors"][1] == "Rows 4-5: connection lost"
+    assert sorted(flights(sessions)) == ["AI1", "AI5"]
+    assert redis_client.zcard("search:DEL:BOM:2030-01-01:price") == 2
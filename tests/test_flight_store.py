@@ -0,0 +1,68 @@
+import json
+import random
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import flight_store
+from app.services.path_engine import departure_date, flight_to_leg, path_cache_key, path_summary_key, process_date
+
+
+def random_flights(rng, airports, days, count):
+    names = [f"Airport{i:02d}" for i in range(airports)]
+    start = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    flights = []
+    for _ in range(count):
+        departure = start + timedelta(days=rng.randrange(days), minutes=rng.randrange(0, 24 * 60, 5))
+        flights.append(SimpleNamespace(
+            id=uuid.UUID(int=rng.getrandbits(128)),
+            source=(pair := rng.sample(names, 2))[0], destination=pair[1],
+            departure_ts=departure, arrival_ts=departure + timedelta(minutes=rng.randrange(45, 360, 5)),
+            price=round(rng.uniform(1000, 9000), 2),
+        ))
+    return flights
+
+
+def build_store(flights):
+    """What load_flight_store builds from its query: rows in departure date order, epochs as integers."""
+    store = flight_store.FlightStore()
+    for flight in sorted(flights, key=lambda flight: departure_date(flight.departure_ts)):
+        store.append(
+            flight.id, flight.source, flight.destination,
+            int(flight.departure_ts.timestamp()), int(flight.arrival_ts.timestamp()), flight.price,
+            departure_date(flight.departure_ts),
+        )
+    return store.seal()
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_shared_store_matches_process_date(seed, monkeypatch):
+    rng = random.Random(seed)
+    flights = random_flights(rng, airports=rng.randrange(4, 10), days=rng.randrange(1, 4), count=rng.randrange(20, 200))
+    top_k, max_legs, min_connection = rng.randrange(1, 5), rng.randrange(1, 4), rng.choice((0, 1800))
+
+    legs_by_date = defaultdict(list)
+    for flight in sorted(flights, key=lambda flight: departure_date(flight.departure_ts)):
+        legs_by_date[departure_date(flight.departure_ts)].append(flight_to_leg(flight))
+    store = build_store(flights)
+    monkeypatch.setattr(flight_store, "_shared_store", None)
+    flight_store.share(store)
+
+    assert store.dates == sorted(legs_by_date)
+    for date, legs in legs_by_date.items():
+        sources = store.sources_on(date)
+        assert sources == sorted({leg[1] for leg in legs})
+        expected = process_date((date, legs, sources), top_k, max_legs, min_connection)
+        shared = flight_store.process_shared_date((date, sources), top_k, max_legs, min_connection)
+        # Epochs are integers in the store and floats on ORM-built legs; the values are the same
+        assert [(key, json.loads(value)) for key, value in shared] == [(key, json.loads(value)) for key, value in expected]
+
+        # A single route, as the worker and --source/--destination runs ask for
+        source, destination = legs[0][1], legs[0][2]
+        route_keys = {path_cache_key(source, destination, date), path_summary_key(source, destination, date)}
+        assert flight_store.process_shared_date(
+            (date, [source]), top_k, max_legs, min_connection, destination=destination
+        ) == [(key, value) for key, value in shared if key in route_keys]
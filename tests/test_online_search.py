@@ -0,0 +1,55 @@
+import asyncio
+from datetime import date
+
+import fakeredis
+import pytest
+
+from app.core.config import settings
+from app.core.redis_lock import RedisLock
+from app.services import online_search, path_engine, path_store
+from app.services.path_engine import DateGraph, path_cache_key
+
+DAY = date(2030, 1, 1)
+
+
+@pytest.fixture
+def redis_clients(monkeypatch):
+    server = fakeredis.FakeServer()
+    sync_client = fakeredis.FakeRedis(server=server)
+    monkeypatch.setattr(online_search, "get_redis", lambda: sync_client)
+    monkeypatch.setattr(settings, "ONLINE_SEARCH_BUDGET_MS", 200)
+    return sync_client, fakeredis.FakeAsyncRedis(server=server)
+
+
+def test_waiter_whose_lock_wait_ran_out_uses_the_stored_result(redis_clients, monkeypatch):
+    sync_client, async_client = redis_clients
+
+    async def no_graph(day):
+        raise AssertionError("the stored result should have been used")
+
+    monkeypatch.setattr(online_search.graph_cache, "get", no_graph)
+    holder = RedisLock(sync_client, f"lock:online_search:{path_cache_key('A', 'B', DAY)}", timeout=1, lease_ms=10000)
+    assert holder.acquire()
+
+    async def run():
+        # The holder has stored its result but not yet released the lock
+        await path_store.set_paths(async_client, "A", "B", DAY, '[["ab"]]', '{"min_price": 10.0}', 60)
+        return await online_search.find_paths(async_client, "A", "B", DAY)
+
+    assert asyncio.run(run()) == ([["ab"]], {"min_price": 10.0}, True)
+    holder.release()
+
+
+def test_budget_starts_after_the_graph_is_built(redis_clients, monkeypatch):
+    _, async_client = redis_clients
+    budget = settings.ONLINE_SEARCH_BUDGET_MS / 1000
+
+    async def slow_graph(day):
+        await asyncio.sleep(budget * 1.5)
+        return DateGraph([("ab", "A", "B", 0, 3600, 10.0)])
+
+    monkeypatch.setattr(online_search.graph_cache, "get", slow_graph)
+    monkeypatch.setattr(path_engine, "DEADLINE_CHECK_INTERVAL", 1)
+
+    paths, summary, complete = asyncio.run(online_search.find_paths(async_client, "A", "B", DAY))
+    assert (paths, complete) == ([["ab"]], True)
@@ -0,0 +1,192 @@
+import random
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+import fakeredis
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models import models
+from app.services import redis_service
+from app.services.path_engine import DateGraph, departure_date, process_date, search_from_source
+from app.services.path_updater import IncrementalPrecomputer
+
+
+def brute_force(legs, source, top_k, max_legs, min_connection):
+    """Every valid path from `source`, enumerated exhaustively; the `top_k` cheapest prices per destination."""
+    prices = {}
+
+    def extend(airport, arrival, visited, price, count):
+        for flight_id, leg_source, destination, departure, leg_arrival, leg_price in legs:
+            if leg_source != airport or destination in visited or departure < arrival + min_connection:
+                continue
+            total = price + leg_price
+            prices.setdefault(destination, []).append(total)
+            if count + 1 < max_legs:
+                extend(destination, leg_arrival, visited | {destination}, total, count + 1)
+
+    extend(source, float("-inf"), {source}, 0.0, 0)
+    return {destination: sorted(found)[:top_k] for destination, found in prices.items()}
+
+
+def random_legs(rng, airports, count):
+    names = [chr(ord("A") + i) for i in range(airports)]
+    legs = []
+    for i in range(count):
+        source, destination = rng.sample(names, 2)
+        departure = rng.randrange(0, 20)
+        legs.append((f"f{i}", source, destination, departure, departure + rng.randrange(1, 4), float(rng.randrange(1, 20))))
+    return legs
+
+
+def assert_valid(legs, source, path, price, max_legs, min_connection):
+    by_id = {leg[0]: leg for leg in legs}
+    assert 1 <= len(path) <= max_legs
+    airport, arrival, visited, total = source, float("-inf"), {source}, 0.0
+    for flight_id in path:
+        _, leg_source, destination, departure, leg_arrival, leg_price = by_id[flight_id]
+        assert leg_source == airport and departure >= arrival + min_connection and destination not in visited
+        airport, arrival, total = destination, leg_arrival, total + leg_price
+        visited.add(destination)
+    assert total == price
+
+
+def test_leg_limit_does_not_prune_shorter_label():
+    legs = [
+        ("ac", "A", "C", 0, 1, 1.0),
+        ("cb", "C", "B", 1, 2, 1.0),
+        ("ab", "A", "B", 0, 3, 10.0),
+        ("bd", "B", "D", 4, 5, 1.0),
+    ]
+    results = search_from_source(DateGraph(legs), "A", top_k=1, max_legs=2)
+    assert results["D"] == [(11.0, ["ab", "bd"])]
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_matches_brute_force(seed):
+    rng = random.Random(seed)
+    legs = random_legs(rng, airports=rng.randrange(3, 7), count=rng.randrange(4, 25))
+    top_k = rng.randrange(1, 4)
+    max_legs = rng.randrange(1, 5)
+    min_connection = rng.choice((0, 1))
+    source = legs[0][1]
+
+    results = search_from_source(DateGraph(legs), source, top_k=top_k, max_legs=max_legs, min_connection=min_connection)
+    expected = brute_force(legs, source, top_k, max_legs, min_connection)
+
+    assert {destination: [price for price, _ in paths] for destination, paths in results.items()} == expected
+    for paths in results.values():
+        for price, path in paths:
+            assert_valid(legs, source, path, price, max_legs, min_connection)
+
+
+def test_reports_deadline():
+    legs = random_legs(random.Random(0), airports=6, count=300)
+    graph = DateGraph(legs)
+    assert not search_from_source(graph, legs[0][1], top_k=5, max_legs=4).timed_out
+    assert search_from_source(graph, legs[0][1], top_k=5, max_legs=4, deadline=0).timed_out
+
+
+def stored_paths(redis_client):
+    return {
+        key.decode(): redis_client.get(key).decode()
+        for key in redis_client.scan_iter()
+        if not key.startswith(b"search_response")
+    }
+
+
+def full_recompute(precomputer):
+    expected = {}
+    for date, legs_by_id in precomputer.legs_by_date.items():
+        legs = list(legs_by_id.values())
+        sources = sorted({leg[1] for leg in legs})
+        expected.update(process_date(
+            (date, legs, sources), precomputer.top_k, precomputer.max_legs, precomputer.min_connection
+        ))
+    return expected
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_incremental_updates_match_a_full_recompute(seed):
+    rng = random.Random(seed)
+    airports = [chr(ord("A") + i) for i in range(rng.randrange(3, 6))]
+    start = datetime(2030, 1, 1, 6)
+
+    def random_flight(flight):
+        flight.source, flight.destination = rng.sample(airports, 2)
+        # Mostly on the first day; some flights move to the next one and back
+        flight.departure_ts = start + timedelta(days=rng.random() < 0.15, minutes=rng.randrange(0, 600, 30))
+        flight.arrival_ts = flight.departure_ts + timedelta(minutes=rng.randrange(30, 180, 30))
+        flight.price = rng.randrange(50, 500)
+        return flight
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[models.User.__table__, models.Flight.__table__, models.Booking.__table__])
+    sessions = sessionmaker(engine, expire_on_commit=False)
+    with sessions() as db:
+        for i in range(rng.randrange(3, 15)):
+            db.add(random_flight(models.Flight(id=uuid.uuid4(), flight_number=f"F{i}", total_seats=10, available_seats=10)))
+        db.commit()
+
+    redis_client = fakeredis.FakeRedis()
+    precomputer = IncrementalPrecomputer(
+        sessions, redis_client, top_k=rng.randrange(1, 4), max_legs=rng.randrange(1, 4), min_connection=rng.choice((0, 1800)),
+    )
+    precomputer.load()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        for date in precomputer.legs_by_date:
+            precomputer._recompute(pool, date, {leg[1]: set(airports) for leg in precomputer.legs_by_date[date].values()})
+        assert stored_paths(redis_client) == full_recompute(precomputer)
+
+        for step in range(20):
+            with sessions() as db:
+                flights = db.query(models.Flight).all()
+                action = rng.choice(("add", "change", "delete")) if flights else "add"
+                if action == "add":
+                    flight = random_flight(models.Flight(
+                        id=uuid.uuid4(), flight_number=f"N{step}", total_seats=10, available_seats=10,
+                    ))
+                    db.add(flight)
+                elif action == "change":
+                    flight = random_flight(rng.choice(flights))
+                else:
+                    flight = rng.choice(flights)
+                    db.delete(flight)
+                date = departure_date(flight.departure_ts)
+                db.commit()
+            precomputer._process(pool, date, [flight.id])
+            assert stored_paths(redis_client) == full_recompute(precomputer), (step, action)
+
+
+def test_incremental_entries_expire_like_a_full_run():
+    redis_client = fakeredis.FakeRedis()
+    precomputer = IncrementalPrecomputer(None, redis_client, top_k=1, max_legs=1, min_connection=0, result_ttl=60)
+    day = date(2030, 1, 1)
+    precomputer.legs_by_date[day]["ab"] = ("ab", "A", "B", 0, 3600, 10.0)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        precomputer._recompute(pool, day, {"A": {"B"}})
+
+    keys = list(redis_client.scan_iter())
+    assert len(keys) == 2
+    assert all(0 < redis_client.ttl(key) <= 60 for key in keys)
+
+
+def test_flights_are_filed_under_their_utc_departure_date():
+    india = timezone(timedelta(hours=5, minutes=30))
+    departure = datetime(2030, 1, 2, 2, 0, tzinfo=india)
+    assert departure_date(departure) == date(2030, 1, 1)
+    assert departure_date(datetime(2030, 1, 2, 2, 0)) == date(2030, 1, 2)
+
+    # The search sorted sets use the same day as the paths
+    redis_client = fakeredis.FakeRedis()
+    flight = models.Flight(
+        id=uuid.uuid4(), flight_number="F1", source="A", destination="B", departure_ts=departure,
+        arrival_ts=departure + timedelta(hours=2), total_seats=10, available_seats=10, price=100.0,
+    )
+    with redis_client.pipeline(transaction=False) as pipe:
+        redis_service.queue_flight_update(pipe, flight, track_airports_index=False)
+        pipe.execute()
+    assert redis_client.exists("search:A:B:2030-01-01:price")
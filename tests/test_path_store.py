@@ -0,0 +1,56 @@
+import asyncio
+import hashlib
+from datetime import date
+
+import fakeredis
+import pytest
+
+from app.services import path_store
+
+
+def test_routes_are_only_recorded_during_a_build():
+    redis_client = fakeredis.FakeRedis()
+    day = date(2030, 1, 1)
+
+    path_store.record_rebuild_routes(redis_client, day, {"A": {"B"}})
+    assert path_store.take_rebuild_routes(redis_client) == {}
+
+    path_store.mark_build(redis_client)
+    path_store.record_rebuild_routes(redis_client, day, {"A": {"B", "C", "A"}, "D": {"B"}})
+    path_store.finish_build(redis_client)
+    path_store.record_rebuild_routes(redis_client, day, {"E": {"F"}})
+
+    assert path_store.take_rebuild_routes(redis_client) == {day: {"A": {"B", "C"}, "D": {"B"}}}
+    assert path_store.take_rebuild_routes(redis_client) == {}
+
+
+def test_reads_follow_the_active_version_and_run_by_sha():
+    redis_client = fakeredis.FakeAsyncRedis()
+    day = date(2030, 1, 1)
+
+    async def run():
+        await path_store.set_paths(redis_client, "A", "B", day, "unversioned", "s0", 60)
+        before = await path_store.get_paths_with_summary(redis_client, "A", "B", day)
+        await redis_client.set(path_store.ACTIVE_VERSION_KEY, "7")
+        await path_store.set_paths(redis_client, "A", "B", day, "v7", "s7", 60)
+        after = await path_store.get_paths_for_dates(redis_client, "A", "B", [day])
+        loaded = await redis_client.script_exists(
+            hashlib.sha1(path_store.READ_PATHS_SCRIPT.encode()).hexdigest(),
+            hashlib.sha1(path_store.WRITE_PATHS_SCRIPT.encode()).hexdigest(),
+        )
+        return before, after, loaded
+
+    before, after, loaded = asyncio.run(run())
+    assert before == (b"unversioned", b"s0")
+    assert after == [(b"v7", b"s7")]
+    assert loaded == [True, True]
+
+
+class ClusterNode:
+    def info(self, section):
+        return {"cluster_enabled": 1}
+
+
+def test_refuses_redis_cluster():
+    with pytest.raises(RuntimeError):
+        path_store.require_single_instance(ClusterNode())
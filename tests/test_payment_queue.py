@@ -0,0 +1,83 @@
+import uuid
+
+import fakeredis
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models import models
+from app.services import payment_queue, seat_reservations
+
+
+class Crash(Exception):
+    pass
+
+
+@pytest.fixture
+def sessions():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[models.User.__table__, models.Flight.__table__, models.Booking.__table__])
+    yield sessionmaker(engine)
+    engine.dispose()
+
+
+def test_redelivery_after_a_crash_between_confirm_and_commit_does_not_charge_again(sessions, monkeypatch):
+    charges = []
+
+    def charge(booking_id, force_failure=False):
+        charges.append(booking_id)
+        return {"status": "SUCCESS", "payment_ref": f"ref_{len(charges)}"}
+
+    monkeypatch.setattr(payment_queue, "mock_payment_service", charge)
+
+    redis_client = fakeredis.FakeRedis()
+    flight_id, booking_id = uuid.uuid4(), uuid.uuid4()
+    redis_client.set(f"flight_seats:{flight_id}", 10)
+    with sessions() as db:
+        db.add(models.Booking(id=booking_id, flight_id=flight_id, seats=2, status="PENDING"))
+        db.commit()
+    assert seat_reservations.reserve_seats(redis_client, flight_id, 2, booking_id, ttl_seconds=300) == 8
+
+    # The worker dies after confirming the reservation, before committing the booking
+    publish = redis_client.publish
+
+    def crash(channel, message):
+        raise Crash()
+
+    monkeypatch.setattr(redis_client, "publish", crash)
+    with pytest.raises(Crash):
+        payment_queue.process_payment_job(redis_client, sessions, str(booking_id), force_failure=False)
+    with sessions() as db:
+        assert db.get(models.Booking, booking_id).status == "PENDING"
+
+    # The job is redelivered
+    monkeypatch.setattr(redis_client, "publish", publish)
+    payment_queue.process_payment_job(redis_client, sessions, str(booking_id), force_failure=False)
+
+    with sessions() as db:
+        booking = db.get(models.Booking, booking_id)
+        assert (booking.status, booking.payment_ref) == ("CONFIRMED", "ref_1")
+    assert len(charges) == 1
+    assert int(redis_client.get(f"flight_seats:{flight_id}")) == 8
+
+
+def test_failed_payment_returns_the_seats(sessions, monkeypatch):
+    monkeypatch.setattr(
+        payment_queue, "mock_payment_service",
+        lambda booking_id, force_failure=False: {"status": "FAILED", "payment_ref": "ref_failed"},
+    )
+    redis_client = fakeredis.FakeRedis()
+    flight_id, booking_id = uuid.uuid4(), uuid.uuid4()
+    redis_client.set(f"flight_seats:{flight_id}", 10)
+    with sessions() as db:
+        db.add(models.Booking(id=booking_id, flight_id=flight_id, seats=3, status="PENDING"))
+        db.commit()
+    seat_reservations.reserve_seats(redis_client, flight_id, 3, booking_id, ttl_seconds=300)
+
+    payment_queue.process_payment_job(redis_client, sessions, str(booking_id), force_failure=True)
+
+    with sessions() as db:
+        booking = db.get(models.Booking, booking_id)
+        assert (booking.status, booking.payment_ref) == ("FAILED", None)
+    assert int(redis_client.get(f"flight_seats:{flight_id}")) == 10
@@ -0,0 +1,35 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from app.scripts.check_query_plans import check_plan, disable_seqscan, hot_queries
+
+# A migrated Postgres database (`alembic upgrade head`), such as the docker-compose one
+DATABASE_URL = os.environ.get("QUERY_PLANS_DATABASE_URL")
+
+QUERIES = hot_queries()
+
+
+@pytest.mark.parametrize("name, statement, index_name", QUERIES, ids=[name for name, _, _ in QUERIES])
+def test_statement_compiles_for_postgres(name, statement, index_name):
+    assert str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+@pytest.fixture(scope="module")
+def db():
+    if not DATABASE_URL:
+        pytest.skip("QUERY_PLANS_DATABASE_URL is not set")
+    engine = create_engine(DATABASE_URL)
+    with Session(engine) as session:
+        disable_seqscan(session)
+        yield session
+        session.rollback()
+    engine.dispose()
+
+
+@pytest.mark.parametrize("name, statement, index_name", QUERIES, ids=[name for name, _, _ in QUERIES])
+def test_plan_uses_index(db, name, statement, index_name):
+    assert check_plan(db, statement, index_name) == []
@@ -0,0 +1,100 @@
+import threading
+import time
+
+import fakeredis
+import pytest
+
+from app.core import redis_lock
+from app.core.redis_lock import RedisLock
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def lock(server, **options):
+    return RedisLock(fakeredis.FakeRedis(server=server), "lock:test", **options)
+
+
+def queued(server):
+    return fakeredis.FakeRedis(server=server).zcard("lock:test:queue")
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_waiters_acquire_in_arrival_order_and_are_woken_on_release(server):
+    holder = lock(server, timeout=1)
+    assert holder.acquire()
+    order = []
+
+    def wait(name):
+        waiter = lock(server, timeout=5)
+        assert waiter.acquire()
+        order.append((name, time.monotonic()))
+        time.sleep(0.05)
+        waiter.release()
+
+    threads = []
+    for count, name in enumerate(["first", "second", "third"], start=1):
+        thread = threading.Thread(target=wait, args=(name,))
+        thread.start()
+        threads.append(thread)
+        wait_for(lambda: queued(server) == count)
+
+    released_at = time.monotonic()
+    holder.release()
+    for thread in threads:
+        thread.join()
+
+    assert [name for name, _ in order] == ["first", "second", "third"]
+    # Woken by the release rather than by the WAKE_POLL_SECONDS retry
+    assert order[0][1] - released_at < redis_lock.WAKE_POLL_SECONDS / 2
+
+
+def test_lock_is_taken_over_after_its_lease_expires(server):
+    first = lock(server, timeout=1, lease_ms=100)
+    assert first.acquire()
+    assert not lock(server, timeout=1).acquire(blocking=False)
+
+    time.sleep(0.15)
+    second = lock(server, timeout=1)
+    assert second.acquire(blocking=False)
+
+    # The expired holder can neither extend nor release the new owner's lock
+    assert not first.extend()
+    assert not first.release()
+    assert fakeredis.FakeRedis(server=server).get("lock:test") == second.token.encode()
+    assert second.release()
+
+
+def test_release_by_a_non_owner_is_refused(server):
+    owner = lock(server, timeout=1)
+    assert owner.acquire()
+    intruder = lock(server, timeout=1)
+    intruder.token = "not-the-owner"
+
+    assert not intruder.release()
+    assert not lock(server, timeout=1).acquire(blocking=False)
+    assert owner.release()
+
+
+def test_waiter_whose_heartbeat_lapsed_is_evicted(server, monkeypatch):
+    monkeypatch.setattr(redis_lock, "WAITER_HEARTBEAT_MS", 100)
+    holder = lock(server, timeout=1)
+    assert holder.acquire()
+    # A waiter that queued and then died without leaving the queue
+    assert not lock(server, timeout=1)._try_acquire("gone")
+    assert queued(server) == 1
+    holder.release()
+
+    # While its heartbeat holds, it keeps its place ahead of newcomers
+    assert not lock(server, timeout=1).acquire(blocking=False)
+    time.sleep(0.15)
+    assert lock(server, timeout=1).acquire(blocking=False)
+    assert queued(server) == 0
@@ -0,0 +1,58 @@
+import fakeredis
+
+from app.services import redis_streams
+
+STREAM = "jobs"
+GROUP = "workers"
+
+
+def make_redis():
+    redis_client = fakeredis.FakeRedis()
+    redis_streams.ensure_consumer_group(redis_client, STREAM, GROUP)
+    return redis_client
+
+
+def test_claim_stale_takes_over_another_consumers_pending_entries():
+    redis_client = make_redis()
+    redis_client.xadd(STREAM, {"booking_id": "booking-1"})
+    # A consumer that reads the entry and dies before acknowledging it
+    redis_client.xreadgroup(GROUP, "dead-host", {STREAM: ">"})
+
+    entries = redis_streams.claim_stale(redis_client, STREAM, GROUP, "new-host", min_idle_ms=0, count=10)
+
+    assert [fields[b"booking_id"] for _, fields in entries] == [b"booking-1"]
+    pending = redis_client.xpending_range(STREAM, GROUP, "-", "+", 10)
+    assert [entry["consumer"] for entry in pending] == [b"new-host"]
+    assert redis_streams.read_own_pending(redis_client, STREAM, GROUP, "new-host") == entries
+
+
+def test_claim_stale_accepts_redis_6_reply():
+    class Redis6:
+        def xautoclaim(self, *args, **kwargs):
+            return [b"0-0", [(b"1-0", {b"booking_id": b"booking-1"})]]
+
+    assert redis_streams.claim_stale(Redis6(), STREAM, GROUP, "new-host", min_idle_ms=0, count=10) == [
+        (b"1-0", {b"booking_id": b"booking-1"})
+    ]
+
+
+def test_ensure_consumer_group_is_idempotent():
+    redis_client = make_redis()
+    redis_streams.ensure_consumer_group(redis_client, STREAM, GROUP)
+    assert redis_streams.group_info(redis_client, STREAM, GROUP)["pending"] == 0
+
+
+def test_unread_count_without_lag_field(monkeypatch):
+    redis_client = make_redis()
+    for i in range(5):
+        redis_client.xadd(STREAM, {"n": i})
+    redis_client.xreadgroup(GROUP, "host", {STREAM: ">"}, count=2)
+    monkeypatch.setattr(redis_streams, "UNREAD_PAGE_SIZE", 2)
+
+    info = redis_streams.group_info(redis_client, STREAM, GROUP)
+    # Redis 6.2 has no lag field
+    info.pop("lag", None)
+
+    assert redis_streams.unread_count(redis_client, STREAM, info) == 3
+    oldest = redis_streams.oldest_unacknowledged_id(redis_client, STREAM, GROUP, info)
+    assert oldest == redis_client.xrange(STREAM, count=1)[0][0]
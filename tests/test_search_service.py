@@ -0,0 +1,48 @@
+import asyncio
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import fakeredis
+
+from app.services import search_service
+
+DAY = date(2030, 1, 1)
+
+
+async def add_flight(redis_client, price, seats):
+    flight_id = str(uuid.uuid4())
+    departure = datetime(2030, 1, 1, 8, tzinfo=timezone.utc) + timedelta(minutes=price)
+    await redis_client.hset(f"flight:{flight_id}", mapping={
+        "id": flight_id, "flight_number": f"F{price}", "source": "A", "destination": "B",
+        "departure_ts": departure.isoformat(), "arrival_ts": (departure + timedelta(hours=1)).isoformat(),
+        "total_seats": 100, "available_seats": 100, "price": price,
+    })
+    await redis_client.set(f"flight_seats:{flight_id}", seats)
+    await redis_client.zadd(f"search:A:B:{DAY}:price", {flight_id: price})
+    return flight_id
+
+
+def test_direct_pages_skip_flights_without_seats():
+    async def run():
+        redis_client = fakeredis.FakeAsyncRedis()
+        # Prices 1..10; every other flight is sold out
+        for price in range(1, 11):
+            await add_flight(redis_client, price, seats=0 if price % 2 == 0 else 5)
+
+        pages, offset = [], 0
+        while offset is not None:
+            paths, offset = await search_service.search_direct_flights(
+                None, redis_client, "A", "B", DAY, passengers=2, offset=offset, limit=2,
+            )
+            pages.append([path.total_price for path in paths])
+        return pages
+
+    assert asyncio.run(run()) == [[1, 3], [5, 7], [9]]
+
+
+def test_seat_rule_is_shared_by_filter_and_overlay():
+    seats = {"a": 3}
+    assert search_service.has_seats(["a"], seats, 3)
+    assert not search_service.has_seats(["a", "gone"], seats, 1)
+    paths = [{"flights": [{"id": "a", "available_seats": 9}]}, {"flights": [{"id": "gone", "available_seats": 9}]}]
+    assert search_service.overlay_live_seats_json(paths, seats, 2) == [{"flights": [{"id": "a", "available_seats": 3}]}]
@@ -0,0 +1,125 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+import redis
+
+from app.models import models
+from app.scripts.load_flights import apply_merge_to_redis
+from app.services import redis_service, seat_reservations
+from app.services.seat_sync import SEAT_CHANGES_STREAM
+
+
+def seats(redis_client, flight_id):
+    return int(redis_client.get(f"flight_seats:{flight_id}"))
+
+
+def test_concurrent_reservations_never_oversell():
+    server = fakeredis.FakeServer()
+    fakeredis.FakeRedis(server=server).set("flight_seats:f1", 10)
+
+    def reserve(_):
+        return seat_reservations.reserve_seats(
+            fakeredis.FakeRedis(server=server), "f1", 1, uuid.uuid4(), ttl_seconds=300
+        )
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        outcomes = list(executor.map(reserve, range(50)))
+
+    assert sorted(outcome for outcome in outcomes if outcome >= 0) == list(range(10))
+    assert outcomes.count(seat_reservations.NOT_ENOUGH_SEATS) == 40
+    assert seats(fakeredis.FakeRedis(server=server), "f1") == 0
+
+
+def test_confirm_after_expiry_fails_and_the_seats_are_back():
+    redis_client = fakeredis.FakeRedis()
+    redis_client.set("flight_seats:f1", 10)
+    redis_client.hset("flight:f1", "available_seats", 10)
+    seat_reservations.reserve_seats(redis_client, "f1", 4, "r1", ttl_seconds=-1)
+    assert (seats(redis_client, "f1"), int(redis_client.hget("flight:f1", "available_seats"))) == (6, 6)
+
+    assert seat_reservations.release_expired_reservations(redis_client) == ["r1"]
+    assert not seat_reservations.confirm_reservation(redis_client, "r1")
+    assert (seats(redis_client, "f1"), int(redis_client.hget("flight:f1", "available_seats"))) == (10, 10)
+
+
+def test_release_twice_returns_the_seats_once():
+    redis_client = fakeredis.FakeRedis()
+    redis_client.set("flight_seats:f1", 10)
+    seat_reservations.reserve_seats(redis_client, "f1", 3, "r1", ttl_seconds=300)
+
+    assert seat_reservations.release_reservation(redis_client, "r1", "f1")
+    assert not seat_reservations.release_reservation(redis_client, "r1", "f1")
+    assert seats(redis_client, "f1") == 10
+    # One change for the reservation and one for the release
+    assert redis_client.xlen(SEAT_CHANGES_STREAM) == 2
+
+
+def test_confirmed_reservation_is_not_released():
+    redis_client = fakeredis.FakeRedis()
+    redis_client.set("flight_seats:f1", 10)
+    seat_reservations.reserve_seats(redis_client, "f1", 3, "r1", ttl_seconds=300)
+
+    assert seat_reservations.confirm_reservation(redis_client, "r1")
+    assert not seat_reservations.release_reservation(redis_client, "r1", "f1")
+    assert seat_reservations.confirm_reservation(redis_client, "r1")
+    assert seats(redis_client, "f1") == 7
+
+
+def test_release_refuses_another_flight():
+    redis_client = fakeredis.FakeRedis()
+    redis_client.set("flight_seats:f1", 10)
+    redis_client.set("flight_seats:f2", 10)
+    seat_reservations.reserve_seats(redis_client, "f1", 3, "r1", ttl_seconds=300)
+
+    with pytest.raises(redis.ResponseError):
+        seat_reservations.release_reservation(redis_client, "r1", "f2")
+    assert (seats(redis_client, "f1"), seats(redis_client, "f2")) == (7, 10)
+
+
+def adjust(redis_client, flight_id, delta):
+    with redis_client.pipeline(transaction=False) as pipe:
+        seat_reservations.queue_capacity_change(pipe, flight_id, delta)
+        return pipe.execute()[0]
+
+
+def test_capacity_change_keeps_sold_seats():
+    redis_client = fakeredis.FakeRedis()
+    redis_client.set("flight_seats:f1", 30)
+
+    assert adjust(redis_client, "f1", 20) == 50
+    assert adjust(redis_client, "f1", -80) == 0
+    assert adjust(redis_client, "missing", 10) == -1
+    assert not redis_client.exists("flight_seats:missing")
+    # Each change of an existing counter is queued for the write-behind
+    assert redis_client.xlen(SEAT_CHANGES_STREAM) == 2
+
+
+def test_merge_keeps_the_live_counter_of_a_moved_flight():
+    redis_client = fakeredis.FakeRedis()
+    flight_id = uuid.uuid4()
+    departure = datetime(2030, 1, 1, 8)
+    old = SimpleNamespace(id=flight_id, source="A", destination="B", departure_ts=departure)
+    redis_client.zadd("search:A:B:2030-01-01:price", {str(flight_id): 100})
+    redis_client.zadd("search:A:B:2030-01-01:fastest", {str(flight_id): departure.timestamp()})
+    redis_client.hset(f"flight:{flight_id}", mapping={"source": "A", "destination": "B"})
+    # Two seats were sold since the last write-behind flush: the row still says 32
+    redis_client.set(f"flight_seats:{flight_id}", 30)
+
+    # The merge moves the flight to A-C and adds 20 seats; the row becomes 52 available
+    apply_merge_to_redis(redis_client, [(flight_id, 20)], [old], batch_size=10)
+    moved = models.Flight(
+        id=flight_id, flight_number="F1", source="A", destination="C",
+        departure_ts=departure, arrival_ts=departure + timedelta(hours=1),
+        total_seats=120, available_seats=52, price=100.0,
+    )
+    with redis_client.pipeline(transaction=False) as pipe:
+        redis_service.queue_flight_update(pipe, moved, track_airports_index=False)
+        pipe.execute()
+
+    assert int(redis_client.get(f"flight_seats:{flight_id}")) == 50
+    assert not redis_client.exists("search:A:B:2030-01-01:price", "search:A:B:2030-01-01:fastest")
+    assert redis_client.zscore("search:A:C:2030-01-01:price", str(flight_id)) == 100